@@ -0,0 +1,33 @@
+"""Add updated_at to workout and meal plans
+
+Revision ID: 3f9a2c71d4e8
+Revises: 59be0754d297
+Create Date: 2026-01-12 11:20:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a2c71d4e8'
+down_revision: Union[str, Sequence[str], None] = '59be0754d297'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('workout_plans', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('meal_plans', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+    # Существующие планы считаем изменёнными в момент создания
+    op.execute("UPDATE workout_plans SET updated_at = COALESCE(created_at, now())")
+    op.execute("UPDATE meal_plans SET updated_at = COALESCE(created_at, now())")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('meal_plans', 'updated_at')
+    op.drop_column('workout_plans', 'updated_at')
@@ -0,0 +1,35 @@
+"""Add telegram file_id cache
+
+Revision ID: 4a7d0e93c5b1
+Revises: e5c93a7d1f20
+Create Date: 2026-01-28 12:37:05.219874
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a7d0e93c5b1'
+down_revision: Union[str, Sequence[str], None] = 'e5c93a7d1f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'telegram_files',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('file_id', sa.String(length=255), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('content_hash', 'kind'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('telegram_files')
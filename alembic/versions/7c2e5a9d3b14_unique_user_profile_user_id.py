@@ -0,0 +1,44 @@
+"""Unique user_id in user_profiles
+
+Revision ID: 7c2e5a9d3b14
+Revises: 4a7d0e93c5b1
+Create Date: 2026-02-02 10:14:52.603118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e5a9d3b14'
+down_revision: Union[str, Sequence[str], None] = '4a7d0e93c5b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Дубли анкет могли появиться из-за гонки при сохранении — оставляем самую свежую
+    op.execute(
+        """
+        DELETE FROM user_profiles
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY user_id
+                    ORDER BY updated_at DESC NULLS LAST, completed_at DESC NULLS LAST
+                ) AS rn
+                FROM user_profiles
+            ) ranked
+            WHERE rn > 1
+        )
+        """
+    )
+    op.create_unique_constraint('uq_user_profiles_user_id', 'user_profiles', ['user_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_user_profiles_user_id', 'user_profiles', type_='unique')
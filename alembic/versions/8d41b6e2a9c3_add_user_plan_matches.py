@@ -0,0 +1,49 @@
+"""Add precomputed user plan matches
+
+Revision ID: 8d41b6e2a9c3
+Revises: 3f9a2c71d4e8
+Create Date: 2026-01-19 15:02:11.774530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41b6e2a9c3'
+down_revision: Union[str, Sequence[str], None] = '3f9a2c71d4e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'user_plan_matches',
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('workout_plan_id', sa.UUID(), nullable=True),
+        sa.Column('workout_score', sa.Float(), nullable=True),
+        sa.Column('meal_plan_id', sa.UUID(), nullable=True),
+        sa.Column('meal_score', sa.Float(), nullable=True),
+        sa.Column('matched_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['workout_plan_id'], ['workout_plans.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['meal_plan_id'], ['meal_plans.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    op.create_table(
+        'plan_match_watermarks',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('watermark', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.create_index(op.f('ix_user_profiles_updated_at'), 'user_profiles', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_user_profiles_updated_at'), table_name='user_profiles')
+    op.drop_table('plan_match_watermarks')
+    op.drop_table('user_plan_matches')
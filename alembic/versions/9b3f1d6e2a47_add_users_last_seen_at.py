@@ -0,0 +1,28 @@
+"""Add users.last_seen_at
+
+Revision ID: 9b3f1d6e2a47
+Revises: 7c2e5a9d3b14
+Create Date: 2026-02-04 16:48:21.370562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3f1d6e2a47'
+down_revision: Union[str, Sequence[str], None] = '7c2e5a9d3b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('last_seen_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'last_seen_at')
@@ -0,0 +1,33 @@
+"""Add composite index for active subscription lookup
+
+Revision ID: b27e5f0c8a16
+Revises: 8d41b6e2a9c3
+Create Date: 2026-01-26 10:44:57.902163
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b27e5f0c8a16'
+down_revision: Union[str, Sequence[str], None] = '8d41b6e2a9c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_subscriptions_user_status_ends_at',
+        'subscriptions',
+        ['user_id', 'status', 'ends_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_subscriptions_user_status_ends_at', table_name='subscriptions')
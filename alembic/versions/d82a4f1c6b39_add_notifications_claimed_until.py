@@ -0,0 +1,28 @@
+"""Add notifications.claimed_until
+
+Revision ID: d82a4f1c6b39
+Revises: 9b3f1d6e2a47
+Create Date: 2026-02-09 11:05:47.218904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd82a4f1c6b39'
+down_revision: Union[str, Sequence[str], None] = '9b3f1d6e2a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notifications', sa.Column('claimed_until', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('notifications', 'claimed_until')
@@ -0,0 +1,33 @@
+"""Add composite index for notification dispatch
+
+Revision ID: e5c93a7d1f20
+Revises: b27e5f0c8a16
+Create Date: 2026-01-27 09:12:31.448209
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c93a7d1f20'
+down_revision: Union[str, Sequence[str], None] = 'b27e5f0c8a16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_notifications_status_scheduled_for',
+        'notifications',
+        ['status', 'scheduled_for'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notifications_status_scheduled_for', table_name='notifications')
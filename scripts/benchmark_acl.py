@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк проверки доступа: два запроса (пользователь + подписка) против одного запроса
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from sqlalchemy import select
+
+from src.database.session import async_session_maker
+from src.database.models import User
+from src.database.repositories.subscription_repo import SubscriptionRepository
+from src.database.repositories.user_repo import UserRepository
+
+
+async def two_queries(telegram_id: int):
+    """Прежний путь: сессия, поиск пользователя, затем поиск подписки"""
+    async with async_session_maker() as session:
+        user = await UserRepository(session).get_by_telegram_id(telegram_id)
+        if user:
+            await SubscriptionRepository(session).get_active_for_user(user.id)
+
+
+async def one_query(telegram_id: int):
+    """Новый путь: один запрос с подзапросом подписки"""
+    async with async_session_maker() as session:
+        await SubscriptionRepository(session).get_access_by_telegram_id(telegram_id)
+
+
+async def measure(check, telegram_ids: list[int], iterations: int) -> list[float]:
+    timings = []
+    for i in range(iterations):
+        telegram_id = telegram_ids[i % len(telegram_ids)]
+        started = time.perf_counter()
+        await check(telegram_id)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(name: str, timings: list[float]):
+    timings = sorted(timings)
+    p50 = statistics.median(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<12} p50={p50:.3f}ms p99={p99:.3f}ms mean={statistics.mean(timings):.3f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк проверки доступа ACL")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    args = parser.parse_args()
+
+    async with async_session_maker() as session:
+        result = await session.execute(select(User.telegram_id).limit(1000))
+        telegram_ids = list(result.scalars().all())
+
+    if not telegram_ids:
+        print("В базе нет пользователей — сначала добавьте тестовые данные")
+        return
+
+    print(f"Пользователей в выборке: {len(telegram_ids)}, итераций: {args.iterations}\n")
+    for name, check in (("two_queries", two_queries), ("one_query", one_query)):
+        await measure(check, telegram_ids, args.warmup)
+        report(name, await measure(check, telegram_ids, args.iterations))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк профилей engine: прежний (echo=True, пул по умолчанию) против рабочего профиля из настроек
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.config.settings import settings
+from src.database.session import create_engine
+from src.database.models import User
+from src.database.repositories.subscription_repo import SubscriptionRepository
+
+
+def build_profiles(concurrency: int) -> dict:
+    """
+    Профили для сравнения. Прежний повторяет старый session.py
+    """
+    legacy = settings.db.model_copy(update={
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_pre_ping": False,
+        "pool_recycle": -1,
+    })
+    production = settings.db.model_copy(update={
+        # Пул под заданную конкурентность, чтобы не ждать соединений
+        "pool_size": max(settings.db.pool_size, concurrency),
+    })
+    return {
+        "legacy": (legacy, True),
+        "production": (production, False),
+    }
+
+
+async def run_profile(db_settings, echo: bool, telegram_ids: list[int], concurrency: int, duration: float) -> list[float]:
+    engine = create_engine(db_settings, echo=echo)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    timings = []
+    deadline = time.perf_counter() + duration
+
+    async def worker(offset: int):
+        i = offset
+        while time.perf_counter() < deadline:
+            telegram_id = telegram_ids[i % len(telegram_ids)]
+            started = time.perf_counter()
+            async with session_maker() as session:
+                await SubscriptionRepository(session).get_access_by_telegram_id(telegram_id)
+            timings.append((time.perf_counter() - started) * 1000)
+            i += concurrency
+
+    try:
+        await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    finally:
+        await engine.dispose()
+    return timings
+
+
+def report(name: str, timings: list[float], duration: float) -> str:
+    timings = sorted(timings)
+    p50 = statistics.median(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    return f"{name:<12} {len(timings) / duration:>9.1f} req/s  p50={p50:.3f}ms p99={p99:.3f}ms"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк профилей подключения к БД")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="Секунд на профиль")
+    args = parser.parse_args()
+
+    engine = create_engine(settings.db)
+    async with engine.connect() as conn:
+        result = await conn.execute(select(User.telegram_id).limit(1000))
+        telegram_ids = list(result.scalars().all())
+    await engine.dispose()
+
+    if not telegram_ids:
+        print("В базе нет пользователей — сначала добавьте тестовые данные")
+        return
+
+    # Лог SQL прежнего профиля идёт в stdout — итоги печатаем в конце
+    results = []
+    for name, (db_settings, echo) in build_profiles(args.concurrency).items():
+        timings = await run_profile(db_settings, echo, telegram_ids, args.concurrency, args.duration)
+        results.append(report(name, timings, args.duration))
+
+    print(f"\nПользователей в выборке: {len(telegram_ids)}, конкурентность: {args.concurrency}")
+    for line in results:
+        print(line)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
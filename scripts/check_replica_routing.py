@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Проверка маршрутизации чтения на реплики.
+Нужен DB_REPLICA_HOSTS; для локальной проверки без настоящей репликации реплику можно
+указать как второй адрес того же сервера (например, DB_HOST=localhost, DB_REPLICA_HOSTS=127.0.0.1).
+Скрипт считает запросы, дошедшие до каждого engine.
+"""
+import argparse
+import asyncio
+import sys
+from collections import Counter
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from sqlalchemy import event, select, update
+
+from src.database.session import async_session_maker, engine, replica_router
+from src.database.models import User
+from src.database.repositories.subscription_repo import SubscriptionRepository
+
+
+def count_queries(counter: Counter):
+    engines = [("primary", engine)] + [(f"replica-{i}", replica) for i, replica in enumerate(replica_router.replicas)]
+    for name, item in engines:
+        def on_execute(conn, cursor, statement, parameters, context, executemany, name=name):
+            counter[name] += 1
+        event.listen(item.sync_engine, "before_cursor_execute", on_execute)
+
+
+def report(label: str, counter: Counter):
+    print(f"{label:<36} {dict(counter)}")
+
+
+async def read_profile(telegram_id: int):
+    """Чтение как в хэндлерах: пользователь и проверка подписки"""
+    async with async_session_maker() as session:
+        session.info["user_id"] = telegram_id
+        await session.execute(select(User).where(User.telegram_id == telegram_id))
+        await SubscriptionRepository(session).get_access_by_telegram_id(telegram_id)
+
+
+async def write_profile(telegram_id: int):
+    """Запись как при сохранении анкеты (данные не меняются)"""
+    async with async_session_maker() as session:
+        session.info["user_id"] = telegram_id
+        await session.execute(
+            update(User).where(User.telegram_id == telegram_id).values(updated_at=User.updated_at)
+        )
+        await session.commit()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Проверка чтения с реплик")
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+
+    if not replica_router.replicas:
+        print("Реплики не заданы — укажите DB_REPLICA_HOSTS")
+        return
+
+    async with async_session_maker() as session:
+        result = await session.execute(select(User.telegram_id).limit(100))
+        telegram_ids = list(result.scalars().all())
+    if len(telegram_ids) < 2:
+        print("В базе меньше двух пользователей — сначала добавьте тестовые данные")
+        return
+
+    await replica_router.check_replicas()
+    print(f"Реплики: {replica_router.stats()}\n")
+
+    counter = Counter()
+    count_queries(counter)
+
+    for i in range(args.reads):
+        await read_profile(telegram_ids[i % len(telegram_ids)])
+    report(f"Чтение {args.reads} профилей", counter)
+
+    writer, other = telegram_ids[0], telegram_ids[1]
+    counter.clear()
+    await write_profile(writer)
+    report(f"Запись пользователя {writer}", counter)
+
+    counter.clear()
+    await read_profile(writer)
+    report("Чтение сразу после своей записи", counter)
+
+    counter.clear()
+    await read_profile(other)
+    report("Чтение другого пользователя", counter)
+
+    await asyncio.sleep(replica_router.sticky_seconds)
+    counter.clear()
+    await read_profile(writer)
+    report(f"Чтение через {replica_router.sticky_seconds:g}с после записи", counter)
+
+    print(f"\n{replica_router.stats()}")
+    await engine.dispose()
+    await replica_router.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Локальный фейковый сервер Telegram Bot API для нагрузочного теста и ручной проверки.
+
+Отдаёт апдейты через getUpdates (long polling) или POST на вебхук после setWebhook,
+принимает sendMessage, sendDocument, sendPhoto, sendMediaGroup, editMessage* и отвечает
+правдоподобными объектами Message. Остальные методы отвечают True.
+Для каждого чата запоминаются последние сообщения бота (в том числе альбомы) и последнее
+сообщение с inline-клавиатурой — по нему генератор нагрузки «нажимает» кнопки.
+
+Отдельный запуск (бот указывает на него через BOT_API_URL=http://127.0.0.1:8090):
+    python scripts/fake_bot_api.py --port 8090
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {"id": 1000000001, "is_bot": True, "first_name": "FitPlanBot", "username": "fitplan_load_test_bot"}
+
+# Методы, в ответ на которые Telegram возвращает отправленное сообщение
+SEND_METHODS = {
+    "sendmessage", "senddocument", "sendphoto", "sendvideo", "sendaudio", "sendanimation", "sendsticker", "sendlocation",
+}
+EDIT_METHODS = {"editmessagetext", "editmessagereplymarkup", "editmessagecaption", "editmessagemedia"}
+MEDIA_KINDS = ("photo", "document", "video", "audio", "animation", "sticker")
+# Сколько последних сообщений бота хранится на чат
+HISTORY_SIZE = 50
+
+
+class FakeBotAPI:
+    """
+    Состояние фейкового Bot API: очередь апдейтов, сообщения бота по чатам и счётчики вызовов
+    """
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret: Optional[str] = None
+        self.webhook_errors = 0
+
+        self._updates: List[Dict[str, Any]] = []
+        self._new_updates = asyncio.Event()
+        self._webhook_queue: asyncio.Queue = asyncio.Queue()
+        self._webhook_task: Optional[asyncio.Task] = None
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        # chat_id -> {message_id: сообщение}; только сообщения с inline-клавиатурой
+        self._keyboards: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        self._last_keyboard: Dict[int, int] = {}
+        # chat_id -> последние сообщения бота по порядку отправки
+        self._history: Dict[int, deque] = {}
+
+    # --- Апдейты ---
+
+    def next_update_id(self) -> int:
+        return next(self._update_ids)
+
+    def push_update(self, update: Dict[str, Any]):
+        """
+        Ставит апдейт в доставку: боту через getUpdates или на зарегистрированный вебхук
+        """
+        if self.webhook_url:
+            self._webhook_queue.put_nowait(update)
+        else:
+            self._updates.append(update)
+            self._new_updates.set()
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        # offset подтверждает все апдейты до него
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    def _set_webhook(self, params: Dict[str, Any]):
+        self.webhook_url = params.get("url") or None
+        self.webhook_secret = params.get("secret_token") or None
+        if self.webhook_url and (self._webhook_task is None or self._webhook_task.done()):
+            self._webhook_task = asyncio.create_task(self._deliver_webhooks())
+            # Накопленные до регистрации вебхука апдейты уходят туда же
+            for update in self._updates:
+                self._webhook_queue.put_nowait(update)
+            self._updates = []
+
+    async def _deliver_webhooks(self, concurrency: int = 40):
+        """
+        Доставка на вебхук: как и Telegram, держит несколько одновременных запросов
+        и повторяет апдейт, если бот ответил ошибкой
+        """
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret} if self.webhook_secret else {}
+
+        async def deliver(session: aiohttp.ClientSession):
+            while True:
+                update = await self._webhook_queue.get()
+                try:
+                    async with session.post(self.webhook_url, json=update, headers=headers) as response:
+                        if response.status >= 400:
+                            raise aiohttp.ClientResponseError(response.request_info, (), status=response.status)
+                except Exception:
+                    self.webhook_errors += 1
+                    await asyncio.sleep(0.1)
+                    self._webhook_queue.put_nowait(update)
+
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(deliver(session) for _ in range(concurrency)))
+
+    async def close(self):
+        if self._webhook_task:
+            self._webhook_task.cancel()
+            await asyncio.gather(self._webhook_task, return_exceptions=True)
+
+    # --- Сообщения бота ---
+
+    def last_keyboard(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Последнее сообщение бота в чате с inline-клавиатурой (или None)
+        """
+        message_id = self._last_keyboard.get(chat_id)
+        if message_id is None:
+            return None
+        return self._keyboards.get(chat_id, {}).get(message_id)
+
+    def messages(self, chat_id: int) -> List[Dict[str, Any]]:
+        """
+        Последние сообщения бота в чате (не больше HISTORY_SIZE) с учётом правок
+        """
+        return list(self._history.get(chat_id, ()))
+
+    def find_button(self, chat_id: int, text: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """
+        Ищет кнопку по тексту в последней inline-клавиатуре чата: (сообщение, callback_data)
+        """
+        message = self.last_keyboard(chat_id)
+        if message is None:
+            return None
+        for row in message["reply_markup"].get("inline_keyboard", []):
+            for button in row:
+                if button.get("text") == text and button.get("callback_data"):
+                    return message, button["callback_data"]
+        return None
+
+    def _make_message(self, chat_id: int, params: Dict[str, Any], message_id: Optional[int] = None) -> Dict[str, Any]:
+        message: Dict[str, Any] = {
+            "message_id": message_id or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        if params.get("caption"):
+            message["caption"] = params["caption"]
+        reply_markup = params.get("reply_markup")
+        # В Message Telegram возвращает только inline-клавиатуру
+        if isinstance(reply_markup, dict) and "inline_keyboard" in reply_markup:
+            message["reply_markup"] = reply_markup
+        return message
+
+    def _remember(self, message: Dict[str, Any]):
+        chat_id = message["chat"]["id"]
+        history = self._history.setdefault(chat_id, deque(maxlen=HISTORY_SIZE))
+        for index, known in enumerate(history):
+            if known["message_id"] == message["message_id"]:
+                # Правка уже отправленного сообщения
+                history[index] = message
+                break
+        else:
+            history.append(message)
+
+        if "reply_markup" in message:
+            self._keyboards.setdefault(chat_id, {})[message["message_id"]] = message
+            self._last_keyboard[chat_id] = message["message_id"]
+        elif message["message_id"] in self._keyboards.get(chat_id, {}):
+            # Клавиатуру у сообщения убрали
+            del self._keyboards[chat_id][message["message_id"]]
+
+    def _attachment(self, kind: str) -> Any:
+        file_number = next(self._file_ids)
+        file = {"file_id": f"fake-{kind}-{file_number}", "file_unique_id": f"u{file_number}"}
+        if kind == "photo":
+            return [{**file, "width": 1280, "height": 960}]
+        if kind == "document":
+            return {**file, "file_name": f"file-{file_number}.pdf"}
+        return file
+
+    def _send(self, name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        message = self._make_message(int(params["chat_id"]), params)
+        kind = name[len("send"):]
+        if kind in MEDIA_KINDS:
+            message[kind] = self._attachment(kind)
+        self._remember(message)
+        return message
+
+    def _edit(self, params: Dict[str, Any]) -> Any:
+        if "inline_message_id" in params:
+            return True
+        chat_id = int(params["chat_id"])
+        message_id = int(params["message_id"])
+        previous = self._keyboards.get(chat_id, {}).get(message_id, {})
+        fields = {key: value for key, value in previous.items() if key in ("text", "caption")}
+        fields.update(params)
+        message = self._make_message(chat_id, fields, message_id=message_id)
+        self._remember(message)
+        return message
+
+    def _send_media_group(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        chat_id = int(params["chat_id"])
+        media_group_id = str(time.time_ns())
+        messages = []
+        for item in params.get("media") or []:
+            message = self._make_message(chat_id, {"caption": item.get("caption")})
+            message["media_group_id"] = media_group_id
+            kind = item.get("type", "photo")
+            message[kind] = self._attachment(kind)
+            self._remember(message)
+            messages.append(message)
+        return messages
+
+    # --- HTTP ---
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await _read_params(request)
+        name = method.lower()
+        self.calls[method] += 1
+
+        if name == "getme":
+            result: Any = BOT_USER
+        elif name == "getupdates":
+            result = await self._get_updates(params)
+        elif name == "setwebhook":
+            self._set_webhook(params)
+            result = True
+        elif name == "deletewebhook":
+            self.webhook_url = None
+            result = True
+        elif name == "getwebhookinfo":
+            result = {"url": self.webhook_url or "", "has_custom_certificate": False, "pending_update_count": 0}
+        elif name in SEND_METHODS:
+            result = self._send(name, params)
+        elif name in EDIT_METHODS:
+            result = self._edit(params)
+        elif name == "sendmediagroup":
+            result = self._send_media_group(params)
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        app.router.add_get("/bot{token}/{method}", self.handle)
+        return app
+
+
+async def _read_params(request: web.Request) -> Dict[str, Any]:
+    """
+    Параметры вызова: aiogram шлёт form-data, сложные значения — строками JSON, файлы — multipart
+    """
+    if request.content_type == "application/json":
+        return await request.json()
+    params = {}
+    for key, value in (await request.post()).items():
+        if isinstance(value, web.FileField):
+            value.file.read()
+            continue
+        params[key] = _decode(value)
+    params.update({key: _decode(value) for key, value in request.query.items()})
+    return params
+
+
+def _decode(value: str) -> Any:
+    if value[:1] in ("{", "["):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+async def start_fake_api(api: FakeBotAPI, host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(api.create_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Фейковый сервер Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    api = FakeBotAPI()
+    runner = await start_fake_api(api, args.host, args.port)
+    print(f"Fake Bot API: http://{args.host}:{args.port} (BOT_API_URL для бота)")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"Вызовы: {dict(api.calls)}")
+    finally:
+        await api.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Фейковый отправитель вебхуков Telegram для локальной проверки режима webhook.
+Шлёт апдейты от N пользователей и показывает коды ответов и задержку подтверждения
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+from collections import Counter
+
+import aiohttp
+
+TEXTS = ["/start", "👤 Мой профиль", "🏋️ Мой план", "🍎 Питание", "/help"]
+
+
+def make_update(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": f"User{user_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+            "text": text,
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Фейковый отправитель вебхуков Telegram")
+    parser.add_argument("--url", default="http://localhost:8081/webhook")
+    parser.add_argument("--secret", default=None)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret} if args.secret else {}
+    update_ids = itertools.count(1)
+    statuses = Counter()
+    latencies = []
+
+    async def sender(session: aiohttp.ClientSession, count: int):
+        for _ in range(count):
+            update_id = next(update_ids)
+            payload = make_update(update_id, 100000 + update_id % args.users, TEXTS[update_id % len(TEXTS)])
+            started = time.perf_counter()
+            async with session.post(args.url, json=payload, headers=headers) as response:
+                statuses[response.status] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        per_sender = args.updates // args.concurrency
+        await asyncio.gather(*(sender(session, per_sender) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Отправлено: {len(latencies)} за {elapsed:.2f}s ({len(latencies) / elapsed:.0f} updates/s)")
+    print(f"Коды ответов: {dict(statuses)}")
+    print(f"Подтверждение: p50={statistics.median(latencies):.2f}ms p99={latencies[int(len(latencies) * 0.99) - 1]:.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
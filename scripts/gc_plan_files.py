@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Сборка мусора в хранилище файлов планов: удаляет файлы, на которые не ссылается ни один план питания
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from src.database.session import async_session_maker
+from src.database.repositories.meal_plan_repo import MealPlanRepository
+from src.services.file_service import file_service
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Удаление неиспользуемых файлов планов питания")
+    parser.add_argument("--dry-run", action="store_true", help="только показать, что будет удалено")
+    parser.add_argument("--grace-hours", type=float, default=1.0, help="не удалять файлы моложе этого срока")
+    args = parser.parse_args()
+
+    async with async_session_maker() as session:
+        counts = await MealPlanRepository(session).get_file_reference_counts()
+
+    shared = sum(1 for count in counts.values() if count > 1)
+    print(f"Файлов со ссылками: {len(counts)}, из них общих для нескольких планов: {shared}")
+
+    removed = await file_service.collect_garbage(
+        set(counts), grace_seconds=args.grace_hours * 3600, dry_run=args.dry_run
+    )
+    for relative_path in removed:
+        print(f"{'Будет удалён' if args.dry_run else 'Удалён'}: {relative_path}")
+    print(f"Итого: {len(removed)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    asyncio.run(main())
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест бота с локальным фейковым Telegram Bot API (scripts/fake_bot_api.py).
+
+Бот запускается в этом же процессе с настоящими middleware, роутерами и диалогами,
+но вместо api.telegram.org ходит в фейковый сервер (getUpdates или вебхук).
+N виртуальных пользователей проходят сценарии: /start, полная анкета,
+«🏋️ Мой план» и «🍎 Питание». Для каждого сценария выводятся пропускная способность,
+p50/p95/p99 времени обработки шага (от отправки апдейта до конца его обработки,
+включая все вызовы Bot API) и число SQL-запросов на шаг.
+
+Нужен Postgres (DB_* в .env): репозитории используют ON CONFLICT, gen_random_uuid()
+и другие возможности Postgres, поэтому SQLite не подходит. Локально хватит
+    docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=postgres postgres:16
+Пользователи теста (telegram_id от --id-base) создаются с активной подпиской
+и удаляются после прогона. Чтобы «Мой план» находил планы, добавьте их:
+    python scripts/add_test_data.py
+
+Пример:
+    python scripts/load_test.py --users 200 --iterations 3 --mode polling
+"""
+import argparse
+import asyncio
+import contextvars
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Awaitable
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Update
+from sqlalchemy import delete, event, func, select
+
+from fake_bot_api import FakeBotAPI, start_fake_api
+from src.bot.app import create_bot, create_dispatcher, create_tables
+from src.bot.send_scheduler import send_scheduler
+from src.bot.webhook import run_webhook
+from src.database.models import Subscription, User, WorkoutPlan
+from src.database.repositories.user_repo import UserRepository
+from src.database.session import async_session_maker, engine, replica_router
+from src.services.activity import activity_buffer
+from src.services.loop_monitor import loop_monitor
+from src.utils.logging_setup import setup_logging
+
+SCENARIOS = ("start", "questionnaire", "workout_plan", "meal_plan")
+
+# Ответы анкеты по порядку окон: текст или нажатие кнопки с этим текстом
+QUESTIONNAIRE = [
+    ("text", "30"),
+    ("click", "👨 Мужской"),
+    ("text", "180"),
+    ("text", "80"),
+    ("text", "75"),
+    ("click", "📦 Мезоморф (мускулистый)"),
+    ("click", "💪 Набрать мышечную массу"),
+    ("click", "🏃 Средняя активность (тренировки 2-3 раза/нед)"),
+    ("text", "8"),
+    ("text", "Все в семье худощавые"),
+    ("click", "✅ Да, есть опыт"),
+    ("text", "01.01.2020"),
+    ("click", "💪 Всё тело"),
+    ("click", "🏋️ Зал (с оборудованием)"),
+    ("text", "60"),
+    ("text", "3"),
+    ("click", "🏋️ Силовые тренировки"),
+    ("click", "🟡 Средний"),
+    ("text", "нет"),
+    ("click", "🟡 Хорошая"),
+    ("click", "🟡 Хорошая"),
+    ("click", "✅ Да, сохранить"),
+]
+
+# Сценарий апдейта, который сейчас обрабатывается, — для подсчёта SQL-запросов
+current_scenario: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_scenario", default=None)
+
+
+class UpdateTracker(BaseMiddleware):
+    """
+    Внешний middleware апдейтов: сообщает генератору, что апдейт обработан,
+    и помечает сценарий на время обработки
+    """
+
+    def __init__(self):
+        self.pending: Dict[int, Tuple[str, asyncio.Future]] = {}
+
+    def expect(self, update_id: int, scenario: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.pending[update_id] = (scenario, future)
+        return future
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        entry = self.pending.pop(event.update_id, None)
+        if entry is None:
+            return await handler(event, data)
+
+        scenario, future = entry
+        token = current_scenario.set(scenario)
+        try:
+            result = await handler(event, data)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            raise
+        finally:
+            current_scenario.reset(token)
+        if not future.done():
+            future.set_result(result)
+        return result
+
+
+class LoadTest:
+    """
+    Фейковый Bot API, бот и результаты прогона
+    """
+
+    def __init__(self, api: FakeBotAPI, tracker: UpdateTracker, timeout: float, think_time: float):
+        self.api = api
+        self.tracker = tracker
+        self.timeout = timeout
+        self.think_time = think_time
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Counter] = defaultdict(Counter)
+        self.queries: Counter = Counter()
+        self.completed_questionnaires = 0
+
+    def count_queries(self):
+        def on_execute(conn, cursor, statement, parameters, context, executemany):
+            self.queries[current_scenario.get() or "background"] += 1
+
+        for item in [engine, *replica_router.replicas]:
+            event.listen(item.sync_engine, "before_cursor_execute", on_execute)
+
+    async def think(self):
+        if self.think_time:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * self.think_time)
+
+    async def step(self, scenario: str, update: Dict[str, Any]) -> bool:
+        """
+        Отправляет апдейт и ждёт конца его обработки. False — ошибка, таймаут или апдейт не обработан
+        """
+        future = self.tracker.expect(update["update_id"], scenario)
+        started = time.perf_counter()
+        self.api.push_update(update)
+        try:
+            result = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.tracker.pending.pop(update["update_id"], None)
+            self.errors[scenario]["timeout"] += 1
+            return False
+        except Exception as e:
+            self.errors[scenario][type(e).__name__] += 1
+            return False
+        self.latencies[scenario].append(time.perf_counter() - started)
+        if result is UNHANDLED:
+            self.errors[scenario]["unhandled"] += 1
+            return False
+        return True
+
+
+class VirtualUser:
+    def __init__(self, test: LoadTest, telegram_id: int):
+        self.test = test
+        self.telegram_id = telegram_id
+        self.user = {"id": telegram_id, "is_bot": False, "first_name": f"Load{telegram_id}"}
+
+    async def text(self, scenario: str, text: str) -> bool:
+        update_id = self.test.api.next_update_id()
+        return await self.test.step(scenario, {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": self.telegram_id, "type": "private", "first_name": self.user["first_name"]},
+                "from": self.user,
+                "text": text,
+            },
+        })
+
+    async def click(self, scenario: str, button_text: str) -> bool:
+        found = self.test.api.find_button(self.telegram_id, button_text)
+        if found is None:
+            self.test.errors[scenario]["button not found"] += 1
+            return False
+        message, data = found
+        update_id = self.test.api.next_update_id()
+        return await self.test.step(scenario, {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": self.user,
+                "chat_instance": str(self.telegram_id),
+                "message": message,
+                "data": data,
+            },
+        })
+
+    async def run(self, iterations: int, ramp_up: float):
+        await asyncio.sleep(random.uniform(0, ramp_up))
+        await self.text("start", "/start")
+
+        await self.test.think()
+        if await self.text("questionnaire", "📝 Заполнить анкету"):
+            for kind, value in QUESTIONNAIRE:
+                await self.test.think()
+                action = self.text if kind == "text" else self.click
+                if not await action("questionnaire", value):
+                    break
+            else:
+                self.test.completed_questionnaires += 1
+
+        for _ in range(iterations):
+            await self.test.think()
+            await self.text("workout_plan", "🏋️ Мой план")
+            await self.test.think()
+            await self.text("meal_plan", "🍎 Питание")
+
+
+async def seed_users(telegram_ids: List[int]):
+    """
+    Пользователи теста с активной подпиской (без неё ACL не пускает к планам)
+    """
+    now = datetime.now(timezone.utc)
+    async with async_session_maker() as session:
+        repo = UserRepository(session)
+        for telegram_id in telegram_ids:
+            user, _ = await repo.get_or_create(telegram_id, first_name=f"Load{telegram_id}")
+            session.add(Subscription(
+                user_id=user.id,
+                status="active",
+                activated_by_admin=True,
+                activated_at=now,
+                starts_at=now - timedelta(minutes=1),
+                ends_at=now + timedelta(days=1),
+            ))
+        await session.commit()
+
+
+async def delete_users(first_id: int, last_id: int) -> int:
+    """Удаляет пользователей теста (анкеты и подписки удаляются каскадом)"""
+    async with async_session_maker() as session:
+        result = await session.execute(delete(User).where(User.telegram_id.between(first_id, last_id)))
+        await session.commit()
+        return result.rowcount
+
+
+def percentile(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def report(test: LoadTest, users: int, duration: float):
+    print(f"\nПользователей: {users}, длительность: {duration:.1f}s")
+    print(f"{'Сценарий':<14} {'шагов':>7} {'ошибок':>7} {'шаг/с':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'SQL/шаг':>8}")
+    total_steps = 0
+    for scenario in SCENARIOS:
+        latencies = sorted(test.latencies.get(scenario, []))
+        errors = sum(test.errors[scenario].values())
+        if not latencies:
+            print(f"{scenario:<14} {0:>7} {errors:>7}")
+            continue
+        total_steps += len(latencies)
+        ms = [value * 1000 for value in latencies]
+        print(
+            f"{scenario:<14} {len(ms):>7} {errors:>7} {len(ms) / duration:>8.1f} "
+            f"{percentile(ms, 0.5):>7.1f}ms {percentile(ms, 0.95):>7.1f}ms {percentile(ms, 0.99):>7.1f}ms "
+            f"{ms[-1]:>7.1f}ms {test.queries[scenario] / len(ms):>8.1f}"
+        )
+
+    print(f"\nВсего шагов: {total_steps} ({total_steps / duration:.1f}/s)")
+    print(f"Анкет заполнено: {test.completed_questionnaires}/{users}")
+    print(f"SQL-запросов вне апдейтов (буфер активности и т.п.): {test.queries['background']}")
+    print(f"Вызовы Bot API: {dict(test.api.calls.most_common())}")
+    print(f"Лаг event loop: max={loop_monitor.max_lag * 1000:.1f}ms, блокировок: {loop_monitor.blocks}")
+    print(f"Очередь отправки: {send_scheduler.stats()}")
+    for scenario, errors in test.errors.items():
+        if errors:
+            print(f"Ошибки {scenario}: {dict(errors)}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота с фейковым Bot API")
+    parser.add_argument("--users", type=int, default=50, help="Виртуальных пользователей")
+    parser.add_argument("--iterations", type=int, default=3, help="Сколько раз каждый запрашивает план и питание")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="За сколько секунд подключаются все пользователи")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Пауза пользователя между шагами, сек (±50%%)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Сколько ждать обработки шага")
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--api-port", type=int, default=8090, help="Порт фейкового Bot API")
+    parser.add_argument("--webhook-port", type=int, default=8091)
+    parser.add_argument("--workers", type=int, default=8, help="Обработчиков очереди в режиме webhook")
+    parser.add_argument("--send-rate", type=float, default=None, help="Общий лимит отправки, сообщений/с (по умолчанию SEND_RATE_PER_SECOND)")
+    parser.add_argument("--id-base", type=int, default=7_000_000_000, help="telegram_id первого пользователя теста")
+    parser.add_argument("--keep-users", action="store_true", help="Не удалять пользователей теста после прогона")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> LoadTest:
+    """
+    Прогон: пользователи теста, фейковый Bot API, бот и сценарии. Возвращает результаты
+    """
+    if args.send_rate:
+        send_scheduler.set_rate(args.send_rate)
+
+    telegram_ids = [args.id_base + index for index in range(args.users)]
+    last_id = telegram_ids[-1]
+
+    await create_tables()
+    await delete_users(args.id_base, last_id)
+    await seed_users(telegram_ids)
+    async with async_session_maker() as session:
+        plans = await session.scalar(select(func.count()).select_from(WorkoutPlan).where(WorkoutPlan.is_active == True))
+    if not plans:
+        print("В базе нет активных планов — «Мой план» проверит только ветку «план не найден» (см. scripts/add_test_data.py)")
+
+    api = FakeBotAPI()
+    api_runner = await start_fake_api(api, "127.0.0.1", args.api_port)
+    bot = create_bot("123456789:LOAD-TEST-TOKEN", api_url=f"http://127.0.0.1:{args.api_port}")
+    dp, storage = create_dispatcher()
+    tracker = UpdateTracker()
+    dp.update.outer_middleware(tracker)
+
+    test = LoadTest(api, tracker, timeout=args.timeout, think_time=args.think_time)
+    test.count_queries()
+    activity_buffer.start()
+    loop_monitor.start()
+
+    if args.mode == "webhook":
+        bot_task = asyncio.create_task(run_webhook(
+            dp,
+            bot,
+            host="127.0.0.1",
+            port=args.webhook_port,
+            path="/webhook",
+            webhook_url=f"http://127.0.0.1:{args.webhook_port}/webhook",
+            workers=args.workers,
+        ))
+    else:
+        bot_task = asyncio.create_task(dp.start_polling(bot, handle_signals=False))
+
+    print(f"Запуск: {args.users} пользователей, режим {args.mode}")
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            VirtualUser(test, telegram_id).run(args.iterations, args.ramp_up) for telegram_id in telegram_ids
+        ))
+        duration = time.perf_counter() - started
+    finally:
+        if args.mode == "polling" and not bot_task.done():
+            await dp.stop_polling()
+        bot_task.cancel()
+        await asyncio.gather(bot_task, return_exceptions=True)
+        await activity_buffer.stop()
+        await loop_monitor.stop()
+        await api.close()
+        await api_runner.cleanup()
+        await storage.close()
+        await bot.session.close()
+
+    report(test, args.users, duration)
+
+    if not args.keep_users:
+        deleted = await delete_users(args.id_base, last_id)
+        print(f"Удалено пользователей теста: {deleted}")
+    return test
+
+
+async def main():
+    args = parse_args()
+    # Строка лога на апдейт заметно нагружает процесс — по умолчанию только предупреждения
+    setup_logging(level=args.log_level)
+    try:
+        await run(args)
+    finally:
+        await replica_router.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
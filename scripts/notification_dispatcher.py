@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Диспетчер уведомлений: рассылает наступившие уведомления из таблицы notifications.
+Обычно диспетчер работает внутри процесса бота (NOTIFICATIONS_IN_BOT=True;
+у супервизора — в воркере 0) и делит с ним лимит отправки. Скрипт — для разовой
+обработки (--once) или отдельного запуска при NOTIFICATIONS_IN_BOT=False; у него свой
+лимит SEND_RATE_PER_SECOND, поэтому боту и скрипту лимит нужно поделить вручную
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from src.bot.app import create_bot
+from src.services.notifications import create_notification_dispatcher
+from src.utils.logging_setup import setup_logging
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Рассылка запланированных уведомлений")
+    parser.add_argument("--once", action="store_true", help="обработать одну пачку и выйти")
+    args = parser.parse_args()
+    setup_logging()
+
+    token = os.getenv("BOT_TOKEN")
+    if not token:
+        print("BOT_TOKEN не задан")
+        return
+
+    bot = create_bot(token)
+    dispatcher = create_notification_dispatcher(bot)
+    try:
+        if args.once:
+            processed = await dispatcher.dispatch_batch()
+            print(f"Обработано уведомлений: {processed}")
+        else:
+            await dispatcher.run()
+    finally:
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Скрипт для пакетного подбора планов пользователям (заполняет user_plan_matches)
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from src.services.rematch import rematch_profiles
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Пакетный подбор планов тренировок и питания")
+    parser.add_argument("--full", action="store_true", help="пересчитать все профили, игнорируя отметку прошлого запуска")
+    parser.add_argument("--chunk-size", type=int, default=500, help="сколько профилей обрабатывать за один проход")
+    args = parser.parse_args()
+
+    processed = await rematch_profiles(full=args.full, chunk_size=args.chunk_size)
+    print(f"Обработано профилей: {processed}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    asyncio.run(main())
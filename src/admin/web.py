@@ -1,15 +1,33 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, HTTPException, Query, status
+from fastapi.responses import Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqladmin import Admin, ModelView
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from wtforms import TextAreaField
 
 from src.database.models import User, UserProfile, Subscription, WorkoutPlan, MealPlan, UserDailyLog, Notification
-from src.database.session import engine, async_session_maker
+from src.database.routing import RoutingSession
+from src.database.session import engine, async_session_maker, replica_router
 from src.database.repositories.subscription_repo import SubscriptionRepository
+from src.services.metrics import CONTENT_TYPE, metrics_registry, register_db_metrics
+from src.services.plan_catalog import notify_plans_changed
+from src.services.profiler import PROFILE_CHANNEL
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Следим за репликами, чтобы списки не читались с недоступной или отставшей
+    replica_monitor = asyncio.create_task(replica_router.monitor()) if replica_router.replicas else None
+    yield
+    if replica_monitor:
+        replica_monitor.cancel()
+    await replica_router.dispose()
 
 # Создаем FastAPI приложение
-app = FastAPI(title="FitPlanBot Admin", version="1.0.0")
+app = FastAPI(title="FitPlanBot Admin", version="1.0.0", lifespan=lifespan)
 
 # Простая аутентификация по токену
 security = HTTPBearer()
@@ -24,8 +42,28 @@ async def authenticate(credentials: HTTPAuthorizationCredentials = Depends(secur
         )
     return credentials.credentials
 
-# Создаем SQLAdmin
-admin = Admin(app, engine)
+async def notify_subscription_changed(user_id):
+    """Отправляет боту уведомление об изменении подписки пользователя"""
+    async with async_session_maker() as session:
+        await SubscriptionRepository(session).notify_changed(user_id)
+        await session.commit()
+
+async def notify_plan_changed():
+    """Отправляет боту уведомление об изменении планов — бот перезагрузит каталог"""
+    async with async_session_maker() as session:
+        await notify_plans_changed(session)
+        await session.commit()
+
+# Создаем SQLAdmin: списки и карточки читаются с реплик, сохранение идёт в primary
+admin = Admin(
+    app,
+    session_maker=async_sessionmaker(
+        engine,
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        router=replica_router,
+    ),
+)
 
 # Модель администратора для пользователей
 class UserAdmin(ModelView, model=User):
@@ -38,6 +76,7 @@ class UserAdmin(ModelView, model=User):
         User.is_active,
         User.is_blocked,
         User.created_at,
+        User.last_seen_at,
     ]
     column_details_list = [
         User.id,
@@ -51,6 +90,7 @@ class UserAdmin(ModelView, model=User):
         User.is_blocked,
         User.created_at,
         User.updated_at,
+        User.last_seen_at,
     ]
     column_searchable_list = [User.telegram_username, User.first_name, User.last_name]
     column_sortable_list = [User.created_at, User.telegram_id]
@@ -142,14 +182,23 @@ class SubscriptionAdmin(ModelView, model=Subscription):
             data['status'] = 'active'
             data['activated_by_admin'] = True
             # Устанавливаем даты активации
-            from datetime import datetime, timedelta
-            now = datetime.utcnow()
+            from datetime import datetime, timedelta, timezone
+            now = datetime.now(timezone.utc)
             data['activated_at'] = now
             data['starts_at'] = now
             data['ends_at'] = now + timedelta(days=30)
 
         return await super().on_model_change(data, model, is_created, request)
 
+    async def after_model_change(self, data, model, is_created, request):
+        """Сбрасываем кэш прав доступа бота после сохранения подписки"""
+        await notify_subscription_changed(model.user_id)
+        return await super().after_model_change(data, model, is_created, request)
+
+    async def after_model_delete(self, model, request):
+        await notify_subscription_changed(model.user_id)
+        return await super().after_model_delete(model, request)
+
 # Модель администратора для планов тренировок
 class WorkoutPlanAdmin(ModelView, model=WorkoutPlan):
     column_list = [
@@ -192,6 +241,15 @@ class WorkoutPlanAdmin(ModelView, model=WorkoutPlan):
         'created_by_admin': 'Создано администратором',
     }
 
+    async def after_model_change(self, data, model, is_created, request):
+        """Сбрасываем каталог планов бота после сохранения плана"""
+        await notify_plan_changed()
+        return await super().after_model_change(data, model, is_created, request)
+
+    async def after_model_delete(self, model, request):
+        await notify_plan_changed()
+        return await super().after_model_delete(model, request)
+
 # Модель администратора для планов питания
 class MealPlanAdmin(ModelView, model=MealPlan):
     column_list = [
@@ -228,6 +286,15 @@ class MealPlanAdmin(ModelView, model=MealPlan):
         'image_file_paths': 'Пути к изображениям (JSON массив)',
     }
 
+    async def after_model_change(self, data, model, is_created, request):
+        """Сбрасываем каталог планов бота после сохранения плана"""
+        await notify_plan_changed()
+        return await super().after_model_change(data, model, is_created, request)
+
+    async def after_model_delete(self, model, request):
+        await notify_plan_changed()
+        return await super().after_model_delete(model, request)
+
 # Модель администратора для логов активности
 class UserDailyLogAdmin(ModelView, model=UserDailyLog):
     column_list = [
@@ -296,6 +363,27 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+# Метрики админки: пулы соединений к БД (формат Prometheus)
+register_db_metrics(
+    metrics_registry,
+    {"primary": engine, **{f"replica_{index}": replica for index, replica in enumerate(replica_router.replicas)}},
+)
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=metrics_registry.render(), media_type=CONTENT_TYPE)
+
+@app.post("/profile")
+async def profile_bot(seconds: float = Query(30, gt=0, le=600), token: str = Depends(authenticate)):
+    """
+    Включает профилирование всех процессов бота на seconds секунд (через NOTIFY).
+    Каждый процесс пишет collapsed stacks в свой PROFILE_DIR: profile-<pid>-<время>.folded
+    """
+    async with engine.connect() as conn:
+        await conn.execute(select(func.pg_notify(PROFILE_CHANNEL, str(seconds))))
+        await conn.commit()
+    return {"status": "started", "seconds": seconds}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
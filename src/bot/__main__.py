@@ -1,51 +1,22 @@
 import asyncio
 import os
 import logging
-import sys
 from dotenv import load_dotenv
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.types import BotCommand
-from aiogram_dialog import setup_dialogs
-# Импортируем настройки БД
-from src.database.session import engine, Base
-# Импортируем middleware
-from src.bot.middlewares.logging import LoggingMiddleware
-from src.bot.middlewares.stats import StatsMiddleware
-from src.bot.middlewares.acl import ACLMiddleware
+from src.bot.app import create_bot, create_dispatcher, create_notification_listener, create_tables, setup_bot_commands
+from src.database.session import replica_router
+from src.bot.metrics import register_bot_metrics, serve_metrics
+from src.services.activity import activity_buffer
+from src.services.loop_monitor import loop_monitor
+from src.services.notifications import create_notification_dispatcher
+from src.services.profiler import profiler
+from src.utils.logging_setup import setup_logging
 load_dotenv()
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    stream=sys.stdout
-)
+# Настройка логирования (LOG_LEVEL, LOG_FORMAT, LOG_ASYNC, LOG_SAMPLE_RATES)
+setup_logging()
 
 logger = logging.getLogger(__name__)
 
-async def setup_bot_commands(bot: Bot):
-    """
-    Устанавливает команды бота в меню Telegram
-    """
-    commands = [
-        BotCommand(command="/start", description="Начать работу с ботом"),
-        BotCommand(command="/help", description="Помощь и инструкции"),
-        BotCommand(command="/profile", description="Мой профиль"),
-        BotCommand(command="/cancel", description="Отменить текущее действие"),
-    ]
-    await bot.set_my_commands(commands)
-    logger.info("Bot commands set up")
-
-async def create_tables():
-    """
-    Создаёт таблицы в БД (для разработки)
-    """
-    async with engine.begin() as conn:
-        # await conn.run_sync(Base.metadata.drop_all)  # Осторожно: удаляет все таблицы!
-        await conn.run_sync(Base.metadata.create_all)
-    logger.info("Database tables created/verified")
-
 async def main():
     logger.info("Starting FitPlanBot...")
     
@@ -59,43 +30,69 @@ async def main():
     await create_tables()
     
     # Создаём бота и диспетчер
-    bot = Bot(token=token)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
-    
-    # Регистрируем middleware
-    dp.update.middleware(LoggingMiddleware())
-    dp.update.middleware(StatsMiddleware())
-    dp.update.middleware(ACLMiddleware())
-    
-    logger.info("Middlewares registered")
+    bot = create_bot(token)
+    dp, storage = create_dispatcher()
     
     # Настраиваем команды бота
     await setup_bot_commands(bot)
     
-    # Импортируем и подключаем роутеры
-    from src.bot.handlers.start import router as start_router
-    from src.bot.handlers.menu import router as menu_router
-    from src.bot.handlers.profile import router as profile_router
-    from src.bot.handlers.workouts import router as workouts_router
+    logger.info("Bot is starting...")
 
-    dp.include_router(start_router)
-    dp.include_router(menu_router)
-    dp.include_router(profile_router)
-    dp.include_router(workouts_router)
-    
-    logger.info("Routers included")
-    logger.info("Bot is starting polling...")
-    
-    from src.bot.dialogs.questionnaire import questionnaire_dialog
-    
-    dp.include_router(questionnaire_dialog)
-    setup_dialogs(dp)
+    # Уведомления админки: подписки, правка планов, профилирование — на одном соединении
+    listener_task = asyncio.create_task(create_notification_listener().run())
+    replica_monitor = asyncio.create_task(replica_router.monitor()) if replica_router.replicas else None
+    activity_buffer.start()
+    if os.getenv("LOOP_MONITOR", "True").lower() in ("1", "true", "yes"):
+        loop_monitor.start()
+    # Рассылка уведомлений идёт через тот же send_scheduler, что и ответы, и делит с ними лимит
+    notification_task = (
+        asyncio.create_task(create_notification_dispatcher(bot).run())
+        if os.getenv("NOTIFICATIONS_IN_BOT", "True").lower() in ("1", "true", "yes") else None
+    )
+    # Профилирование по запросу: POST /profile в админке или SIGUSR1 процессу
+    profiler.start()
+
+    register_bot_metrics()
+    metrics_port = os.getenv("METRICS_PORT")
+    metrics_server = (
+        asyncio.create_task(serve_metrics(os.getenv("METRICS_HOST", "0.0.0.0"), int(metrics_port)))
+        if metrics_port else None
+    )
     try:
-        await dp.start_polling(bot)
+        if os.getenv("BOT_MODE", "polling") == "webhook":
+            from src.bot.webhook import run_webhook
+
+            await run_webhook(
+                dp,
+                bot,
+                host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+                port=int(os.getenv("WEBHOOK_PORT", "8081")),
+                path=os.getenv("WEBHOOK_PATH", "/webhook"),
+                webhook_url=os.getenv("WEBHOOK_URL"),
+                secret_token=os.getenv("WEBHOOK_SECRET") or None,
+                workers=int(os.getenv("WEBHOOK_WORKERS", "8")),
+                queue_size=int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000")),
+                enqueue_timeout=float(os.getenv("WEBHOOK_ENQUEUE_TIMEOUT", "1.0")),
+            )
+        else:
+            await dp.start_polling(bot)
     except Exception as e:
-        logger.error(f"Polling error: {e}")
+        logger.error(f"Bot error: {e}")
     finally:
+        # Активность из памяти записываем до закрытия соединений
+        await activity_buffer.stop()
+        if notification_task:
+            notification_task.cancel()
+            await asyncio.gather(notification_task, return_exceptions=True)
+        await loop_monitor.stop()
+        await profiler.stop()
+        listener_task.cancel()
+        if replica_monitor:
+            replica_monitor.cancel()
+        if metrics_server:
+            metrics_server.cancel()
+        await replica_router.dispose()
+        await storage.close()
         await bot.session.close()
         logger.info("Bot stopped")
 
@@ -0,0 +1,133 @@
+"""
+Сборка бота: бот, диспетчер с middleware и роутерами, хранилище FSM, слушатель уведомлений.
+Общие для точек входа src.bot (один процесс) и src.bot.supervisor (несколько процессов)
+"""
+import os
+import logging
+from typing import Optional
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import BotCommand
+from aiogram_dialog import setup_dialogs
+# Импортируем настройки БД
+from src.database.listener import NotificationListener
+from src.database.session import engine, replica_router, Base
+# Импортируем middleware
+from src.bot.middlewares.logging import LoggingMiddleware
+from src.bot.middlewares.stats import StatsMiddleware, HandlerStatsMiddleware
+from src.bot.middlewares.db import DbSessionMiddleware
+from src.bot.middlewares.acl import ACLMiddleware
+from src.bot.middlewares.activity import ActivityMiddleware
+from src.bot.send_scheduler import send_scheduler
+from src.database.repositories.subscription_repo import SUBSCRIPTION_CHANGES_CHANNEL
+from src.services.entitlements import entitlement_cache, watch_subscription_changes
+from src.services.plan_catalog import PLAN_CHANGES_CHANNEL, plan_catalog, watch_plan_changes
+from src.services.profiler import PROFILE_CHANNEL, profiler, watch_profile_requests
+
+logger = logging.getLogger(__name__)
+
+async def setup_bot_commands(bot: Bot):
+    """
+    Устанавливает команды бота в меню Telegram
+    """
+    commands = [
+        BotCommand(command="/start", description="Начать работу с ботом"),
+        BotCommand(command="/help", description="Помощь и инструкции"),
+        BotCommand(command="/profile", description="Мой профиль"),
+        BotCommand(command="/cancel", description="Отменить текущее действие"),
+    ]
+    await bot.set_my_commands(commands)
+    logger.info("Bot commands set up")
+
+async def create_tables():
+    """
+    Создаёт таблицы в БД (для разработки)
+    """
+    async with engine.begin() as conn:
+        # await conn.run_sync(Base.metadata.drop_all)  # Осторожно: удаляет все таблицы!
+        await conn.run_sync(Base.metadata.create_all)
+    logger.info("Database tables created/verified")
+
+def create_bot(token: str, api_url: Optional[str] = None) -> Bot:
+    """
+    Создаёт бота, все исходящие сообщения которого идут через планировщик отправки.
+    api_url (по умолчанию BOT_API_URL) — свой сервер Bot API вместо api.telegram.org:
+    локальный telegram-bot-api или фейковый сервер нагрузочного теста
+    """
+    api_url = api_url or os.getenv("BOT_API_URL")
+    session = AiohttpSession(api=TelegramAPIServer.from_base(api_url)) if api_url else None
+    bot = Bot(token=token, session=session)
+    bot.session.middleware(send_scheduler)
+    return bot
+
+def create_fsm_storage():
+    """
+    Создаёт хранилище FSM/диалогов.
+    FSM_STORAGE=redis — состояние переживает рестарт и доступно нескольким процессам бота
+    """
+    if os.getenv("FSM_STORAGE", "memory") == "redis":
+        from src.bot.storage import PackedRedisStorage
+
+        ttl = int(os.getenv("FSM_TTL_SECONDS", "86400"))
+        storage = PackedRedisStorage.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"), ttl=ttl)
+        logger.info(f"Using Redis FSM storage (ttl={ttl}s)")
+        return storage, storage.create_isolation()
+
+    return MemoryStorage(), None
+
+def create_dispatcher():
+    """
+    Создаёт диспетчер с middleware, роутерами и диалогами.
+    Возвращает (dp, storage)
+    """
+    storage, events_isolation = create_fsm_storage()
+    dp = Dispatcher(storage=storage, events_isolation=events_isolation)
+    
+    # Регистрируем middleware
+    dp.update.middleware(LoggingMiddleware())
+    dp.update.middleware(StatsMiddleware())
+    dp.update.middleware(ActivityMiddleware())
+    # Сессия БД должна быть открыта до ACL — он проверяет подписку в той же сессии
+    dp.update.middleware(DbSessionMiddleware())
+    dp.update.middleware(ACLMiddleware())
+    # Время хэндлеров: на уровне событий middleware применяется и ко вложенным роутерам
+    dp.message.middleware(HandlerStatsMiddleware("message"))
+    dp.callback_query.middleware(HandlerStatsMiddleware("callback_query"))
+    
+    logger.info("Middlewares registered")
+    
+    # Импортируем и подключаем роутеры
+    from src.bot.handlers.start import router as start_router
+    from src.bot.handlers.menu import router as menu_router
+    from src.bot.handlers.profile import router as profile_router
+    from src.bot.handlers.workouts import router as workouts_router
+
+    dp.include_router(start_router)
+    dp.include_router(menu_router)
+    dp.include_router(profile_router)
+    dp.include_router(workouts_router)
+    
+    logger.info("Routers included")
+    
+    from src.bot.dialogs.questionnaire import questionnaire_dialog
+    
+    dp.include_router(questionnaire_dialog)
+    setup_dialogs(dp, events_isolation=events_isolation)
+    return dp, storage
+
+def create_notification_listener() -> NotificationListener:
+    """
+    Слушатель уведомлений админки для процесса бота (одно соединение на все каналы):
+    сброс кэша прав доступа при активации подписок (пользователь с новой подпиской
+    ненадолго читает с primary — реплика могла не догнать), перезагрузка каталога
+    после правки планов и профилирование по запросу (POST /profile в админке)
+    """
+    listener = NotificationListener(engine)
+    watch_subscription_changes(
+        listener, SUBSCRIPTION_CHANGES_CHANNEL, entitlement_cache, on_change=replica_router.mark_write
+    )
+    watch_plan_changes(listener, PLAN_CHANGES_CHANNEL, plan_catalog)
+    watch_profile_requests(listener, PROFILE_CHANNEL, profiler)
+    return listener
@@ -1,11 +1,10 @@
 from typing import Any
-from datetime import datetime
+from datetime import datetime, timezone
 import logging
 from aiogram.types import CallbackQuery
 from aiogram_dialog import DialogManager
 from aiogram_dialog.widgets.input import MessageInput
 from aiogram_dialog.widgets.kbd import Button
-from sqlalchemy import select
 
 logger = logging.getLogger(__name__)
 
@@ -13,8 +12,7 @@ from src.utils.validators import (
     validate_age, validate_height, validate_weight, validate_sleep_hours,
     validate_training_time, validate_training_days, validate_date
 )
-from src.database.session import async_session_maker
-from src.database.models import User, UserProfile
+from src.database.repositories.user_repo import UserRepository
 
 
 async def on_age_selected(
@@ -520,59 +518,37 @@ async def on_confirmation_save(
     # Объединяем данные с дефолтами
     data_with_defaults = {**defaults, **data}
     
-    async with async_session_maker() as session:
-        # Находим пользователя
-        stmt_user = select(User).where(User.telegram_id == user_id)
-        result = await session.execute(stmt_user)
-        user = result.scalar_one_or_none()
-        
-        if not user:
+    # Общая сессия апдейта из DbSessionMiddleware
+    session = dialog_manager.middleware_data["session"]
+
+    # Устанавливаем флаг завершения
+    fields = {**data_with_defaults, "profile_completed": True, "completed_at": datetime.now(timezone.utc)}
+
+    try:
+        # Один запрос: поиск пользователя и вставка/обновление анкеты (ON CONFLICT)
+        profile = await UserRepository(session).save_profile(user_id, fields)
+        if not profile:
             await callback.answer("❌ Пользователь не найден!")
             return
-        
-        # Проверяем, есть ли уже профиль
-        stmt_profile = select(UserProfile).where(UserProfile.user_id == user.id)
-        result = await session.execute(stmt_profile)
-        profile = result.scalar_one_or_none()
-        
-        if profile:
-            # Обновляем существующий профиль
-            for key, value in data_with_defaults.items():
-                if hasattr(profile, key):
-                    setattr(profile, key, value)
-            profile.updated_at = datetime.utcnow()
-        else:
-            # Создаём новый профиль
-            profile = UserProfile(
-                user_id=user.id,
-                **{k: v for k, v in data_with_defaults.items() if hasattr(UserProfile, k)}
-            )
-            session.add(profile)
-        
-        # Устанавливаем флаг завершения
-        profile.profile_completed = True
-        profile.completed_at = datetime.utcnow()
-        
-        try:
-            await session.commit()
-            logger.info(f"Profile saved successfully for user {user_id}")
-            await callback.answer("✅ Анкета сохранена!")
-
-            # Завершаем диалог
-            await dialog_manager.done()
-
-            # Показываем сообщение об успешном сохранении
-            await callback.message.answer(
-                "🎉 <b>Анкета успешно сохранена!</b>\n\n"
-                "Теперь вы можете получить персонализированный план тренировок и питания.\n\n"
-                "Нажмите <b>🏋️ Мой план</b> для получения тренировочного плана.",
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            await session.rollback()
-            logger.error(f"Error saving profile for user {user_id}: {e}")
-            logger.error(f"Data being saved: {data_with_defaults}")
-            await callback.answer("❌ Ошибка при сохранении анкеты!")
+
+        logger.info(f"Profile saved successfully for user {user_id}")
+        await callback.answer("✅ Анкета сохранена!")
+
+        # Завершаем диалог
+        await dialog_manager.done()
+
+        # Показываем сообщение об успешном сохранении
+        await callback.message.answer(
+            "🎉 <b>Анкета успешно сохранена!</b>\n\n"
+            "Теперь вы можете получить персонализированный план тренировок и питания.\n\n"
+            "Нажмите <b>🏋️ Мой план</b> для получения тренировочного плана.",
+            parse_mode="HTML"
+        )
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Error saving profile for user {user_id}: {e}")
+        logger.error(f"Data being saved: {data_with_defaults}")
+        await callback.answer("❌ Ошибка при сохранении анкеты!")
 
 async def on_confirmation_edit(
     callback: CallbackQuery,
@@ -1,9 +1,9 @@
 from aiogram import Router, types, F
 from aiogram_dialog import DialogManager
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from src.database.session import async_session_maker
 from src.database.models import User, UserProfile
 from src.bot.keyboards.main_menu import get_main_menu_kb
 
@@ -18,29 +18,28 @@ async def start_questionnaire(message: types.Message, dialog_manager: DialogMana
         mode=StartMode.RESET_STACK
     )
 
-async def get_profile_info(user_id: int):
+async def get_profile_info(session: AsyncSession, user_id: int):
     """
     Получает информацию о профиле пользователя
     Возвращает (user, profile)
     """
-    async with async_session_maker() as session:
-        stmt = select(User).where(User.telegram_id == user_id).options(
-            selectinload(User.profile)
-        )
-        result = await session.execute(stmt)
-        db_user = result.scalar_one_or_none()
-        
-        if not db_user:
-            return None, None
-        
-        profile = db_user.profile
-        return db_user, profile
+    stmt = select(User).where(User.telegram_id == user_id).options(
+        selectinload(User.profile)
+    )
+    result = await session.execute(stmt)
+    db_user = result.scalar_one_or_none()
+    
+    if not db_user:
+        return None, None
+    
+    profile = db_user.profile
+    return db_user, profile
 
-async def show_profile(user_id: int, first_name: str):
+async def show_profile(session: AsyncSession, user_id: int, first_name: str):
     """
     Формирует текст профиля для показа
     """
-    db_user, profile = await get_profile_info(user_id)
+    db_user, profile = await get_profile_info(session, user_id)
     
     if not db_user:
         return "❌ Вы ещё не зарегистрированы. Нажмите /start для начала работы."
@@ -104,8 +103,8 @@ async def show_profile(user_id: int, first_name: str):
 
 # Хэндлер для кнопки "👤 Мой профиль"
 @router.message(F.text == "👤 Мой профиль")
-async def profile_menu_button(message: types.Message):
-    profile_text = await show_profile(message.from_user.id, message.from_user.first_name)
+async def profile_menu_button(message: types.Message, session: AsyncSession):
+    profile_text = await show_profile(session, message.from_user.id, message.from_user.first_name)
     await message.answer(
         text=profile_text,
         parse_mode="HTML",
@@ -129,45 +128,43 @@ async def show_settings(message: types.Message):
     )
 
 @router.message(F.text == "💳 Купить подписку")
-async def show_subscription(message: types.Message):
+async def show_subscription(message: types.Message, session: AsyncSession):
     from src.database.repositories.subscription_repo import SubscriptionRepository
     from src.database.repositories.user_repo import UserRepository
-    from src.database.session import async_session_maker
 
     telegram_id = message.from_user.id
 
-    async with async_session_maker() as session:
-        user_repo = UserRepository(session)
-        user = await user_repo.get_by_telegram_id(telegram_id)
-
-        if not user:
-            await message.answer(
-                "❌ <b>Пользователь не найден</b>\n\n"
-                "Сначала зарегистрируйтесь с помощью /start",
-                parse_mode="HTML"
-            )
-            return
-
-        repo = SubscriptionRepository(session)
-        subscription = await repo.create_pending(user.id)
-
-        if subscription:
-            await message.answer(
-                "💳 <b>Заявка на подписку отправлена!</b>\n\n"
-                f"📅 <b>Статус:</b> Ожидает подтверждения\n"
-                f"🆔 <b>ID заявки:</b> {subscription.id}\n\n"
-                "Администратор рассмотрит вашу заявку и активирует подписку.\n"
-                "После активации вы получите доступ ко всем функциям бота:\n"
-                "✅ Персональные планы тренировок\n"
-                "✅ Индивидуальное питание\n"
-                "✅ Ежедневные уведомления\n"
-                "✅ Отслеживание прогресса\n\n"
-                "<i>Обычно активация занимает не более 24 часов.</i>",
-                parse_mode="HTML"
-            )
-        else:
-            await message.answer(
-                "❌ <b>Ошибка при создании заявки</b>\n\n"
-                "Попробуйте позже или свяжитесь с поддержкой.",
-                parse_mode="HTML"
-            )
+    user_repo = UserRepository(session)
+    user = await user_repo.get_by_telegram_id(telegram_id)
+
+    if not user:
+        await message.answer(
+            "❌ <b>Пользователь не найден</b>\n\n"
+            "Сначала зарегистрируйтесь с помощью /start",
+            parse_mode="HTML"
+        )
+        return
+
+    repo = SubscriptionRepository(session)
+    subscription = await repo.create_pending(user.id)
+
+    if subscription:
+        await message.answer(
+            "💳 <b>Заявка на подписку отправлена!</b>\n\n"
+            f"📅 <b>Статус:</b> Ожидает подтверждения\n"
+            f"🆔 <b>ID заявки:</b> {subscription.id}\n\n"
+            "Администратор рассмотрит вашу заявку и активирует подписку.\n"
+            "После активации вы получите доступ ко всем функциям бота:\n"
+            "✅ Персональные планы тренировок\n"
+            "✅ Индивидуальное питание\n"
+            "✅ Ежедневные уведомления\n"
+            "✅ Отслеживание прогресса\n\n"
+            "<i>Обычно активация занимает не более 24 часов.</i>",
+            parse_mode="HTML"
+        )
+    else:
+        await message.answer(
+            "❌ <b>Ошибка при создании заявки</b>\n\n"
+            "Попробуйте позже или свяжитесь с поддержкой.",
+            parse_mode="HTML"
+        )
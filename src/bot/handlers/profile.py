@@ -1,5 +1,6 @@
 from aiogram import Router, types, F
 from aiogram.filters import Command
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.bot.handlers.menu import show_profile
 from src.bot.keyboards.main_menu import get_main_menu_kb
@@ -7,8 +8,8 @@ from src.bot.keyboards.main_menu import get_main_menu_kb
 router = Router()
 
 @router.message(Command("profile"))
-async def profile_command(message: types.Message):
-    profile_text = await show_profile(message.from_user.id, message.from_user.first_name)
+async def profile_command(message: types.Message, session: AsyncSession):
+    profile_text = await show_profile(session, message.from_user.id, message.from_user.first_name)
     await message.answer(
         text=profile_text,
         parse_mode="HTML",
@@ -0,0 +1,100 @@
+"""
+Метрики бота: счётчики и гистограммы апдейтов, кэш прав доступа, пул БД,
+очередь отправки. Выгружаются на /metrics (формат Prometheus).
+"""
+import asyncio
+import logging
+
+from aiohttp import web
+
+from src.services.metrics import CONTENT_TYPE, metrics_registry, register_db_metrics
+
+logger = logging.getLogger(__name__)
+
+updates_total = metrics_registry.counter(
+    "updates_total", "Апдейтов получено, по типу", labels=("type",)
+)
+update_errors_total = metrics_registry.counter(
+    "update_errors_total", "Апдейтов, обработка которых упала с ошибкой", labels=("type",)
+)
+update_duration = metrics_registry.histogram(
+    "update_duration_seconds", "Время обработки апдейта целиком (middleware + хэндлер)", labels=("type",)
+)
+handler_duration = metrics_registry.histogram(
+    "handler_duration_seconds", "Время работы хэндлера", labels=("event", "handler")
+)
+slow_handlers_total = metrics_registry.counter(
+    "slow_handlers_total", "Хэндлеров, работавших дольше SLOW_HANDLER_SECONDS", labels=("event", "handler")
+)
+
+
+def register_bot_metrics():
+    """
+    Метрики, которые читаются из состояния сервисов процесса при выгрузке
+    """
+    from src.bot.send_scheduler import send_scheduler
+    from src.database.session import engine, replica_router
+    from src.services.activity import activity_buffer
+    from src.services.entitlements import entitlement_cache
+
+    engines = {"primary": engine}
+    engines.update({f"replica_{index}": replica for index, replica in enumerate(replica_router.replicas)})
+    register_db_metrics(metrics_registry, engines)
+
+    metrics_registry.callback(
+        "acl_cache_hits_total", "Проверок доступа из кэша", lambda: entitlement_cache.hits, type="counter"
+    )
+    metrics_registry.callback(
+        "acl_cache_misses_total", "Проверок доступа с запросом в БД", lambda: entitlement_cache.misses, type="counter"
+    )
+    metrics_registry.callback("acl_cache_size", "Записей в кэше прав доступа", lambda: len(entitlement_cache))
+
+    metrics_registry.callback("send_queue_depth", "Отправок, ожидающих слот", lambda: send_scheduler.waiting)
+    metrics_registry.callback("send_sent_total", "Отправлено сообщений", lambda: send_scheduler.sent, type="counter")
+    metrics_registry.callback(
+        "send_throttled_total", "Отправок, задержанных лимитами", lambda: send_scheduler.throttled, type="counter"
+    )
+    metrics_registry.callback(
+        "send_retry_after_total", "Ответов RetryAfter от Telegram", lambda: send_scheduler.retry_after_count, type="counter"
+    )
+
+    metrics_registry.callback(
+        "db_reads_total",
+        "Чтений по месту выполнения",
+        lambda: {("replica",): replica_router.replica_reads, ("primary",): replica_router.primary_reads},
+        labels=("target",),
+        type="counter",
+    )
+    metrics_registry.callback("activity_pending", "Пользователей в буфере активности", lambda: activity_buffer.depth)
+
+
+def register_update_queue_metrics(pool):
+    """
+    Очередь апдейтов (UpdateWorkerPool или ProcessRouter супервизора)
+    """
+    metrics_registry.callback("update_queue_depth", "Апдейтов в очереди на обработку", lambda: pool.depth)
+    metrics_registry.callback(
+        "update_queue_dropped_total", "Апдейтов, отклонённых из-за переполнения очереди", lambda: pool.dropped, type="counter"
+    )
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=metrics_registry.render(), headers={"Content-Type": CONTENT_TYPE})
+
+
+async def serve_metrics(host: str, port: int):
+    """
+    Отдельный HTTP-сервер с /metrics (в режиме polling другого HTTP-сервера у бота нет).
+    Работает до отмены
+    """
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info(f"Metrics server listening on {host}:{port}/metrics")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -1,10 +1,12 @@
+import logging
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Update
-from sqlalchemy import select
 
-from src.database.session import async_session_maker
-from src.database.models import Subscription
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.services.entitlements import entitlement_cache, Entitlement
+
+logger = logging.getLogger(__name__)
 
 
 class ACLMiddleware(BaseMiddleware):
@@ -36,33 +38,45 @@ class ACLMiddleware(BaseMiddleware):
         if text in free_buttons:
             return await handler(event, data)
 
-        # Проверяем подписку в БД
-        from src.database.repositories.subscription_repo import SubscriptionRepository
-        from src.database.repositories.user_repo import UserRepository
-        from src.database.session import async_session_maker
-
-        async with async_session_maker() as session:
-            user_repo = UserRepository(session)
-            user = await user_repo.get_by_telegram_id(message.from_user.id)
-
-            if not user:
-                # Пользователь не найден, пропускаем проверку подписки
-                print(f"ACL: User {message.from_user.id} not found, allowing access")
-                return await handler(event, data)
-
-            repo = SubscriptionRepository(session)
-            subscription = await repo.get_active_for_user(user.id)
-
-            if not subscription:
-                print(f"ACL: No active subscription for user {user.id}, blocking access to: {text}")
-                await message.answer(
-                    "❌ <b>Для доступа к этому функционалу нужна активная подписка.</b>\n\n"
-                    "💳 Нажмите <b>'Купить подписку'</b> для отправки заявки на активацию.\n\n"
-                    "<i>После подтверждения администратором вы получите полный доступ ко всем функциям бота.</i>",
-                    parse_mode="HTML"
-                )
-                return
-            else:
-                print(f"ACL: Active subscription found for user {user.id}, allowing access to: {text}")
+        telegram_id = message.from_user.id
+
+        # Сначала смотрим в кэш прав доступа — без запросов в БД
+        entitlement = entitlement_cache.get(telegram_id)
+        if entitlement is None:
+            entitlement = await self._load_entitlement(data["session"], telegram_id)
+
+        if entitlement.user_id is None:
+            # Пользователь не найден, пропускаем проверку подписки
+            return await handler(event, data)
+
+        if not entitlement.has_subscription():
+            logger.info("ACL: no active subscription for user %s, blocking access to: %s", entitlement.user_id, text)
+            await message.answer(
+                "❌ <b>Для доступа к этому функционалу нужна активная подписка.</b>\n\n"
+                "💳 Нажмите <b>'Купить подписку'</b> для отправки заявки на активацию.\n\n"
+                "<i>После подтверждения администратором вы получите полный доступ ко всем функциям бота.</i>",
+                parse_mode="HTML"
+            )
+            return
 
         return await handler(event, data)
+
+    async def _load_entitlement(self, session: AsyncSession, telegram_id: int) -> Entitlement:
+        """
+        Проверяет подписку в БД (в общей сессии апдейта) и сохраняет результат в кэш.
+        Ненайденный пользователь в кэш не попадает
+        """
+        from src.database.repositories.subscription_repo import SubscriptionRepository
+
+        access = await SubscriptionRepository(session).get_access_by_telegram_id(telegram_id)
+
+        if access is None:
+            # «Не найден» не кэшируем: пользователь может появиться в БД в любой момент,
+            # а сбросить такую запись по событию нечем — у неё нет user_id
+            logger.debug("ACL: user %s not found, allowing access", telegram_id)
+            return Entitlement(user_id=None, ends_at=None, expires_at=0.0)
+
+        user_id, ends_at = access
+        if ends_at is not None:
+            logger.debug("ACL: active subscription found for user %s, ends at %s", user_id, ends_at)
+        return entitlement_cache.put(telegram_id, user_id, ends_at)
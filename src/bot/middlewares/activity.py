@@ -0,0 +1,21 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from src.services.activity import activity_buffer
+
+
+class ActivityMiddleware(BaseMiddleware):
+    """
+    Отмечает активность пользователя (username, время визита) в буфере отложенной записи
+    """
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user and not user.is_bot:
+            activity_buffer.record(user.id, user.username)
+        return await handler(event, data)
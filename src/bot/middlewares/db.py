@@ -0,0 +1,40 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.database.session import async_session_maker
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Одна сессия БД на апдейт: middleware и хэндлеры берут её из data["session"].
+    AsyncSession берёт соединение из пула только при первом запросе, поэтому апдейты
+    без обращений к БД пул не трогают. В конце апдейта незавершённая транзакция
+    коммитится, при ошибке — откатывается.
+    """
+    def __init__(self, session_maker: async_sessionmaker[AsyncSession] = async_session_maker):
+        super().__init__()
+        self.session_maker = session_maker
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with self.session_maker() as session:
+            user = data.get("event_from_user")
+            if user:
+                # Ключ для read-your-writes: после записи пользователь читает с primary
+                session.info["user_id"] = user.id
+            data["session"] = session
+            try:
+                result = await handler(event, data)
+            except Exception:
+                await session.rollback()
+                raise
+            # Транзакция открыта, только если хэндлер обращался к БД и сам не закоммитил
+            if session.in_transaction():
+                await session.commit()
+            return result
@@ -3,66 +3,68 @@ import time
 from typing import Callable, Dict, Any, Awaitable
 
 from aiogram import BaseMiddleware
-from aiogram.types import Update, Message, CallbackQuery
+from aiogram.types import Update
+
+from src.bot.metrics import update_duration, update_errors_total
 
 logger = logging.getLogger(__name__)
 
 
+def describe_update(event: Update, event_type: str) -> Dict[str, Any]:
+    """
+    Поля апдейта для структурированного лога (попадают в запись через extra)
+    """
+    fields: Dict[str, Any] = {"event_type": event_type, "update_id": event.update_id}
+    if event.message:
+        message = event.message
+        fields["user_id"] = message.from_user.id if message.from_user else None
+        if message.text:
+            fields["text"] = message.text[:50]
+        else:
+            fields["content_type"] = message.content_type
+    elif event.callback_query:
+        fields["user_id"] = event.callback_query.from_user.id
+        fields["data"] = event.callback_query.data
+    return fields
+
+
 class LoggingMiddleware(BaseMiddleware):
+    """
+    Одна запись на апдейт (после обработки) с его полями и временем обработки.
+    Поля собираются, только если уровень INFO включён; прореживание по event_type —
+    см. LOG_SAMPLE_RATES в src/utils/logging_setup.py
+    """
     async def __call__(
         self,
         handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
         event: Update,
         data: Dict[str, Any]
     ) -> Any:
-        start_time = time.time()
-        
-        # Определяем тип события
-        if event.message:
-            message = event.message
-            user = message.from_user
-            log_message = (
-                f"📨 Message from user_id={user.id} "
-                f"(@{user.username or 'no_username'}): "
-            )
-            
-            if message.text:
-                log_message += f"text='{message.text[:50]}...'"
-            elif message.photo:
-                log_message += f"photo ({len(message.photo)} sizes)"
-            elif message.document:
-                log_message += f"document: {message.document.file_name}"
-            else:
-                log_message += f"type={message.content_type}"
-                
-        elif event.callback_query:
-            callback = event.callback_query
-            user = callback.from_user
-            log_message = (
-                f"🔄 Callback from user_id={user.id} "
-                f"(@{user.username or 'no_username'}): "
-                f"data='{callback.data}'"
-            )
-        elif event.edited_message:
-            log_message = f"✏️ Edited message"
-        elif event.channel_post:
-            log_message = f"📢 Channel post"
-        else:
-            log_message = f"📊 Unknown event type in update"
-        
-        logger.info(log_message)
-        
+        start_time = time.perf_counter()
+        event_type = event.event_type
+
         try:
             # Пропускаем событие дальше по цепочке middleware
             result = await handler(event, data)
-            
-            # Логируем время обработки
-            processing_time = time.time() - start_time
-            logger.info(f"✅ Event processed in {processing_time:.3f}s")
-            
-            return result
-            
         except Exception as e:
-            # Логируем ошибки
-            logger.error(f"❌ Error processing event: {e}", exc_info=True)
-            raise
\ No newline at end of file
+            processing_time = time.perf_counter() - start_time
+            update_duration.observe(processing_time, event_type)
+            update_errors_total.inc(event_type)
+            fields = describe_update(event, event_type)
+            fields["duration_ms"] = round(processing_time * 1000, 2)
+            logger.error(
+                "Error processing %s from user %s: %s", event_type, fields.get("user_id"), e,
+                exc_info=True, extra=fields
+            )
+            raise
+
+        processing_time = time.perf_counter() - start_time
+        update_duration.observe(processing_time, event_type)
+        if logger.isEnabledFor(logging.INFO):
+            fields = describe_update(event, event_type)
+            fields["duration_ms"] = round(processing_time * 1000, 2)
+            logger.info(
+                "%s from user %s processed in %.1fms", event_type, fields.get("user_id"), fields["duration_ms"],
+                extra=fields
+            )
+        return result
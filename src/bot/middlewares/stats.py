@@ -1,29 +1,73 @@
+import logging
+import os
+import time
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
-from aiogram.types import Update
+from aiogram.types import TelegramObject, Update
+
+from src.bot.metrics import handler_duration, slow_handlers_total, updates_total
+from src.services.loop_monitor import loop_monitor
+from src.services.profiler import profiler
+
+logger = logging.getLogger(__name__)
+
+# Хэндлеры дольше этого (сек) логируются как медленные
+SLOW_HANDLER_SECONDS = float(os.getenv("SLOW_HANDLER_SECONDS", "1.0"))
 
 
 class StatsMiddleware(BaseMiddleware):
-    def __init__(self):
-        super().__init__()
-        self.message_count = 0
-        self.callback_count = 0
-    
+    """
+    Считает апдейты по типу (метрика updates_total)
+    """
     async def __call__(
         self,
         handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
         event: Update,
         data: Dict[str, Any]
     ) -> Any:
-        # Собираем статистику
-        if event.message:
-            self.message_count += 1
-        elif event.callback_query:
-            self.callback_count += 1
-        
-        # Можно сохранять статистику в БД или кэш
-        # Пока просто логируем каждые 10 сообщений
-        if self.message_count % 10 == 0 and self.message_count > 0:
-            print(f"📊 Stats: Messages={self.message_count}, Callbacks={self.callback_count}")
-        
-        return await handler(event, data)
\ No newline at end of file
+        updates_total.inc(event.event_type)
+        return await handler(event, data)
+
+
+class HandlerStatsMiddleware(BaseMiddleware):
+    """
+    Время работы хэндлера с разбивкой по хэндлерам (метрика handler_duration_seconds).
+    Регистрируется на уровне событий (message, callback_query): там уже известен хэндлер.
+    Медленные хэндлеры логируются, блокировки event loop внутри хэндлера
+    относятся монитором loop к этому хэндлеру, доля хэндлеров профилируется
+    (PROFILE_HANDLER_SAMPLE_RATE)
+    """
+    def __init__(self, event_name: str):
+        super().__init__()
+        self.event_name = event_name
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__qualname__ if handler_object else "unknown"
+        started = time.perf_counter()
+        try:
+            with loop_monitor.attribute(name), profiler.track(name):
+                return await handler(event, data)
+        finally:
+            duration = time.perf_counter() - started
+            handler_duration.observe(duration, self.event_name, name)
+            if duration >= SLOW_HANDLER_SECONDS:
+                slow_handlers_total.inc(self.event_name, name)
+                user = data.get("event_from_user")
+                # Модуль хэндлера — это и его роутер (по роутеру на модуль в src/bot/handlers)
+                router = handler_object.callback.__module__ if handler_object else "unknown"
+                logger.warning(
+                    "Slow %s handler %s in %s: %.0fms", self.event_name, name, router, duration * 1000,
+                    extra={
+                        "event_type": self.event_name,
+                        "handler": name,
+                        "router": router,
+                        "user_id": user.id if user else None,
+                        "duration_ms": round(duration * 1000, 1),
+                    }
+                )
@@ -0,0 +1,277 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage,
+    ForwardMessage,
+    Response,
+    SendAnimation,
+    SendAudio,
+    SendDocument,
+    SendMediaGroup,
+    SendMessage,
+    SendPhoto,
+    SendSticker,
+    SendVideo,
+    SendVoice,
+    TelegramMethod,
+)
+
+logger = logging.getLogger(__name__)
+
+# Методы, на которые распространяются лимиты Telegram на отправку сообщений
+SEND_METHODS = (
+    SendMessage,
+    SendDocument,
+    SendPhoto,
+    SendMediaGroup,
+    SendVideo,
+    SendAnimation,
+    SendAudio,
+    SendVoice,
+    SendSticker,
+    CopyMessage,
+    ForwardMessage,
+)
+
+# Чем меньше число, тем раньше отправка получает слот
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+_send_priority: contextvars.ContextVar[int] = contextvars.ContextVar("send_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def send_priority(priority: int):
+    """
+    Задаёт приоритет отправок внутри блока.
+    Ответы пользователям идут с PRIORITY_INTERACTIVE, рассылки стоит оборачивать в PRIORITY_BULK
+    """
+    token = _send_priority.set(priority)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Планировщик исходящих сообщений: middleware сессии бота, через который проходят
+    все вызовы Bot API. Для методов отправки соблюдает лимиты Telegram:
+    общий token bucket (~30 сообщений/с) с приоритетами и лимит на чат (1 сообщение/с,
+    в группах — реже; chat_burst > 1 разрешает короткий всплеск сверх него, но Telegram
+    его не гарантирует). На RetryAfter приостанавливает отправку и повторяет запрос.
+    """
+
+    def __init__(
+        self,
+        rate: float = 30.0,
+        chat_interval: float = 1.0,
+        chat_burst: int = 1,
+        group_interval: float = 3.0,
+        max_retries: int = 3,
+        stats_every: int = 100,
+    ):
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        self.chat_interval = chat_interval
+        self.chat_burst = chat_burst
+        self.group_interval = group_interval
+        self.max_retries = max_retries
+        self.stats_every = stats_every
+
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump_task = None
+        # chat_id -> (токены, время обновления); отрицательные токены — уже занятые слоты
+        self._chats: Dict[Any, Tuple[float, float]] = {}
+
+        # Метрики
+        self.waiting = 0
+        self.sent = 0
+        self.throttled = 0
+        self.throttle_delay_total = 0.0
+        self.throttle_delay_max = 0.0
+        self.retry_after_count = 0
+
+    def set_rate(self, rate: float):
+        """Меняет общий лимит (например, делит его между процессами бота)"""
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        self._tokens = min(self._tokens, self.burst)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.waiting,
+            "sent": self.sent,
+            "throttled": self.throttled,
+            "throttle_delay_total": round(self.throttle_delay_total, 3),
+            "throttle_delay_max": round(self.throttle_delay_max, 3),
+            "retry_after": self.retry_after_count,
+        }
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ) -> Response:
+        if not isinstance(method, SEND_METHODS):
+            return await make_request(bot, method)
+
+        chat_id = method.chat_id
+        priority = _send_priority.get()
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, priority)
+            try:
+                response = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after_count += 1
+                self._pause(chat_id, e.retry_after)
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(f"Flood control for chat {chat_id}: retry in {e.retry_after}s (attempt {attempt})")
+                continue
+
+            self.sent += 1
+            if self.sent % self.stats_every == 0:
+                logger.info(f"📤 Send stats: {self.stats()}")
+            return response
+
+    async def _acquire(self, chat_id: Any, priority: int):
+        """
+        Ждёт слот для отправки: сначала в лимите чата, затем в общем лимите
+        """
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            delay = self._reserve_chat(chat_id, started)
+            try:
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self._acquire_global(priority)
+            except BaseException:
+                # Отправку отменили до получения слота — слот чата освобождается
+                self._release_chat(chat_id)
+                raise
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.throttled += 1
+            self.throttle_delay_total += waited
+            self.throttle_delay_max = max(self.throttle_delay_max, waited)
+
+    def _reserve_chat(self, chat_id: Any, now: float) -> float:
+        """
+        Занимает слот в лимите чата и возвращает, сколько до него ждать.
+        Слоты выдаются по порядку, поэтому сообщения в чат уходят в исходной очерёдности
+        """
+        interval = self._chat_interval(chat_id)
+        tokens, updated_at = self._chats.get(chat_id, (float(self.chat_burst), now))
+        tokens = min(float(self.chat_burst), tokens + (now - updated_at) / interval) - 1
+        self._chats[chat_id] = (tokens, now)
+
+        if len(self._chats) > 10000:
+            self._cleanup_chats(now)
+        return max(0.0, -tokens * interval)
+
+    def _release_chat(self, chat_id: Any):
+        """Возвращает слот чата, занятый отменённой отправкой"""
+        entry = self._chats.get(chat_id)
+        if entry is not None:
+            self._chats[chat_id] = (min(float(self.chat_burst), entry[0] + 1), entry[1])
+
+    def _chat_interval(self, chat_id: Any) -> float:
+        # Отрицательный id и @username — группы и каналы, для них лимит строже
+        is_group = isinstance(chat_id, str) or chat_id < 0
+        return self.group_interval if is_group else self.chat_interval
+
+    def _cleanup_chats(self, now: float):
+        """
+        Забывает чаты, у которых лимит полностью восстановился. Чаты с долгом
+        (занятые слоты, пауза после RetryAfter) остаются, даже если давно не отправляли
+        """
+        self._chats = {
+            chat_id: (tokens, updated_at) for chat_id, (tokens, updated_at) in self._chats.items()
+            if tokens + (now - updated_at) / self._chat_interval(chat_id) < self.chat_burst
+        }
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def _acquire_global(self, priority: int):
+        now = time.monotonic()
+        self._refill(now)
+        if not self._waiters and self._tokens >= 1 and now >= self._paused_until:
+            self._tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Слот успели выдать, но отправка отменена — возвращаем токен
+            if future.done() and not future.cancelled():
+                self._tokens += 1
+            raise
+
+    async def _pump(self):
+        """
+        Выдаёт токены ожидающим отправкам в порядке приоритета
+        """
+        while self._waiters:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # Ожидание отменили
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+
+    def _pause(self, chat_id: Any, retry_after: float):
+        """
+        Telegram не сообщает, какой лимит превышен, поэтому паузу соблюдаем
+        и для чата, и для всех отправок
+        """
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + retry_after)
+        self._chats[chat_id] = (-retry_after / self._chat_interval(chat_id), now)
+
+
+# Глобальный экземпляр планировщика
+send_scheduler = SendScheduler(
+    rate=float(os.getenv("SEND_RATE_PER_SECOND", "30")),
+    chat_interval=float(os.getenv("SEND_CHAT_INTERVAL_SECONDS", "1")),
+    chat_burst=int(os.getenv("SEND_CHAT_BURST", "1")),
+    group_interval=float(os.getenv("SEND_GROUP_INTERVAL_SECONDS", "3")),
+    max_retries=int(os.getenv("SEND_MAX_RETRIES", "3")),
+)
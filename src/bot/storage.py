@@ -0,0 +1,176 @@
+import time
+from dataclasses import replace
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Mapping, Optional, Sequence
+import logging
+
+import msgpack
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.redis import RedisEventIsolation
+from redis.asyncio import ConnectionPool, Redis
+
+logger = logging.getLogger(__name__)
+
+# Ключ стека диалогов aiogram_dialog — читается на каждом апдейте вместе с состоянием
+DIALOG_STACK_DESTINY = "aiogd:stack:"
+
+# Типы, которых нет в msgpack, но которые встречаются в dialog_data (даты из анкеты и т.п.)
+_EXT_DATE = 1
+_EXT_DATETIME = 2
+_EXT_DECIMAL = 3
+
+
+def _default(value: Any) -> msgpack.ExtType:
+    if isinstance(value, datetime):
+        return msgpack.ExtType(_EXT_DATETIME, value.isoformat().encode())
+    if isinstance(value, date):
+        return msgpack.ExtType(_EXT_DATE, value.isoformat().encode())
+    if isinstance(value, Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(value).encode())
+    raise TypeError(f"Cannot serialize {type(value).__name__} to FSM storage")
+
+
+def _ext_hook(code: int, payload: bytes) -> Any:
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(payload.decode())
+    if code == _EXT_DATE:
+        return date.fromisoformat(payload.decode())
+    if code == _EXT_DECIMAL:
+        return Decimal(payload.decode())
+    return msgpack.ExtType(code, payload)
+
+
+def pack_data(data: Mapping[str, Any]) -> bytes:
+    """Компактно сериализует данные FSM/диалога (msgpack вместо JSON)"""
+    return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+def unpack_data(raw: bytes) -> Dict[str, Any]:
+    """Восстанавливает данные FSM/диалога"""
+    return msgpack.unpackb(raw, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+class PackedRedisStorage(BaseStorage):
+    """
+    Хранилище FSM и диалогов в Redis.
+    Состояние и данные ключа лежат в одном hash с общим TTL — неактивные диалоги
+    истекают целиком. Запись поля и продление TTL идут одним MULTI-запросом.
+    При чтении состояния тем же запросом подтягивается стек aiogram_dialog,
+    который понадобится дальше на этом же апдейте.
+    Предзагрузка рассчитана на то, что апдейты одного чата обрабатывает один процесс.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        key_builder: Optional[KeyBuilder] = None,
+        ttl: Optional[int] = None,
+        prefetch_destinies: Sequence[str] = (DIALOG_STACK_DESTINY,),
+        prefetch_lifetime: float = 2.0,
+    ):
+        self.redis = redis
+        self.key_builder = key_builder or DefaultKeyBuilder(prefix="fsm", with_destiny=True)
+        self.ttl = ttl
+        self.prefetch_destinies = tuple(prefetch_destinies)
+        self.prefetch_lifetime = prefetch_lifetime
+        # redis-ключ -> (hash, время загрузки); используется один раз
+        self._prefetched: Dict[str, tuple[Dict[bytes, bytes], float]] = {}
+        # redis-ключ -> время последней записи (чтобы не сохранить устаревшую предзагрузку)
+        self._written_at: Dict[str, float] = {}
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> "PackedRedisStorage":
+        return cls(redis=Redis(connection_pool=ConnectionPool.from_url(url)), **kwargs)
+
+    def create_isolation(self, **kwargs: Any) -> RedisEventIsolation:
+        """Блокировки диалогов через Redis — работают между процессами"""
+        return RedisEventIsolation(redis=self.redis, key_builder=self.key_builder, **kwargs)
+
+    async def close(self) -> None:
+        await self.redis.aclose(close_connection_pool=True)
+
+    def _name(self, key: StorageKey) -> str:
+        return self.key_builder.build(key)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        await self._write(key, b"state", state.encode() if state else None)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._read(key, prefetch=True)
+        value = record.get(b"state")
+        return value.decode() if value else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise TypeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        await self._write(key, b"data", pack_data(data) if data else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await self._read(key)
+        value = record.get(b"data")
+        return unpack_data(value) if value else {}
+
+    async def _write(self, key: StorageKey, field: bytes, value: Optional[bytes]):
+        """
+        Записывает поле hash и продлевает TTL одним запросом
+        """
+        name = self._name(key)
+        self._prefetched.pop(name, None)
+        self._written_at[name] = time.monotonic()
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if value is None:
+                # Когда удалено последнее поле, Redis удаляет и сам ключ
+                pipe.hdel(name, field)
+            else:
+                pipe.hset(name, field, value)
+                if self.ttl:
+                    pipe.expire(name, self.ttl)
+            await pipe.execute()
+
+    async def _read(self, key: StorageKey, prefetch: bool = False) -> Dict[bytes, bytes]:
+        """
+        Читает hash ключа. С prefetch=True тем же запросом загружает связанные ключи
+        (стек диалога), чтобы следующие чтения на этом апдейте не ходили в Redis.
+        """
+        name = self._name(key)
+        now = time.monotonic()
+        cached = self._prefetched.pop(name, None)
+        if cached and now - cached[1] < self.prefetch_lifetime:
+            return cached[0]
+
+        names = [name]
+        if prefetch:
+            # aiogram_dialog хранит стек чата под user_id=chat_id
+            for destiny in self.prefetch_destinies:
+                names.append(self._name(replace(key, user_id=key.chat_id, destiny=destiny)))
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for redis_key in names:
+                pipe.hgetall(redis_key)
+            records = await pipe.execute()
+
+        for redis_key, record in zip(names[1:], records[1:]):
+            # Ключ успели перезаписать, пока шёл запрос — предзагрузка устарела
+            if self._written_at.get(redis_key, 0.0) >= now:
+                continue
+            self._prefetched[redis_key] = (record, now)
+
+        self._cleanup(now)
+        return records[0]
+
+    def _cleanup(self, now: float):
+        """Удаляет устаревшие предзагрузки и отметки записей"""
+        if len(self._prefetched) > 1000:
+            self._prefetched = {
+                name: entry for name, entry in self._prefetched.items()
+                if now - entry[1] < self.prefetch_lifetime
+            }
+        if len(self._written_at) > 10000:
+            self._written_at = {
+                name: written for name, written in self._written_at.items()
+                if now - written < 60
+            }
@@ -0,0 +1,316 @@
+"""
+Запуск бота в нескольких процессах: python -m src.bot.supervisor
+
+Супервизор получает апдейты (polling или webhook) и раздаёт их процессам-воркерам
+по user_id: апдейты одного пользователя всегда обрабатывает один и тот же процесс,
+поэтому его FSM-состояние и диалог остаются в одном месте даже с MemoryStorage.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue as queue_module
+import signal
+from multiprocessing.process import BaseProcess
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from src.bot.app import create_bot, create_dispatcher, create_notification_listener, create_tables, setup_bot_commands
+from src.bot.metrics import register_bot_metrics, register_update_queue_metrics, serve_metrics
+from src.bot.send_scheduler import send_scheduler
+from src.bot.webhook import UpdateWorkerPool, create_webhook_app, get_update_shard, serve_webhook
+from src.services.activity import activity_buffer
+from src.services.loop_monitor import loop_monitor
+from src.services.notifications import create_notification_dispatcher
+from src.services.profiler import profiler
+from src.utils.logging_setup import setup_logging
+
+# Настройка логирования (LOG_LEVEL, LOG_FORMAT, LOG_ASYNC, LOG_SAMPLE_RATES); модуль заново
+# импортируется в каждом процессе-воркере, поэтому логирование настраивается и там
+setup_logging()
+
+logger = logging.getLogger(__name__)
+
+# Процессы запускаются через spawn: каждый воркер заново импортирует модули и создаёт
+# собственный engine и пул соединений к БД (при fork он унаследовал бы сокеты родителя)
+_mp = multiprocessing.get_context("spawn")
+
+
+def run_worker(index: int, updates, processes: int, concurrency: int, queue_size: int):
+    """
+    Точка входа процесса-воркера
+    """
+    # Ctrl+C получает вся группа процессов — останавливает воркеры только супервизор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker_main(index, updates, processes, concurrency, queue_size))
+
+
+async def _worker_main(index: int, updates, processes: int, concurrency: int, queue_size: int):
+    from src.database.session import engine, replica_router
+
+    # Общий лимит отправки Telegram делится между процессами поровну
+    send_scheduler.set_rate(send_scheduler.rate / processes)
+    bot = create_bot(os.getenv("BOT_TOKEN"))
+    dp, storage = create_dispatcher()
+    pool = UpdateWorkerPool(dp, bot, workers=concurrency, queue_size=queue_size)
+
+    # У каждого процесса свои кэш прав доступа, каталог планов и профилировщик —
+    # их уведомления из админки процесс слушает на одном соединении
+    listener_task = asyncio.create_task(create_notification_listener().run())
+    replica_monitor = asyncio.create_task(replica_router.monitor()) if replica_router.replicas else None
+    await dp.emit_startup(bot=bot, **pool.workflow_data)
+    pool.start()
+    activity_buffer.start()
+    if os.getenv("LOOP_MONITOR", "True").lower() in ("1", "true", "yes"):
+        loop_monitor.start()
+    # Рассылка уведомлений идёт через тот же send_scheduler, что и ответы, и делит с ними лимит.
+    # Диспетчер один на все процессы — в воркере 0, а не N конкурирующих за строки диспетчеров
+    notification_task = (
+        asyncio.create_task(create_notification_dispatcher(bot).run())
+        if index == 0 and os.getenv("NOTIFICATIONS_IN_BOT", "True").lower() in ("1", "true", "yes") else None
+    )
+    # Профилирование по запросу: POST /profile в админке или SIGUSR1 процессу
+    profiler.start()
+
+    # У каждого воркера свои метрики: порт METRICS_PORT + 1 + номер воркера
+    register_bot_metrics()
+    register_update_queue_metrics(pool)
+    metrics_port = os.getenv("METRICS_PORT")
+    metrics_server = (
+        asyncio.create_task(serve_metrics(os.getenv("METRICS_HOST", "0.0.0.0"), int(metrics_port) + 1 + index))
+        if metrics_port else None
+    )
+    logger.info(f"Worker {index} started (pid={os.getpid()})")
+
+    try:
+        while True:
+            raw = await asyncio.to_thread(updates.get)
+            if raw is None:
+                break
+            update = Update.model_validate_json(raw, context={"bot": bot})
+            # Ждём места в очереди: так переполнение доходит до супервизора
+            await pool.submit(update, timeout=None)
+    finally:
+        await pool.stop()
+        await activity_buffer.stop()
+        if notification_task:
+            notification_task.cancel()
+            await asyncio.gather(notification_task, return_exceptions=True)
+        await loop_monitor.stop()
+        await profiler.stop()
+        listener_task.cancel()
+        if replica_monitor:
+            replica_monitor.cancel()
+        if metrics_server:
+            metrics_server.cancel()
+        await dp.emit_shutdown(bot=bot, **pool.workflow_data)
+        await storage.close()
+        await bot.session.close()
+        await engine.dispose()
+        await replica_router.dispose()
+        logger.info(f"Worker {index} stopped")
+
+
+class ProcessRouter:
+    """
+    Раздаёт апдейты процессам-воркерам по user_id и перезапускает упавшие процессы.
+    Интерфейс совпадает с UpdateWorkerPool, поэтому роутер подходит и для webhook-сервера.
+    """
+
+    def __init__(self, bot: Bot, processes: int, concurrency: int = 8, queue_size: int = 1000):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queues = [_mp.Queue(maxsize=queue_size) for _ in range(processes)]
+        self.processes: List[Optional[BaseProcess]] = [None] * processes
+        self.dropped = 0
+        self._stopping = False
+
+    @property
+    def depth(self) -> int:
+        """Сколько апдейтов ждёт передачи воркерам"""
+        try:
+            return sum(queue.qsize() for queue in self.queues)
+        except NotImplementedError:
+            # qsize() недоступен на macOS
+            return 0
+
+    def start(self):
+        for index in range(len(self.queues)):
+            self._spawn(index)
+        logger.info(f"Started {len(self.queues)} worker processes")
+
+    def _spawn(self, index: int):
+        process = _mp.Process(
+            target=run_worker,
+            args=(index, self.queues[index], len(self.queues), self.concurrency, self.queue_size),
+            name=f"bot-worker-{index}",
+        )
+        process.start()
+        self.processes[index] = process
+
+    async def submit(self, update: Update, timeout: Optional[float] = 0.0) -> bool:
+        """
+        Передаёт апдейт воркеру пользователя. Семантика timeout как у UpdateWorkerPool.submit
+        """
+        queue = self.queues[get_update_shard(update, len(self.queues))]
+        payload = update.model_dump_json(exclude_unset=True)
+        try:
+            # Обычно место в очереди есть — обходимся без перехода в поток
+            queue.put_nowait(payload)
+            return True
+        except queue_module.Full:
+            pass
+
+        try:
+            if timeout is None:
+                await asyncio.to_thread(queue.put, payload)
+            elif timeout > 0:
+                await asyncio.to_thread(queue.put, payload, True, timeout)
+            else:
+                raise queue_module.Full
+            return True
+        except queue_module.Full:
+            self.dropped += 1
+            return False
+
+    async def watch(self, interval: float = 5.0):
+        """
+        Перезапускает упавшие процессы-воркеры. Очередь воркера при этом сохраняется
+        """
+        while not self._stopping:
+            await asyncio.sleep(interval)
+            for index, process in enumerate(self.processes):
+                if process is not None and not process.is_alive() and not self._stopping:
+                    logger.error(f"Worker {index} exited with code {process.exitcode}, restarting")
+                    self._spawn(index)
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        Просит воркеры доработать принятые апдейты и ждёт их завершения.
+        Воркер, который не освободил место в очереди или не завершился за timeout, останавливается принудительно
+        """
+        self._stopping = True
+        await asyncio.gather(*(self._send_stop(queue, timeout) for queue in self.queues))
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            await asyncio.to_thread(process.join, timeout)
+            if process.is_alive():
+                logger.warning(f"Worker {index} did not stop in {timeout}s, terminating")
+                process.terminate()
+                # Непрочитанные апдейты не должны держать выход супервизора
+                self.queues[index].cancel_join_thread()
+        logger.info("Worker processes stopped")
+
+    @staticmethod
+    async def _send_stop(queue, timeout: float):
+        try:
+            queue.put_nowait(None)
+            return
+        except queue_module.Full:
+            pass
+        # Очередь полна (воркер не успевает или упал) — ждём место не дольше timeout
+        try:
+            await asyncio.to_thread(queue.put, None, True, timeout)
+        except queue_module.Full:
+            pass
+
+
+def create_routing_dispatcher(router: ProcessRouter) -> Dispatcher:
+    """
+    Диспетчер супервизора: апдейты не обрабатывает, а передаёт воркерам
+    """
+    dp = Dispatcher()
+
+    async def route(
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]], update: Update, data: Dict[str, Any]
+    ) -> bool:
+        # Ждём места в очереди воркера: если он не успевает, polling притормаживает вместе с ним
+        return await router.submit(update, timeout=None)
+
+    dp.update.outer_middleware(route)
+    return dp
+
+
+async def main():
+    logger.info("Starting FitPlanBot supervisor...")
+
+    token = os.getenv("BOT_TOKEN")
+    if not token:
+        logger.error("BOT_TOKEN not found in .env file!")
+        return
+
+    from src.database.session import engine
+
+    await create_tables()
+    # Супервизор с БД больше не работает — соединения нужны только воркерам
+    await engine.dispose()
+
+    bot = create_bot(token)
+    await setup_bot_commands(bot)
+
+    # Диспетчер супервизору нужен только чтобы узнать используемые типы апдейтов
+    dp, storage = create_dispatcher()
+    allowed_updates = dp.resolve_used_update_types()
+    await storage.close()
+
+    router = ProcessRouter(
+        bot,
+        processes=int(os.getenv("BOT_PROCESSES") or os.cpu_count() or 1),
+        concurrency=int(os.getenv("BOT_PROCESS_CONCURRENCY", "8")),
+        queue_size=int(os.getenv("BOT_PROCESS_QUEUE_SIZE", "1000")),
+    )
+    router.start()
+    watcher = asyncio.create_task(router.watch())
+
+    # Метрики супервизора (очередь до воркеров); в режиме webhook они есть и на его /metrics
+    register_update_queue_metrics(router)
+    metrics_port = os.getenv("METRICS_PORT")
+    metrics_server = (
+        asyncio.create_task(serve_metrics(os.getenv("METRICS_HOST", "0.0.0.0"), int(metrics_port)))
+        if metrics_port else None
+    )
+
+    try:
+        if os.getenv("BOT_MODE", "polling") == "webhook":
+            secret_token = os.getenv("WEBHOOK_SECRET") or None
+            path = os.getenv("WEBHOOK_PATH", "/webhook")
+            app = create_webhook_app(
+                router,
+                path=path,
+                secret_token=secret_token,
+                enqueue_timeout=float(os.getenv("WEBHOOK_ENQUEUE_TIMEOUT", "1.0")),
+            )
+            await serve_webhook(
+                app,
+                bot,
+                host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+                port=int(os.getenv("WEBHOOK_PORT", "8081")),
+                path=path,
+                webhook_url=os.getenv("WEBHOOK_URL"),
+                secret_token=secret_token,
+                allowed_updates=allowed_updates,
+            )
+        else:
+            logger.info("Supervisor is starting polling...")
+            # Апдейты передаются по одному (handle_as_tasks=False), чтобы сохранить порядок
+            # и притормаживать polling, когда воркеры не успевают
+            await create_routing_dispatcher(router).start_polling(
+                bot, allowed_updates=allowed_updates, handle_as_tasks=False, close_bot_session=False
+            )
+    except Exception as e:
+        logger.error(f"Supervisor error: {e}")
+    finally:
+        watcher.cancel()
+        if metrics_server:
+            metrics_server.cancel()
+        await router.stop()
+        await bot.session.close()
+        logger.info("Supervisor stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
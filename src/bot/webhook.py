@@ -0,0 +1,208 @@
+import asyncio
+import hmac
+import logging
+from typing import List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiogram.types.update import UpdateTypeLookupError
+from aiohttp import web
+
+from src.bot.metrics import handle_metrics, register_update_queue_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def get_update_user_id(update: Update) -> Optional[int]:
+    """
+    Определяет пользователя, к которому относится апдейт (для сохранения порядка).
+    None — пользователя нет или тип апдейта неизвестен этой версии aiogram
+    """
+    try:
+        event = update.event
+    except UpdateTypeLookupError:
+        return None
+    user = getattr(event, "from_user", None)
+    if user:
+        return user.id
+    chat = getattr(event, "chat", None)
+    if chat:
+        return chat.id
+    return None
+
+
+def get_update_shard(update: Update, shards: int) -> int:
+    """
+    Номер шарда для апдейта: апдейты одного пользователя всегда попадают в один шард
+    """
+    user_id = get_update_user_id(update)
+    return (user_id if user_id is not None else update.update_id) % shards
+
+
+class UpdateWorkerPool:
+    """
+    Ограниченная очередь апдейтов и пул обработчиков.
+    Апдейты распределяются по воркерам по user_id: у каждого воркера своя очередь,
+    поэтому апдейты одного пользователя обрабатываются строго по порядку.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, workers: int = 8, queue_size: int = 1000):
+        self.dp = dp
+        self.bot = bot
+        # Те же данные, что aiogram передаёт хэндлерам при polling
+        self.workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+        per_worker = max(1, queue_size // workers)
+        self.queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=per_worker) for _ in range(workers)]
+        self._tasks: List[asyncio.Task] = []
+        self.dropped = 0
+
+    @property
+    def depth(self) -> int:
+        """Сколько апдейтов ждёт обработки"""
+        return sum(queue.qsize() for queue in self.queues)
+
+    def start(self):
+        for index, queue in enumerate(self.queues):
+            self._tasks.append(asyncio.create_task(self._worker(index, queue)))
+        logger.info(f"Started {len(self.queues)} update workers")
+
+    async def submit(self, update: Update, timeout: Optional[float] = 0.0) -> bool:
+        """
+        Ставит апдейт в очередь. Если очередь воркера заполнена, ждёт не дольше timeout
+        (timeout=None — ждёт сколько потребуется); возвращает False, если место так и не освободилось
+        """
+        queue = self.queues[get_update_shard(update, len(self.queues))]
+        try:
+            if timeout is None:
+                await queue.put(update)
+            elif timeout > 0:
+                await asyncio.wait_for(queue.put(update), timeout)
+            else:
+                queue.put_nowait(update)
+            return True
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            self.dropped += 1
+            return False
+
+    async def _worker(self, index: int, queue: asyncio.Queue):
+        while True:
+            update = await queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update, **self.workflow_data)
+            except Exception as e:
+                logger.error(f"Worker {index} failed to process update {update.update_id}: {e}", exc_info=True)
+            finally:
+                queue.task_done()
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """
+        Дожидается обработки уже принятых апдейтов и останавливает воркеры
+        """
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self.queues)), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Update queue not drained in {drain_timeout}s, {self.depth} updates left")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def create_webhook_app(
+    pool: UpdateWorkerPool,
+    path: str = "/webhook",
+    secret_token: Optional[str] = None,
+    enqueue_timeout: float = 1.0,
+) -> web.Application:
+    """
+    aiohttp-приложение для приёма апдейтов от Telegram.
+    Отвечает сразу после постановки апдейта в очередь. Если очередь переполнена,
+    возвращает 503 — Telegram повторит доставку позже (backpressure).
+    """
+    async def handle_update(request: web.Request) -> web.Response:
+        if secret_token:
+            received = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if not hmac.compare_digest(received, secret_token):
+                return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": pool.bot})
+        except Exception as e:
+            logger.warning(f"Invalid webhook payload: {e}")
+            return web.Response(status=400)
+
+        if not await pool.submit(update, timeout=enqueue_timeout):
+            logger.warning(f"Update queue is full, rejecting update {update.update_id}")
+            return web.Response(status=503)
+        return web.Response(status=200)
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({"status": "healthy", "queue_depth": pool.depth, "dropped": pool.dropped})
+
+    register_update_queue_metrics(pool)
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+async def serve_webhook(
+    app: web.Application,
+    bot: Bot,
+    host: str,
+    port: int,
+    path: str,
+    webhook_url: Optional[str] = None,
+    secret_token: Optional[str] = None,
+    allowed_updates: Optional[List[str]] = None,
+):
+    """
+    Поднимает HTTP-сервер вебхука и работает до отмены.
+    Без webhook_url вебхук в Telegram не регистрируется (локальная отладка с фейковым отправителем)
+    """
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info(f"Webhook server listening on {host}:{port}{path}")
+
+    if webhook_url:
+        await bot.set_webhook(webhook_url, secret_token=secret_token, allowed_updates=allowed_updates)
+        logger.info(f"Webhook registered: {webhook_url}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    host: str,
+    port: int,
+    path: str,
+    webhook_url: Optional[str] = None,
+    secret_token: Optional[str] = None,
+    workers: int = 8,
+    queue_size: int = 1000,
+    enqueue_timeout: float = 1.0,
+):
+    """
+    Запускает бота в режиме webhook
+    """
+    pool = UpdateWorkerPool(dp, bot, workers=workers, queue_size=queue_size)
+    app = create_webhook_app(pool, path=path, secret_token=secret_token, enqueue_timeout=enqueue_timeout)
+
+    await dp.emit_startup(bot=bot, **pool.workflow_data)
+    pool.start()
+    try:
+        await serve_webhook(
+            app, bot, host, port, path,
+            webhook_url=webhook_url,
+            secret_token=secret_token,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+    finally:
+        await pool.stop()
+        await dp.emit_shutdown(bot=bot, **pool.workflow_data)
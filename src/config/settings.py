@@ -0,0 +1,77 @@
+from typing import List
+
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from sqlalchemy.engine import URL
+
+
+class DatabaseSettings(BaseSettings):
+    """
+    Подключение к PostgreSQL и профиль пула соединений (переменные DB_*)
+    """
+    model_config = SettingsConfigDict(env_prefix="DB_", env_file=".env", extra="ignore")
+
+    host: str = "localhost"
+    port: int = 5432
+    name: str = "fitplanbot"
+    user: str = "postgres"
+    password: str = "postgres"
+
+    # Постоянные соединения пула и сколько можно открыть сверх них под нагрузкой
+    pool_size: int = 10
+    max_overflow: int = 20
+    # Сколько секунд ждать свободного соединения, прежде чем упасть с ошибкой
+    pool_timeout: float = 30.0
+    # Проверять соединение перед выдачей (переживает рестарт БД и обрывы по таймауту)
+    pool_pre_ping: bool = True
+    # Пересоздавать соединения старше этого срока (сек); -1 — никогда
+    pool_recycle: int = 1800
+    # Кэш подготовленных запросов asyncpg на соединение; 0 — выключить (нужно за pgbouncer)
+    statement_cache_size: int = 100
+    # Логировать SQL (действует только при DEBUG)
+    echo: bool = False
+
+    # Реплики для чтения: "host1:5432,host2:5432" (логин, пароль и БД — как у primary)
+    replica_hosts: str = ""
+    # Сколько секунд после своей записи пользователь читает с primary
+    read_your_writes_seconds: float = 5.0
+    # Реплика, отставшая сильнее (сек), выводится из ротации
+    replica_max_lag_seconds: float = 10.0
+
+    @property
+    def url(self) -> URL:
+        return URL.create(
+            "postgresql+asyncpg",
+            username=self.user,
+            password=self.password,
+            host=self.host,
+            port=self.port,
+            database=self.name,
+        )
+
+    @property
+    def replicas(self) -> List["DatabaseSettings"]:
+        """Настройки подключения к каждой реплике"""
+        replicas = []
+        for address in filter(None, (item.strip() for item in self.replica_hosts.split(","))):
+            host, _, port = address.partition(":")
+            replicas.append(self.model_copy(update={"host": host, "port": int(port or self.port)}))
+        return replicas
+
+
+class Settings(BaseSettings):
+    """
+    Настройки приложения из окружения и .env
+    """
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    debug: bool = False
+    db: DatabaseSettings = Field(default_factory=DatabaseSettings)
+
+    @property
+    def sql_echo(self) -> bool:
+        """Лог SQL синхронно пишется на каждый запрос — в рабочем профиле он выключен"""
+        return self.debug and self.db.echo
+
+
+settings = Settings()
@@ -0,0 +1,75 @@
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationListener:
+    """
+    Слушает каналы Postgres (LISTEN/NOTIFY) на одном соединении процесса.
+
+    Модули подписываются на свои каналы через subscribe(), run() держит одно соединение
+    из пула engine и раздаёт уведомления обработчикам по имени канала.
+    При обрыве соединение открывается заново; пока не слушали, уведомления могли потеряться,
+    поэтому после каждого подключения вызываются on_connect подписчиков.
+    """
+
+    def __init__(self, engine, retry_delay: float = 5.0):
+        self.engine = engine
+        self.retry_delay = retry_delay
+        # Канал -> [(обработчик payload, on_connect)]
+        self._handlers: Dict[str, List[Tuple[Callable[[str], None], Optional[Callable[[], None]]]]] = {}
+
+    def subscribe(
+        self,
+        channel: str,
+        on_notification: Callable[[str], None],
+        on_connect: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Регистрирует обработчик канала. Вызывать до run()
+        """
+        self._handlers.setdefault(channel, []).append((on_notification, on_connect))
+
+    def _dispatch(self, connection, pid, channel, payload):
+        for on_notification, _ in self._handlers.get(channel, ()):
+            try:
+                on_notification(payload)
+            except Exception as e:
+                logger.error(f"Notification handler error on '{channel}': {e}", exc_info=True)
+
+    def _connected(self):
+        for handlers in self._handlers.values():
+            for _, on_connect in handlers:
+                if on_connect is not None:
+                    on_connect()
+
+    async def run(self):
+        """
+        Работает до отмены
+        """
+        if not self._handlers:
+            return
+        channels = list(self._handlers)
+        while True:
+            try:
+                async with self.engine.connect() as conn:
+                    raw_connection = await conn.get_raw_connection()
+                    driver_connection = raw_connection.driver_connection
+                    for channel in channels:
+                        await driver_connection.add_listener(channel, self._dispatch)
+                    self._connected()
+                    logger.info(f"Listening for notifications on {', '.join(channels)}")
+                    try:
+                        while not driver_connection.is_closed():
+                            await asyncio.sleep(self.retry_delay)
+                    finally:
+                        if not driver_connection.is_closed():
+                            for channel in channels:
+                                await driver_connection.remove_listener(channel, self._dispatch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification listener error: {e}")
+            await asyncio.sleep(self.retry_delay)
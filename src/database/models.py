@@ -1,6 +1,6 @@
 import uuid
-from datetime import datetime
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, DECIMAL, Date, Text, JSON, BigInteger, CheckConstraint
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, DECIMAL, Date, Text, JSON, BigInteger, CheckConstraint, Float, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 
@@ -10,6 +10,10 @@ from src.database.session import Base
 def uuid_gen():
     return str(uuid.uuid4())
 
+def utcnow():
+    """Текущее время в UTC с часовым поясом (для колонок DateTime(timezone=True))"""
+    return datetime.now(timezone.utc)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -22,8 +26,10 @@ class User(Base):
     email = Column(String(255))
     is_active = Column(Boolean, default=True)
     is_blocked = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
-    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+    # Последняя активность в боте (пишется пачками, см. services/activity.py)
+    last_seen_at = Column(DateTime(timezone=True))
 
     # Связи
     profile = relationship("UserProfile", back_populates="user", uselist=False, cascade="all, delete-orphan")
@@ -39,6 +45,8 @@ class UserProfile(Base):
         CheckConstraint("gender IN ('male', 'female'"),
         CheckConstraint("height_cm BETWEEN 100 AND 250"),
         CheckConstraint("weight_kg BETWEEN 30 AND 300"),
+        # Одна анкета на пользователя — на это опирается сохранение через ON CONFLICT
+        UniqueConstraint("user_id", name="uq_user_profiles_user_id"),
     )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid_gen)
@@ -76,7 +84,7 @@ class UserProfile(Base):
     # Метаданные
     profile_completed = Column(Boolean, default=False)
     completed_at = Column(DateTime(timezone=True))
-    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow, index=True)
     additional_data = Column(JSONB, default={})
     
     # Связи
@@ -87,6 +95,8 @@ class Subscription(Base):
     __tablename__ = "subscriptions"
     __table_args__ = (
         CheckConstraint("status IN ('pending', 'active', 'cancelled', 'expired')"),
+        # Под предикат проверки доступа: активные подписки пользователя по сроку окончания
+        Index("ix_subscriptions_user_status_ends_at", "user_id", "status", "ends_at"),
     )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid_gen)
@@ -108,7 +118,7 @@ class Subscription(Base):
     # Даты
     starts_at = Column(DateTime(timezone=True))
     ends_at = Column(DateTime(timezone=True))
-    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
     
     # Связи
     user = relationship("User", back_populates="subscriptions")
@@ -133,7 +143,8 @@ class WorkoutPlan(Base):
     # Метаданные
     is_active = Column(Boolean, default=True)
     created_by_admin = Column(UUID(as_uuid=True))  # ссылка на админа
-    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
 
 
 class MealPlan(Base):
@@ -153,7 +164,50 @@ class MealPlan(Base):
     
     # Метаданные
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+
+
+class UserPlanMatch(Base):
+    """
+    Предрассчитанный подбор планов для пользователя (заполняется пакетной задачей)
+    """
+    __tablename__ = "user_plan_matches"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+
+    # Результаты подбора (NULL — подходящего плана не нашлось)
+    workout_plan_id = Column(UUID(as_uuid=True), ForeignKey("workout_plans.id", ondelete="SET NULL"))
+    workout_score = Column(Float)
+    meal_plan_id = Column(UUID(as_uuid=True), ForeignKey("meal_plans.id", ondelete="SET NULL"))
+    meal_score = Column(Float)
+
+    # Когда был выполнен подбор
+    matched_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+
+
+class PlanMatchWatermark(Base):
+    """
+    Отметка последнего запуска пакетного подбора (для инкрементальных запусков)
+    """
+    __tablename__ = "plan_match_watermarks"
+
+    name = Column(String(50), primary_key=True)
+    watermark = Column(DateTime(timezone=True), nullable=False)
+
+
+class TelegramFile(Base):
+    """
+    file_id загруженных в Telegram файлов — повторная отправка без загрузки.
+    Ключ — хэш содержимого: изменённый файл получает новый хэш и загружается заново.
+    """
+    __tablename__ = "telegram_files"
+
+    content_hash = Column(String(64), primary_key=True)
+    # Тип отправки: file_id документа нельзя отправить как фото и наоборот
+    kind = Column(String(20), primary_key=True)
+    file_id = Column(String(255), nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=utcnow, onupdate=utcnow)
 
 
 class UserDailyLog(Base):
@@ -176,7 +230,7 @@ class UserDailyLog(Base):
     meal_feedback = Column(Text)
     
     # Метаданные
-    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=utcnow)
     
     # Связи
     user = relationship("User", back_populates="daily_logs")
@@ -186,6 +240,8 @@ class Notification(Base):
     __tablename__ = "notifications"
     __table_args__ = (
         CheckConstraint("status IN ('pending', 'sent', 'failed', 'read')"),
+        # Выборка наступивших pending-уведомлений диспетчером
+        Index("ix_notifications_status_scheduled_for", "status", "scheduled_for"),
     )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid_gen)
@@ -202,7 +258,9 @@ class Notification(Base):
     # Время
     scheduled_for = Column(DateTime(timezone=True), nullable=False)
     sent_at = Column(DateTime(timezone=True))
-    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    # До какого времени уведомление не выдаётся диспетчеру: забрано на отправку или ждёт повтора
+    claimed_until = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), default=utcnow)
     
     # Связи
     user = relationship("User", back_populates="notifications")
\ No newline at end of file
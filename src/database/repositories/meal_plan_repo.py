@@ -0,0 +1,36 @@
+import json
+from collections import Counter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from src.database.models import MealPlan
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MealPlanRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_file_reference_counts(self) -> Counter:
+        """
+        Считает, сколько планов питания (включая неактивные) ссылается на каждый файл.
+        Счётчики вычисляются по самим строкам, поэтому не расходятся с правками в админке.
+        """
+        counts = Counter()
+        stmt = select(MealPlan.pdf_file_path, MealPlan.image_file_paths)
+        result = await self.session.stream(stmt)
+        async for pdf_file_path, image_file_paths in result:
+            if pdf_file_path:
+                counts[pdf_file_path] += 1
+
+            # Через админку массив может быть сохранён строкой
+            if isinstance(image_file_paths, str):
+                try:
+                    image_file_paths = json.loads(image_file_paths)
+                except ValueError:
+                    image_file_paths = [image_file_paths]
+            for image_path in image_file_paths or []:
+                if image_path:
+                    counts[image_path] += 1
+        return counts
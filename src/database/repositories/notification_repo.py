@@ -0,0 +1,81 @@
+from typing import List, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, case, or_
+from datetime import datetime
+from src.database.models import Notification, User
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def claim_due(self, now: datetime, limit: int, claimed_until: datetime) -> List:
+        """
+        Забирает пачку наступивших уведомлений со статусом pending вместе с telegram_id получателя
+        и помечает их забранными до claimed_until, после чего сразу коммитит.
+        Выборка идёт с FOR UPDATE SKIP LOCKED только на время этого UPDATE: параллельные
+        диспетчеры пропускают строки, а после коммита — видят отметку и не берут их.
+        Если диспетчер не сохранит итоги до claimed_until, уведомления снова станут доступны.
+        """
+        claimed = select(
+            Notification.id
+        ).where(
+            Notification.status == 'pending',
+            Notification.scheduled_for <= now,
+            or_(Notification.claimed_until.is_(None), Notification.claimed_until < now)
+        ).order_by(
+            Notification.scheduled_for
+        ).limit(limit).with_for_update(skip_locked=True).cte("claimed")
+
+        stmt = update(Notification).where(
+            Notification.id == claimed.c.id,
+            User.id == Notification.user_id
+        ).values(
+            claimed_until=claimed_until
+        ).returning(
+            Notification.id,
+            Notification.title,
+            Notification.message,
+            Notification.scheduled_for,
+            User.telegram_id,
+        ).execution_options(synchronize_session=False)
+        result = await self.session.execute(stmt)
+        rows = list(result.all())
+        await self.session.commit()
+        return rows
+
+    async def save_results(
+        self,
+        sent_ids: Sequence,
+        failed_ids: Sequence,
+        retry_ids: Sequence,
+        sent_at: datetime,
+        retry_at: datetime,
+    ):
+        """
+        Сохраняет итоги отправки пачки одним UPDATE и снимает отметку claimed_until.
+        Отправленные получают sent_at. Повторные попытки откладываются до retry_at через
+        claimed_until: scheduled_for остаётся исходным сроком, от него считается устаревание
+        """
+        ids = [*sent_ids, *failed_ids, *retry_ids]
+        if ids:
+            stmt = update(Notification).where(Notification.id.in_(ids)).values(
+                status=case(
+                    (Notification.id.in_(sent_ids), 'sent'),
+                    (Notification.id.in_(failed_ids), 'failed'),
+                    else_='pending'
+                ),
+                sent_at=case(
+                    (Notification.id.in_(sent_ids), sent_at),
+                    else_=Notification.sent_at
+                ),
+                claimed_until=case(
+                    (Notification.id.in_(retry_ids), retry_at),
+                    else_=None
+                ),
+            ).execution_options(synchronize_session=False)
+            await self.session.execute(stmt)
+        await self.session.commit()
@@ -0,0 +1,99 @@
+from typing import Optional, List, Dict, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime
+from src.database.models import UserPlanMatch, PlanMatchWatermark, WorkoutPlan, MealPlan, UserProfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PlanMatchRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_workout_plan(
+        self, profile: UserProfile, plans_updated_at: Optional[datetime] = None
+    ) -> Optional[WorkoutPlan]:
+        """
+        Возвращает предрассчитанный план тренировок одним запросом по первичному ключу.
+        Подбор, сделанный до последнего изменения профиля или планов (plans_updated_at —
+        max(updated_at) каталога), считается устаревшим.
+        """
+        stmt = select(WorkoutPlan).join(
+            UserPlanMatch, UserPlanMatch.workout_plan_id == WorkoutPlan.id
+        ).where(
+            UserPlanMatch.user_id == profile.user_id,
+            WorkoutPlan.is_active == True
+        )
+        stmt = self._where_fresh(stmt, profile, plans_updated_at)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def get_meal_plan(
+        self, profile: UserProfile, plans_updated_at: Optional[datetime] = None
+    ) -> Optional[MealPlan]:
+        """
+        Возвращает предрассчитанный план питания одним запросом по первичному ключу.
+        Устаревание — как в get_workout_plan
+        """
+        stmt = select(MealPlan).join(
+            UserPlanMatch, UserPlanMatch.meal_plan_id == MealPlan.id
+        ).where(
+            UserPlanMatch.user_id == profile.user_id,
+            MealPlan.is_active == True
+        )
+        stmt = self._where_fresh(stmt, profile, plans_updated_at)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    def _where_fresh(stmt, profile: UserProfile, plans_updated_at: Optional[datetime]):
+        """
+        Отсекает подбор, сделанный раньше изменения профиля или каталога планов
+        """
+        for changed_at in (profile.updated_at, plans_updated_at):
+            if changed_at:
+                stmt = stmt.where(UserPlanMatch.matched_at >= changed_at)
+        return stmt
+
+    async def upsert_many(self, matches: List[Dict[str, Any]]):
+        """
+        Сохраняет результаты подбора пачкой (одним INSERT ... ON CONFLICT)
+        """
+        if not matches:
+            return
+        stmt = insert(UserPlanMatch).values(matches)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserPlanMatch.user_id],
+            set_={
+                "workout_plan_id": stmt.excluded.workout_plan_id,
+                "workout_score": stmt.excluded.workout_score,
+                "meal_plan_id": stmt.excluded.meal_plan_id,
+                "meal_score": stmt.excluded.meal_score,
+                "matched_at": stmt.excluded.matched_at,
+            }
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+
+    async def get_watermark(self, name: str) -> Optional[datetime]:
+        """
+        Получает отметку последнего успешного запуска задачи
+        """
+        stmt = select(PlanMatchWatermark.watermark).where(PlanMatchWatermark.name == name)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def set_watermark(self, name: str, watermark: datetime):
+        """
+        Сохраняет отметку успешного запуска задачи
+        """
+        stmt = insert(PlanMatchWatermark).values(name=name, watermark=watermark)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PlanMatchWatermark.name],
+            set_={"watermark": stmt.excluded.watermark}
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
@@ -1,12 +1,15 @@
 from typing import Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
-from datetime import datetime, timedelta
+from sqlalchemy import select, update, func
+from datetime import datetime, timedelta, timezone
 from src.database.models import Subscription, User
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Канал Postgres NOTIFY, через который бот узнаёт об изменении подписок
+SUBSCRIPTION_CHANGES_CHANNEL = "subscription_changes"
+
 
 class SubscriptionRepository:
     def __init__(self, session: AsyncSession):
@@ -16,7 +19,7 @@ class SubscriptionRepository:
         """
         Получает активную подписку пользователя (самую свежую)
         """
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
         stmt = select(Subscription).where(
             Subscription.user_id == user_id,
             Subscription.status == 'active',
@@ -26,6 +29,28 @@ class SubscriptionRepository:
         result = await self.session.execute(stmt)
         return result.scalars().first()  # Возвращает первый объект или None
 
+    async def get_access_by_telegram_id(self, telegram_id: int) -> Optional[tuple[str, Optional[datetime]]]:
+        """
+        Проверка доступа одним запросом: находит пользователя по telegram_id и
+        окончание его активной подписки (та же выборка, что в get_active_for_user).
+        Возвращает (user_id, ends_at) — ends_at=None, если активной подписки нет;
+        None — если пользователь не найден.
+        """
+        now = datetime.now(timezone.utc)
+        active_ends_at = select(Subscription.ends_at).where(
+            Subscription.user_id == User.id,
+            Subscription.status == 'active',
+            Subscription.starts_at <= now,
+            Subscription.ends_at >= now
+        ).order_by(Subscription.created_at.desc()).limit(1).correlate(User).scalar_subquery()
+
+        stmt = select(User.id, active_ends_at.label("ends_at")).where(User.telegram_id == telegram_id)
+        result = await self.session.execute(stmt)
+        row = result.one_or_none()
+        if row is None:
+            return None
+        return row.id, row.ends_at
+
     async def get_pending_for_user(self, user_id: str) -> Optional[Subscription]:
         """
         Получает ожидающую подписку пользователя
@@ -61,7 +86,7 @@ class SubscriptionRepository:
         Активирует подписку (для админа)
         """
         # Для MVP активируем на 30 дней
-        starts_at = datetime.utcnow()
+        starts_at = datetime.now(timezone.utc)
         ends_at = starts_at + timedelta(days=30)
 
         stmt = (
@@ -74,15 +99,29 @@ class SubscriptionRepository:
                 starts_at=starts_at,
                 ends_at=ends_at
             )
+            .returning(Subscription.user_id)
         )
         result = await self.session.execute(stmt)
+        user_ids = result.scalars().all()
+        for user_id in user_ids:
+            await self.notify_changed(user_id)
         await self.session.commit()
 
-        if result.rowcount > 0:
+        if user_ids:
             logger.info(f"Activated subscription {subscription_id} by admin {admin_user_id}")
             return True
         return False
 
+    async def notify_changed(self, user_id: str):
+        """
+        Сообщает боту (через NOTIFY) об изменении подписки пользователя.
+        Уведомление доставляется только после commit текущей транзакции.
+        NOTIFY выполняется только на primary (реплика в режиме восстановления его отклоняет)
+        """
+        await self.session.execute(
+            select(func.pg_notify(SUBSCRIPTION_CHANGES_CHANNEL, str(user_id))).execution_options(primary=True)
+        )
+
     async def get_all_pending(self) -> List[Subscription]:
         """
         Получает все ожидающие подписки (для админа)
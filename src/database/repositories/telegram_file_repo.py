@@ -0,0 +1,83 @@
+from typing import Dict, Iterable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime, timezone
+from src.database.models import TelegramFile
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramFileRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_file_id(self, content_hash: str, kind: str) -> Optional[str]:
+        """
+        Возвращает сохранённый file_id для содержимого файла
+        """
+        stmt = select(TelegramFile.file_id).where(
+            TelegramFile.content_hash == content_hash,
+            TelegramFile.kind == kind
+        )
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def get_file_ids(self, content_hashes: Iterable[str], kind: str) -> Dict[str, str]:
+        """
+        Возвращает сохранённые file_id для нескольких файлов одним запросом: хэш -> file_id
+        """
+        content_hashes = list(content_hashes)
+        if not content_hashes:
+            return {}
+        stmt = select(TelegramFile.content_hash, TelegramFile.file_id).where(
+            TelegramFile.content_hash.in_(content_hashes),
+            TelegramFile.kind == kind
+        )
+        result = await self.session.execute(stmt)
+        return {content_hash: file_id for content_hash, file_id in result}
+
+    async def save_file_id(self, content_hash: str, kind: str, file_id: str):
+        """
+        Сохраняет file_id, полученный после загрузки файла
+        """
+        await self.save_file_ids({content_hash: file_id}, kind)
+
+    async def save_file_ids(self, file_ids: Dict[str, str], kind: str):
+        """
+        Сохраняет file_id нескольких загруженных файлов одним INSERT ... ON CONFLICT
+        """
+        if not file_ids:
+            return
+        updated_at = datetime.now(timezone.utc)
+        stmt = insert(TelegramFile).values([
+            {"content_hash": content_hash, "kind": kind, "file_id": file_id, "updated_at": updated_at}
+            for content_hash, file_id in file_ids.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TelegramFile.content_hash, TelegramFile.kind],
+            set_={"file_id": stmt.excluded.file_id, "updated_at": stmt.excluded.updated_at}
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+
+    async def delete_file_id(self, content_hash: str, kind: str):
+        """
+        Удаляет file_id, который Telegram больше не принимает
+        """
+        await self.delete_file_ids([content_hash], kind)
+
+    async def delete_file_ids(self, content_hashes: Iterable[str], kind: str):
+        """
+        Удаляет file_id нескольких файлов одним запросом
+        """
+        content_hashes = list(content_hashes)
+        if not content_hashes:
+            return
+        stmt = delete(TelegramFile).where(
+            TelegramFile.content_hash.in_(content_hashes),
+            TelegramFile.kind == kind
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
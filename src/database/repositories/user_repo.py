@@ -1,7 +1,9 @@
 from sqlalchemy.orm import selectinload
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Sequence, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func, literal, literal_column, values, column, BigInteger, String, DateTime
+from sqlalchemy.dialects.postgresql import insert
 from src.database.models import User, UserProfile
 import logging
 
@@ -35,13 +37,20 @@ class UserRepository:
         """
         Получает существующего пользователя или создаёт нового
         Возвращает (user, is_created)
+        Один запрос INSERT ... ON CONFLICT ... RETURNING: одновременные вызовы не создают дублей.
+        У существующего пользователя данные не меняются (пустой DO UPDATE нужен только для RETURNING)
         """
-        user = await self.get_by_telegram_id(telegram_id)
-        if user:
-            return user, False
-        
-        user = await self.create(telegram_id, **kwargs)
-        return user, True
+        stmt = insert(User).values(telegram_id=telegram_id, **kwargs)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={"telegram_id": stmt.excluded.telegram_id},
+        ).returning(User, literal_column("xmax = 0").label("created"))
+        result = await self.session.execute(stmt, execution_options={"populate_existing": True})
+        user, created = result.one()
+        await self.session.commit()
+        if created:
+            logger.info(f"Created new user with telegram_id: {telegram_id}")
+        return user, created
 
     async def update_username(self, telegram_id: int, username: str) -> Optional[User]:
         """
@@ -67,4 +76,58 @@ class UserRepository:
         
         if user:
             return user, user.profile
-        return None, None
\ No newline at end of file
+        return None, None
+
+    async def save_profile(self, telegram_id: int, fields: Dict[str, Any]) -> Optional[UserProfile]:
+        """
+        Создаёт или обновляет анкету пользователя одним запросом:
+        INSERT ... SELECT по telegram_id, ON CONFLICT (user_id) DO UPDATE ... RETURNING.
+        Возвращает None, если пользователь не найден
+        """
+        columns = UserProfile.__table__.c
+        profile_values = {
+            key: value for key, value in fields.items()
+            if key in columns and key not in ("id", "user_id")
+        }
+        profile_values["updated_at"] = datetime.now(timezone.utc)
+
+        source = select(
+            func.gen_random_uuid(),
+            User.id,
+            *(literal(value, columns[key].type) for key, value in profile_values.items()),
+        ).where(User.telegram_id == telegram_id)
+        stmt = insert(UserProfile).from_select(["id", "user_id", *profile_values], source)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserProfile.user_id],
+            set_={key: stmt.excluded[key] for key in profile_values},
+        ).returning(UserProfile)
+
+        result = await self.session.execute(stmt, execution_options={"populate_existing": True})
+        profile = result.scalar_one_or_none()
+        await self.session.commit()
+        return profile
+
+    async def apply_activity(self, entries: Sequence[Tuple[int, Optional[str], datetime]]) -> int:
+        """
+        Записывает накопленную активность пользователей одним запросом
+        UPDATE ... FROM (VALUES ...): username и время последнего визита.
+        entries — (telegram_id, username, seen_at). Возвращает число обновлённых строк
+        """
+        if not entries:
+            return 0
+        activity = values(
+            column("telegram_id", BigInteger),
+            column("username", String),
+            column("seen_at", DateTime(timezone=True)),
+            name="activity",
+        ).data(list(entries))
+        stmt = update(User).where(User.telegram_id == activity.c.telegram_id).values(
+            telegram_username=activity.c.username,
+            # Пачки могут записаться не по порядку — время визита не откатываем назад
+            last_seen_at=func.greatest(User.last_seen_at, activity.c.seen_at),
+            # Активность — не изменение данных пользователя, updated_at не трогаем
+            updated_at=User.updated_at,
+        ).execution_options(synchronize_session=False)
+        result = await self.session.execute(stmt)
+        await self.session.commit()
+        return result.rowcount
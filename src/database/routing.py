@@ -0,0 +1,177 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import Select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Отставание реплики в секундах; если реплика применила весь полученный WAL, она не отстаёт
+# (pg_last_xact_replay_timestamp на простаивающем primary «стареет» без записи)
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaRouter:
+    """
+    Выбирает engine для запросов сессии: чтение — на реплики по кругу (одна реплика на сессию),
+    запись — на primary.
+    После записи ключ (telegram_id пользователя) на sticky_seconds «прилипает» к primary,
+    чтобы пользователь сразу видел свои изменения, пока реплики их догоняют.
+    Недоступные или сильно отставшие реплики выводятся из ротации (см. monitor),
+    если здоровых реплик нет — чтение идёт на primary.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: Sequence[AsyncEngine] = (),
+        sticky_seconds: float = 5.0,
+        max_lag: float = 10.0,
+        max_sticky: int = 10000,
+    ):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.sticky_seconds = sticky_seconds
+        self.max_lag = max_lag
+        self.max_sticky = max_sticky
+        self._healthy: List[bool] = [True] * len(self.replicas)
+        self._next = itertools.count()
+        # ключ -> момент (monotonic), до которого чтение идёт с primary
+        self._sticky: Dict[Any, float] = {}
+
+        # Метрики
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.writes = 0
+
+    def mark_write(self, key: Any):
+        """
+        Ключ читает с primary ближайшие sticky_seconds
+        """
+        now = time.monotonic()
+        self._sticky[key] = now + self.sticky_seconds
+        if len(self._sticky) > self.max_sticky:
+            self._sticky = {k: until for k, until in self._sticky.items() if until > now}
+
+    def is_sticky(self, key: Any) -> bool:
+        until = self._sticky.get(key)
+        if until is None:
+            return False
+        if until < time.monotonic():
+            del self._sticky[key]
+            return False
+        return True
+
+    def writer(self) -> Engine:
+        self.writes += 1
+        return self.primary.sync_engine
+
+    def reader(self, key: Any = None) -> Engine:
+        """
+        Engine для чтения: здоровая реплика по кругу или primary
+        """
+        if self.replicas and not self.is_sticky(key):
+            for _ in range(len(self.replicas)):
+                index = next(self._next) % len(self.replicas)
+                if self._healthy[index]:
+                    self.replica_reads += 1
+                    return self.replicas[index].sync_engine
+        self.primary_reads += 1
+        return self.primary.sync_engine
+
+    async def check_replicas(self, timeout: float = 3.0):
+        """
+        Проверяет доступность и отставание реплик
+        """
+        for index, replica in enumerate(self.replicas):
+            try:
+                async with asyncio.timeout(timeout):
+                    async with replica.connect() as conn:
+                        lag = float(await conn.scalar(REPLICA_LAG_SQL))
+                healthy = lag <= self.max_lag
+                reason = f"lag {lag:.1f}s"
+            except Exception as e:
+                healthy = False
+                reason = f"{type(e).__name__}: {e}"
+
+            if healthy != self._healthy[index]:
+                if healthy:
+                    logger.info(f"Replica {index} is back in rotation ({reason})")
+                else:
+                    logger.warning(f"Replica {index} removed from rotation ({reason})")
+            self._healthy[index] = healthy
+
+    async def monitor(self, interval: float = 5.0):
+        """
+        Периодически проверяет реплики. Работает до отмены
+        """
+        while True:
+            await self.check_replicas()
+            await asyncio.sleep(interval)
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "replicas": len(self.replicas),
+            "healthy_replicas": sum(self._healthy),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "writes": self.writes,
+        }
+
+
+def _is_read(clause) -> bool:
+    """
+    SELECT без FOR UPDATE можно выполнить на реплике. SELECT с побочным эффектом
+    (pg_notify и т.п.) помечается опцией выполнения primary=True — на hot standby он упадёт
+    """
+    return (
+        isinstance(clause, Select)
+        and clause._for_update_arg is None
+        and not clause.get_execution_options().get("primary")
+    )
+
+
+class RoutingSession(Session):
+    """
+    Сессия, которая отправляет чтение на реплики через ReplicaRouter.
+    Ключ для read-your-writes берётся из session.info["user_id"] (его ставит DbSessionMiddleware).
+    Все чтения сессии идут на одну реплику, чтобы не смешивать снимки разных серверов.
+    После первой записи сессия до конца работает только с primary.
+    """
+
+    def __init__(self, *args, router: Optional[ReplicaRouter] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.router = router
+        self._reader: Optional[Engine] = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        router = self.router
+        if router is None or not router.replicas:
+            return super().get_bind(mapper, clause=clause, **kwargs)
+
+        key = self.info.get("user_id")
+        if self.info.get("primary"):
+            return router.primary.sync_engine
+        if self._flushing or not _is_read(clause):
+            self.info["primary"] = True
+            router.mark_write(key)
+            return router.writer()
+        if self._reader is None:
+            self._reader = router.reader(key)
+        elif self._reader is router.primary.sync_engine:
+            router.primary_reads += 1
+        else:
+            router.replica_reads += 1
+        return self._reader
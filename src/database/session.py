@@ -1,27 +1,60 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
-import os
 from dotenv import load_dotenv
 
+from src.config.settings import DatabaseSettings, settings
+from src.database.routing import ReplicaRouter, RoutingSession
+
 load_dotenv()
 
 # Создаём базовый класс для моделей
 class Base(DeclarativeBase):
     pass
 
+
+def create_engine(db: DatabaseSettings, echo: bool = False) -> AsyncEngine:
+    """
+    Создаёт engine по профилю подключения
+    """
+    return create_async_engine(
+        db.url,
+        echo=echo,
+        pool_size=db.pool_size,
+        max_overflow=db.max_overflow,
+        pool_timeout=db.pool_timeout,
+        pool_pre_ping=db.pool_pre_ping,
+        pool_recycle=db.pool_recycle,
+        connect_args={
+            # Кэш подготовленных запросов SQLAlchemy и собственный кэш asyncpg
+            "prepared_statement_cache_size": db.statement_cache_size,
+            "statement_cache_size": db.statement_cache_size,
+        },
+    )
+
+
 # Создаём engine для подключения к PostgreSQL
-DATABASE_URL = f"postgresql+asyncpg://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+DATABASE_URL = settings.db.url
+
+engine = create_engine(settings.db, echo=settings.sql_echo)
 
-engine = create_async_engine(DATABASE_URL, echo=True)  # echo=True для логов SQL
+# Реплики для чтения (если заданы DB_REPLICA_HOSTS)
+replica_router = ReplicaRouter(
+    engine,
+    [create_engine(replica, echo=settings.sql_echo) for replica in settings.db.replicas],
+    sticky_seconds=settings.db.read_your_writes_seconds,
+    max_lag=settings.db.replica_max_lag_seconds,
+)
 
-# Создаём фабрику сессий
+# Создаём фабрику сессий: чтение уходит на реплики, запись — на primary
 async_session_maker = async_sessionmaker(
-    engine, 
-    class_=AsyncSession, 
+    engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    router=replica_router,
     expire_on_commit=False
 )
 
 # Функция для получения сессии (будет использоваться в dependency injection)
 async def get_session() -> AsyncSession:
     async with async_session_maker() as session:
-        yield session
\ No newline at end of file
+        yield session
@@ -0,0 +1,133 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+import logging
+
+from src.database.session import async_session_maker
+from src.database.repositories.user_repo import UserRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityBuffer:
+    """
+    Буфер отложенной записи активности пользователей (username и время последнего визита).
+    Апдейты только обновляют запись в памяти; раз в flush_interval секунд или при
+    накоплении flush_size пользователей всё пишется одним UPDATE ... FROM (VALUES ...).
+    Число запросов на запись не зависит от потока сообщений.
+    """
+
+    def __init__(self, flush_interval: float = 5.0, flush_size: int = 1000, max_size: int = 100000):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        # Если БД недоступна, больше этого в памяти не держим
+        self.max_size = max_size
+        # telegram_id -> (username, seen_at); повторные апдейты пользователя схлопываются
+        self._pending: Dict[int, Tuple[Optional[str], datetime]] = {}
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        # Метрики
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.dropped = 0
+
+    def record(self, telegram_id: int, username: Optional[str], seen_at: Optional[datetime] = None):
+        """
+        Запоминает активность пользователя (без обращения к БД)
+        """
+        self._pending[telegram_id] = (username, seen_at or datetime.now(timezone.utc))
+        self.recorded += 1
+        if len(self._pending) >= self.flush_size:
+            self._wakeup.set()
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        self._stopping = False
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Пишет накопленную активность в БД. Возвращает число записанных пользователей
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            entries = [(telegram_id, username, seen_at) for telegram_id, (username, seen_at) in pending.items()]
+
+            written = 0
+            try:
+                # Пачками, чтобы не упереться в лимит параметров запроса
+                for start in range(0, len(entries), self.flush_size):
+                    chunk = entries[start:start + self.flush_size]
+                    async with async_session_maker() as session:
+                        await UserRepository(session).apply_activity(chunk)
+                    written += len(chunk)
+            except Exception as e:
+                logger.error(f"Activity flush failed, {len(entries) - written} entries kept: {e}")
+                self._restore(entries[written:])
+
+            self.flushed += written
+            self.flushes += 1
+            return written
+
+    def _restore(self, entries):
+        """
+        Возвращает незаписанные записи в буфер; более свежие данные из буфера важнее
+        """
+        for telegram_id, username, seen_at in entries:
+            if telegram_id not in self._pending:
+                self._pending[telegram_id] = (username, seen_at)
+        overflow = len(self._pending) - self.max_size
+        if overflow > 0:
+            for telegram_id in list(self._pending)[:overflow]:
+                del self._pending[telegram_id]
+            self.dropped += overflow
+            logger.warning(f"Activity buffer overflow, dropped {overflow} entries")
+
+    async def stop(self):
+        """
+        Останавливает фоновую запись и сбрасывает остаток буфера в БД
+        """
+        # Не отменяем задачу: прерванная запись потеряла бы уже извлечённую из буфера пачку
+        self._stopping = True
+        self._wakeup.set()
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        written = await self.flush()
+        logger.info(f"Activity buffer drained: {written} entries written on shutdown")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "dropped": self.dropped,
+        }
+
+
+# Глобальный экземпляр буфера
+activity_buffer = ActivityBuffer(
+    flush_interval=float(os.getenv("ACTIVITY_FLUSH_SECONDS", "5")),
+    flush_size=int(os.getenv("ACTIVITY_FLUSH_SIZE", "1000")),
+)
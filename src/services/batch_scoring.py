@@ -0,0 +1,206 @@
+from typing import Optional, List, Dict, Any, Sequence
+import numpy as np
+
+# Сколько профилей оценивается за один проход (ограничивает размер матрицы профили x планы)
+PROFILES_CHUNK_SIZE = 256
+
+
+def _encode_targets(plans: Sequence[Any], attr: str) -> tuple[Dict[Any, int], np.ndarray, np.ndarray]:
+    """
+    Кодирует массив целевых значений плана (цели, уровни, ...) в булеву матрицу.
+    Возвращает (словарь значение -> столбец, matrix[план, столбец], filled[план]).
+    Последний столбец матрицы всегда False — он соответствует значениям профиля,
+    которых нет ни в одном плане.
+    filled — поле плана заполнено и участвует в расчёте веса.
+    """
+    vocabulary: Dict[Any, int] = {}
+    hits: List[tuple[int, int]] = []
+    filled = np.zeros(len(plans), dtype=bool)
+
+    for row, plan in enumerate(plans):
+        targets = getattr(plan, attr)
+        if not targets:
+            continue
+        filled[row] = True
+        if not isinstance(targets, list):
+            continue
+        for value in targets:
+            try:
+                column = vocabulary.setdefault(value, len(vocabulary))
+            except TypeError:
+                continue
+            hits.append((row, column))
+
+    matrix = np.zeros((len(plans), len(vocabulary) + 1), dtype=bool)
+    if hits:
+        rows, columns = zip(*hits)
+        matrix[list(rows), list(columns)] = True
+    return vocabulary, matrix, filled
+
+
+def _profile_columns(vocabulary: Dict[Any, int], values: Sequence[Any]) -> np.ndarray:
+    """Номера столбцов для значений профилей (неизвестные -> последний, всегда пустой столбец)"""
+    missing = len(vocabulary)
+    columns = []
+    for value in values:
+        try:
+            columns.append(vocabulary.get(value, missing))
+        except TypeError:
+            columns.append(missing)
+    return np.array(columns, dtype=np.intp)
+
+
+def _best_per_profile(plan_ids: List[Any], scores: np.ndarray) -> List[Optional[tuple[Any, float]]]:
+    """
+    Лучший план для каждой строки матрицы scores[профиль, план].
+    argmax возвращает первый максимум — планы упорядочены по created_at desc,
+    поэтому при равенстве выбирается самый новый, как и при поштучном подборе.
+    """
+    if not plan_ids:
+        return [None] * scores.shape[0]
+    best = scores.argmax(axis=1)
+    result = []
+    for profile_row, plan_row in enumerate(best):
+        score = float(scores[profile_row, plan_row])
+        result.append((plan_ids[plan_row], score) if score > 0 else None)
+    return result
+
+
+class WorkoutPlanScorer:
+    """
+    Векторизованный расчёт score планов тренировок.
+    Повторяет формулу MatchingService._calculate_workout_plan_score
+    (те же веса и порядок сложения), поэтому результаты совпадают побитово.
+    """
+
+    WEIGHTS = (("target_goal", "goal", 0.4), ("target_level", "preferred_difficulty", 0.3), ("target_body_type", "body_type", 0.2))
+
+    def __init__(self, plans: Sequence[Any]):
+        self.plan_ids = [plan.id for plan in plans]
+        self._fields = []
+        for plan_attr, profile_attr, weight in self.WEIGHTS:
+            vocabulary, matrix, filled = _encode_targets(plans, plan_attr)
+            self._fields.append((profile_attr, weight, vocabulary, matrix, filled))
+
+    def score_profiles(self, profiles: Sequence[Any]) -> np.ndarray:
+        """
+        Считает score всех планов для пачки профилей.
+        Возвращает матрицу [профиль, план]
+        """
+        shape = (len(profiles), len(self.plan_ids))
+        score = np.zeros(shape)
+        total_weight = np.zeros(shape)
+
+        for profile_attr, weight, vocabulary, matrix, filled in self._fields:
+            values = [getattr(profile, profile_attr) for profile in profiles]
+            has_value = np.array([bool(value) for value in values], dtype=bool)
+            counted = has_value[:, None] & filled[None, :]
+            hit = matrix[:, _profile_columns(vocabulary, values)].T & counted
+            score = score + np.where(hit, weight, 0.0)
+            total_weight = total_weight + np.where(counted, weight, 0.0)
+
+        # Опыт тренировок не зависит от плана — вклад одинаков для всей строки
+        experience_weight = np.zeros(len(profiles))
+        experience_score = np.zeros(len(profiles))
+        for row, profile in enumerate(profiles):
+            if profile.preferred_difficulty and profile.is_experienced_training is not None:
+                expected_level = "intermediate" if profile.is_experienced_training else "beginner"
+                if profile.preferred_difficulty == expected_level:
+                    experience_score[row] = 0.1
+                experience_weight[row] = 0.1
+        score = score + experience_score[:, None]
+        total_weight = total_weight + experience_weight[:, None]
+
+        return np.divide(score, total_weight, out=score.copy(), where=total_weight > 0)
+
+    def score_profile(self, profile: Any) -> np.ndarray:
+        """Score всех планов для одного профиля"""
+        return self.score_profiles([profile])[0]
+
+    def best_for_profiles(self, profiles: Sequence[Any]) -> List[Optional[tuple[Any, float]]]:
+        """
+        Лучший план (id, score) для каждого профиля, None — если подходящих нет
+        """
+        result = []
+        for start in range(0, len(profiles), PROFILES_CHUNK_SIZE):
+            chunk = profiles[start:start + PROFILES_CHUNK_SIZE]
+            result.extend(_best_per_profile(self.plan_ids, self.score_profiles(chunk)))
+        return result
+
+
+class MealPlanScorer:
+    """
+    Векторизованный расчёт score планов питания.
+    Повторяет формулу MatchingService._calculate_meal_plan_score.
+    """
+
+    def __init__(self, plans: Sequence[Any]):
+        self.plan_ids = [plan.id for plan in plans]
+        self._goal_vocabulary, self._goal_matrix, self._goal_filled = _encode_targets(plans, "target_goal")
+
+        # calories_range -> массивы min/max; has_calories — диапазон задан корректно
+        self._calories_min = np.zeros(len(plans))
+        self._calories_max = np.zeros(len(plans))
+        self._has_calories = np.zeros(len(plans), dtype=bool)
+        for row, plan in enumerate(plans):
+            calories = plan.calories_range
+            if not isinstance(calories, list) or len(calories) < 2:
+                continue
+            if not all(isinstance(value, (int, float)) for value in calories[:2]):
+                continue
+            self._calories_min[row], self._calories_max[row] = calories[0], calories[1]
+            self._has_calories[row] = True
+
+    def score_profiles(self, profiles: Sequence[Any], calories_ranges: Sequence[tuple[int, int]]) -> np.ndarray:
+        """
+        Считает score всех планов для пачки профилей.
+        calories_ranges — оценка калорий для каждого профиля (MatchingService._estimate_calories_range).
+        Возвращает матрицу [профиль, план]
+        """
+        goals = [profile.goal for profile in profiles]
+        has_goal = np.array([bool(goal) for goal in goals], dtype=bool)
+
+        # 1. Совпадение по цели (вес 0.5)
+        counted = has_goal[:, None] & self._goal_filled[None, :]
+        hit = self._goal_matrix[:, _profile_columns(self._goal_vocabulary, goals)].T & counted
+        score = np.where(hit, 0.5, 0.0)
+        total_weight = np.where(counted, 0.5, 0.0)
+
+        # 2. Совпадение по калориям (вес 0.4)
+        user_min = np.array([calories[0] for calories in calories_ranges], dtype=float)[:, None]
+        user_max = np.array([calories[1] for calories in calories_ranges], dtype=float)[:, None]
+        overlap_start = np.maximum(self._calories_min[None, :], user_min)
+        overlap_end = np.minimum(self._calories_max[None, :], user_max)
+        total_range = user_max - user_min
+        overlaps = self._has_calories[None, :] & (overlap_start <= overlap_end) & (total_range > 0)
+        overlap_score = np.divide(
+            overlap_end - overlap_start,
+            total_range,
+            out=np.zeros_like(overlap_start),
+            where=overlaps,
+        )
+        score = score + np.where(overlaps, 0.4 * overlap_score, 0.0)
+        total_weight = total_weight + np.where(self._has_calories, 0.4, 0.0)[None, :]
+
+        # 3. Тип телосложения (вес 0.1) — не зависит от плана
+        for row, profile in enumerate(profiles):
+            if profile.body_type and profile.body_type != 'unknown':
+                score[row] = score[row] + 0.1 * 0.5
+                total_weight[row] = total_weight[row] + 0.1
+
+        return np.divide(score, total_weight, out=score.copy(), where=total_weight > 0)
+
+    def score_profile(self, profile: Any, calories_range: tuple[int, int]) -> np.ndarray:
+        """Score всех планов для одного профиля"""
+        return self.score_profiles([profile], [calories_range])[0]
+
+    def best_for_profiles(self, profiles: Sequence[Any], calories_ranges: Sequence[tuple[int, int]]) -> List[Optional[tuple[Any, float]]]:
+        """
+        Лучший план (id, score) для каждого профиля, None — если подходящих нет
+        """
+        result = []
+        for start in range(0, len(profiles), PROFILES_CHUNK_SIZE):
+            chunk = profiles[start:start + PROFILES_CHUNK_SIZE]
+            chunk_calories = calories_ranges[start:start + PROFILES_CHUNK_SIZE]
+            result.extend(_best_per_profile(self.plan_ids, self.score_profiles(chunk, chunk_calories)))
+        return result
@@ -0,0 +1,131 @@
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Optional, Dict, Any
+from src.database.listener import NotificationListener
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Entitlement:
+    """
+    Закэшированный результат проверки подписки.
+    user_id=None — пользователь не найден в БД, ends_at=None — активной подписки нет.
+    """
+    user_id: Optional[Any]
+    ends_at: Optional[datetime]
+    expires_at: float
+
+    def has_subscription(self) -> bool:
+        """Подписка активна прямо сейчас (срок проверяется локально, без запроса в БД)"""
+        if self.ends_at is None:
+            return False
+        return self.ends_at >= datetime.now(timezone.utc)
+
+
+class EntitlementCache:
+    """
+    LRU-кэш прав доступа по telegram_id с TTL.
+    Отсутствие подписки тоже кэшируется, но на более короткий срок.
+    """
+
+    def __init__(self, ttl: float = 300.0, negative_ttl: float = 30.0, max_size: int = 10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[int, Entitlement] = OrderedDict()
+        # user_id -> telegram_id, чтобы сбрасывать запись по событию из БД
+        self._telegram_ids: Dict[Any, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, telegram_id: int) -> Optional[Entitlement]:
+        """
+        Возвращает запись из кэша или None, если её нет, истёк TTL или закончилась подписка
+        """
+        entry = self._entries.get(telegram_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at < time.monotonic():
+            self._remove(telegram_id)
+            self.misses += 1
+            return None
+        if entry.ends_at is not None and not entry.has_subscription():
+            # Подписка истекла — перепроверим в БД, вдруг есть более новая
+            self._remove(telegram_id)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(telegram_id)
+        self.hits += 1
+        return entry
+
+    def put(self, telegram_id: int, user_id: Optional[Any], ends_at: Optional[datetime]) -> Entitlement:
+        """
+        Сохраняет результат проверки подписки
+        """
+        ttl = self.ttl if ends_at is not None else self.negative_ttl
+        entry = Entitlement(user_id=user_id, ends_at=ends_at, expires_at=time.monotonic() + ttl)
+        self._remove(telegram_id)
+        self._entries[telegram_id] = entry
+        if user_id is not None:
+            self._telegram_ids[str(user_id)] = telegram_id
+
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+        return entry
+
+    def invalidate_user(self, user_id: Any) -> Optional[int]:
+        """
+        Сбрасывает запись пользователя (вызывается при изменении его подписки).
+        Возвращает его telegram_id, если запись была в кэше
+        """
+        telegram_id = self._telegram_ids.get(str(user_id))
+        if telegram_id is not None:
+            self._remove(telegram_id)
+            logger.info(f"Entitlement cache invalidated for user {user_id}")
+        return telegram_id
+
+    def clear(self):
+        """Полностью очищает кэш"""
+        self._entries.clear()
+        self._telegram_ids.clear()
+
+    def _remove(self, telegram_id: int):
+        entry = self._entries.pop(telegram_id, None)
+        if entry is not None and entry.user_id is not None:
+            self._telegram_ids.pop(str(entry.user_id), None)
+
+
+def watch_subscription_changes(
+    listener: NotificationListener,
+    channel: str,
+    cache: EntitlementCache,
+    on_change: Optional[Callable[[int], None]] = None,
+):
+    """
+    Подписывает кэш на уведомления Postgres (LISTEN/NOTIFY) об изменении подписок.
+    Админка работает в отдельном процессе, поэтому инвалидация идёт через БД.
+    on_change получает telegram_id сброшенного пользователя.
+    """
+    def on_notification(payload: str):
+        telegram_id = cache.invalidate_user(payload)
+        if telegram_id is not None and on_change:
+            on_change(telegram_id)
+
+    listener.subscribe(channel, on_notification, on_connect=cache.clear)
+
+
+# Глобальный экземпляр кэша
+entitlement_cache = EntitlementCache(
+    ttl=float(os.getenv("ACL_CACHE_TTL_SECONDS", "300")),
+    negative_ttl=float(os.getenv("ACL_CACHE_NEGATIVE_TTL_SECONDS", "30")),
+    max_size=int(os.getenv("ACL_CACHE_MAX_SIZE", "10000")),
+)
@@ -1,102 +1,639 @@
 import os
+import stat
+import time
+import json
+import uuid
+import asyncio
+import hashlib
+import inspect
+import weakref
 import aiofiles
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Dict, Set, Tuple, Callable, Awaitable, Union, Any, AsyncIterator
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, InputFile, InputMediaDocument, InputMediaPhoto, Message
+from PIL import Image, ImageOps
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.repositories.telegram_file_repo import TelegramFileRepository
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Размер порции при потоковой записи и хэшировании
+CHUNK_SIZE = 1024 * 1024
+
+# Максимум файлов в одном альбоме Telegram (sendMediaGroup)
+MEDIA_GROUP_SIZE = 10
+
+# Параметры сжатых копий изображений для отправки фото: Telegram всё равно
+# пережимает фото до 1280px, поэтому большие оригиналы загружать незачем
+PHOTO_MAX_SIDE = 1280
+PHOTO_QUALITY = 85
+
+# Содержимое файла: bytes, объект с read(size) (в т.ч. асинхронным, как UploadFile)
+# или асинхронный итератор порций
+FileSource = Union[bytes, Any]
+
 
 class FileService:
     """
     Сервис для управления файлами планов питания
     """
 
-    def __init__(self):
+    def __init__(self, stat_ttl: float = 10.0, stat_cache_size: int = 5000):
         # Директория для хранения файлов
         self.base_dir = Path("files")
+        # Старые файлы вида {plan_id}_pdf_{filename}
         self.meal_plans_dir = self.base_dir / "meal_plans"
+        # Хранилище по хэшу содержимого: objects/ab/cd/<sha256><расширение>.
+        # Одинаковые файлы разных планов хранятся один раз
+        self.objects_dir = self.base_dir / "objects"
+        self.tmp_dir = self.base_dir / "tmp"
+        # Сжатые копии изображений: variants/ab/<хэш оригинала>_1280.jpg
+        self.variants_dir = self.base_dir / "variants"
+        # Списки файлов каждого плана — поиск и удаление без обхода директории
+        self.manifests_dir = self.base_dir / "manifests"
         self._ensure_directories()
+        # Полный путь -> (время проверки, stat или None): метаданные читаются вне event loop
+        # и кэшируются ненадолго, чтобы медленный диск не тормозил обработку апдейтов
+        self.stat_ttl = stat_ttl
+        self.stat_cache_size = stat_cache_size
+        self._stats: Dict[Path, Tuple[float, Optional[os.stat_result]]] = {}
+        # Блокировки манифестов живут, пока их кто-то держит или ждёт — словарь не растёт
+        self._manifest_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        # Полный путь -> (mtime_ns, размер, хэш): хэш пересчитывается, только если файл изменился
+        self._hashes: Dict[Path, Tuple[int, int, str]] = {}
+        # (хэш, тип) -> file_id Telegram; в БД хранится копия для других процессов и рестартов
+        self._file_ids: Dict[Tuple[str, str], str] = {}
 
     def _ensure_directories(self):
         """Создает необходимые директории"""
         self.meal_plans_dir.mkdir(parents=True, exist_ok=True)
-        logger.info(f"Created directories: {self.meal_plans_dir}")
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.variants_dir.mkdir(parents=True, exist_ok=True)
+        logger.info(f"Created directories: {self.meal_plans_dir}, {self.objects_dir}, {self.manifests_dir}")
 
-    async def save_pdf_file(self, plan_id: str, file_data: bytes, filename: str) -> str:
+    async def stat(self, full_path: Path) -> Optional[os.stat_result]:
         """
-        Сохраняет PDF файл плана питания
+        stat() файла в отдельном потоке с коротким кэшем. None — файла нет
+        """
+        now = time.monotonic()
+        cached = self._stats.get(full_path)
+        if cached and now - cached[0] < self.stat_ttl:
+            return cached[1]
+
+        try:
+            result = await asyncio.to_thread(os.stat, full_path)
+        except (FileNotFoundError, NotADirectoryError):
+            result = None
+
+        if len(self._stats) >= self.stat_cache_size:
+            self._stats.clear()
+        self._stats[full_path] = (now, result)
+        return result
+
+    def _forget_stat(self, full_path: Path):
+        self._stats.pop(full_path, None)
+
+    def _object_path(self, content_hash: str, suffix: str) -> Path:
+        return self.objects_dir / content_hash[:2] / content_hash[2:4] / f"{content_hash}{suffix}"
+
+    @staticmethod
+    async def _iter_chunks(source: FileSource) -> AsyncIterator[bytes]:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            for offset in range(0, len(source), CHUNK_SIZE):
+                yield bytes(source[offset:offset + CHUNK_SIZE])
+        elif hasattr(source, "read"):
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if inspect.isawaitable(chunk):
+                    chunk = await chunk
+                if not chunk:
+                    break
+                yield chunk
+        else:
+            async for chunk in source:
+                yield chunk
+
+    async def _store(self, plan_id: str, source: FileSource, filename: str) -> str:
+        """
+        Потоково записывает файл во временный, попутно считая хэш, и переносит его в хранилище.
+        Если такой файл уже есть, новая копия не сохраняется.
+        Возвращает относительный путь объекта.
+        """
+        digest = hashlib.sha256()
+        tmp_path = self.tmp_dir / f"{uuid.uuid4().hex}.part"
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as f:
+                async for chunk in self._iter_chunks(source):
+                    digest.update(chunk)
+                    await f.write(chunk)
+
+            content_hash = digest.hexdigest()
+            object_path = self._object_path(content_hash, Path(filename).suffix.lower())
+
+            def commit() -> bool:
+                if object_path.exists():
+                    # Дубликат: обновляем mtime, чтобы сборщик мусора не удалил объект,
+                    # пока ссылка на него ещё не сохранена в плане
+                    os.utime(object_path)
+                    return False
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, object_path)
+                return True
+
+            is_new = await asyncio.to_thread(commit)
+        finally:
+            await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+
+        self._forget_stat(object_path)
+        relative_path = str(object_path.relative_to(self.base_dir))
+        if not is_new:
+            logger.info(f"File content already stored, reusing {relative_path}")
+        await self._add_to_manifest(plan_id, relative_path)
+        return relative_path
+
+    def _manifest_path(self, plan_id: str) -> Path:
+        return self.manifests_dir / f"{plan_id}.json"
+
+    def _manifest_lock(self, plan_id: str) -> asyncio.Lock:
+        lock = self._manifest_locks.get(str(plan_id))
+        if lock is None:
+            lock = asyncio.Lock()
+            self._manifest_locks[str(plan_id)] = lock
+        return lock
+
+    @staticmethod
+    def _read_json(path: Path) -> Optional[List[str]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_json(path: Path, data: List[str]):
+        # Пишем во временный файл и подменяем — манифест не бывает записан наполовину
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    async def _add_to_manifest(self, plan_id: str, relative_path: str):
+        async with self._manifest_lock(plan_id):
+            manifest_path = self._manifest_path(plan_id)
+            files = await asyncio.to_thread(self._read_json, manifest_path) or []
+            if relative_path not in files:
+                files.append(relative_path)
+                await asyncio.to_thread(self._write_json, manifest_path, files)
+
+    async def get_plan_files(self, plan_id: str) -> List[str]:
+        """
+        Возвращает относительные пути всех файлов плана (по манифесту)
         """
-        file_path = self.meal_plans_dir / f"{plan_id}_pdf_{filename}"
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(file_data)
+        manifest = await asyncio.to_thread(self._read_json, self._manifest_path(plan_id))
+        if manifest is not None:
+            return manifest
 
-        relative_path = str(file_path.relative_to(self.base_dir))
+        # Файлы, сохранённые до появления манифестов
+        def legacy_glob() -> List[str]:
+            return [
+                str(path.relative_to(self.base_dir))
+                for path in self.meal_plans_dir.glob(f"{plan_id}_*") if path.is_file()
+            ]
+        return await asyncio.to_thread(legacy_glob)
+
+    async def save_pdf_file(self, plan_id: str, file_data: FileSource, filename: str) -> str:
+        """
+        Сохраняет PDF файл плана питания
+        """
+        relative_path = await self._store(plan_id, file_data, filename)
         logger.info(f"Saved PDF file: {relative_path}")
         return relative_path
 
-    async def save_image_file(self, plan_id: str, file_data: bytes, filename: str, index: int) -> str:
+    async def save_image_file(self, plan_id: str, file_data: FileSource, filename: str, index: int) -> str:
         """
         Сохраняет изображение плана питания
         """
-        file_path = self.meal_plans_dir / f"{plan_id}_image_{index}_{filename}"
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(file_data)
-
-        relative_path = str(file_path.relative_to(self.base_dir))
-        logger.info(f"Saved image file: {relative_path}")
+        relative_path = await self._store(plan_id, file_data, filename)
+        logger.info(f"Saved image file #{index}: {relative_path}")
         return relative_path
 
-    def get_pdf_path(self, pdf_file_path: str) -> Optional[Path]:
+    async def get_pdf_path(self, pdf_file_path: str) -> Optional[Path]:
         """
         Получает полный путь к PDF файлу
         """
-        if not pdf_file_path:
+        return await self.get_file_path(pdf_file_path)
+
+    async def get_file_path(self, file_path: str) -> Optional[Path]:
+        """
+        Получает полный путь к файлу, если он существует
+        """
+        if not file_path:
             return None
 
-        full_path = self.base_dir / pdf_file_path
-        if full_path.exists() and full_path.is_file():
+        full_path = self.base_dir / file_path
+        file_stat = await self.stat(full_path)
+        if file_stat and stat.S_ISREG(file_stat.st_mode):
             return full_path
         return None
 
-    def get_image_paths(self, image_file_paths: List[str]) -> List[Path]:
+    @staticmethod
+    def _as_path_list(file_paths: Union[List[str], str, None]) -> List[str]:
+        """Через админку массив путей может быть сохранён строкой"""
+        if isinstance(file_paths, str):
+            try:
+                file_paths = json.loads(file_paths)
+            except ValueError:
+                file_paths = [file_paths]
+        return [path for path in file_paths or [] if path]
+
+    async def get_image_paths(self, image_file_paths: List[str]) -> List[Path]:
         """
         Получает пути к файлам изображений
         """
-        paths = []
+        image_file_paths = self._as_path_list(image_file_paths)
         if not image_file_paths:
-            return paths
-
-        for path_str in image_file_paths:
-            if path_str:
-                full_path = self.base_dir / path_str
-                if full_path.exists() and full_path.is_file():
-                    paths.append(full_path)
+            return []
 
-        return paths
+        # Проверяем все файлы параллельно
+        paths = await asyncio.gather(*(self.get_file_path(path_str) for path_str in image_file_paths))
+        return [path for path in paths if path]
 
     async def delete_plan_files(self, plan_id: str):
         """
-        Удаляет все файлы связанные с планом питания
+        Удаляет все файлы связанные с планом питания.
+        Объекты хранилища могут использоваться другими планами — их удаляет collect_garbage
         """
-        deleted_files = []
-        for file_path in self.meal_plans_dir.glob(f"{plan_id}_*"):
-            if file_path.is_file():
-                file_path.unlink()
-                deleted_files.append(str(file_path))
-                logger.info(f"Deleted file: {file_path}")
+        async with self._manifest_lock(plan_id):
+            relative_paths = await self.get_plan_files(plan_id)
 
+            def unlink_all() -> List[str]:
+                deleted = []
+                for relative_path in relative_paths:
+                    file_path = self.base_dir / relative_path
+                    if self._is_object(file_path):
+                        continue
+                    try:
+                        file_path.unlink()
+                    except FileNotFoundError:
+                        continue
+                    deleted.append(str(file_path))
+                self._manifest_path(plan_id).unlink(missing_ok=True)
+                return deleted
+
+            deleted_files = await asyncio.to_thread(unlink_all)
+
+        for file_path in deleted_files:
+            self._forget_stat(Path(file_path))
+            logger.info(f"Deleted file: {file_path}")
         return deleted_files
 
-    def get_file_size(self, file_path: str) -> Optional[int]:
+    async def get_file_size(self, file_path: str) -> Optional[int]:
         """
         Получает размер файла в байтах
         """
         full_path = self.base_dir / file_path
-        if full_path.exists() and full_path.is_file():
-            return full_path.stat().st_size
+        file_stat = await self.stat(full_path)
+        if file_stat and stat.S_ISREG(file_stat.st_mode):
+            return file_stat.st_size
         return None
 
+    async def collect_garbage(self, referenced: Set[str], grace_seconds: float = 3600, dry_run: bool = False) -> List[str]:
+        """
+        Удаляет объекты хранилища, на которые не ссылается ни один план, и брошенные
+        временные файлы. Свежие файлы (моложе grace_seconds) не трогаем: ссылка
+        на только что загруженный файл может быть ещё не сохранена.
+        Возвращает относительные пути удалённых объектов.
+        """
+        def sweep() -> List[str]:
+            now = time.time()
+            removed = []
+            for path in self.objects_dir.rglob("*"):
+                if not path.is_file():
+                    continue
+                relative_path = str(path.relative_to(self.base_dir))
+                if relative_path in referenced or now - path.stat().st_mtime < grace_seconds:
+                    continue
+                if not dry_run:
+                    path.unlink(missing_ok=True)
+                removed.append(relative_path)
+
+            # Сжатые копии удаляем вместе с оригиналами: копия нужна, пока на её оригинал
+            # ссылается план — объект хранилища или старый файл из meal_plans/
+            referenced_hashes = {self._referenced_hash(relative_path) for relative_path in referenced}
+            for path in self.variants_dir.rglob("*.jpg"):
+                source_hash = path.name.split("_", 1)[0]
+                if source_hash in referenced_hashes or now - path.stat().st_mtime < grace_seconds:
+                    continue
+                if not dry_run:
+                    path.unlink(missing_ok=True)
+                removed.append(str(path.relative_to(self.base_dir)))
+
+            if not dry_run:
+                # Недописанные загрузки и копии изображений, оставшиеся после падения процесса
+                for path in [*self.tmp_dir.glob("*.part"), *self.variants_dir.rglob("*.tmp")]:
+                    if now - path.stat().st_mtime >= grace_seconds:
+                        path.unlink(missing_ok=True)
+            return removed
+
+        removed = await asyncio.to_thread(sweep)
+        for relative_path in removed:
+            self._forget_stat(self.base_dir / relative_path)
+        logger.info(f"Garbage collection {'(dry run) ' if dry_run else ''}removed {len(removed)} orphaned files")
+        return removed
+
+    def _referenced_hash(self, relative_path: str) -> Optional[str]:
+        """
+        Хэш содержимого файла, на который ссылается план (None — файла нет).
+        Вызывается из потока сборщика мусора: старые файлы читаются, только если
+        хэш ещё не посчитан при отправке или файл с тех пор изменился
+        """
+        full_path = self.base_dir / relative_path
+        if self._is_object(full_path):
+            return full_path.name.split(".", 1)[0]
+        try:
+            file_stat = full_path.stat()
+        except OSError:
+            return None
+        if not stat.S_ISREG(file_stat.st_mode):
+            return None
+        cached = self._hashes.get(full_path)
+        if cached and cached[0] == file_stat.st_mtime_ns and cached[1] == file_stat.st_size:
+            return cached[2]
+        return self._hash_file(full_path)
+
+    def _is_object(self, full_path: Path) -> bool:
+        return self.objects_dir in full_path.parents
+
+    @staticmethod
+    def _hash_file(full_path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(full_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    async def get_content_hash(self, full_path: Path) -> str:
+        """
+        Хэш содержимого файла. Файл читается только при первом обращении и после изменения
+        """
+        if self._is_object(full_path):
+            # Имя объекта хранилища и есть хэш содержимого — файл читать не нужно
+            return full_path.name.split(".", 1)[0]
+
+        file_stat = await self.stat(full_path)
+        if file_stat is None:
+            raise FileNotFoundError(full_path)
+        cached = self._hashes.get(full_path)
+        if cached and cached[0] == file_stat.st_mtime_ns and cached[1] == file_stat.st_size:
+            return cached[2]
+
+        content_hash = await asyncio.to_thread(self._hash_file, full_path)
+        self._hashes[full_path] = (file_stat.st_mtime_ns, file_stat.st_size, content_hash)
+        return content_hash
+
+    async def get_file_id(self, session: AsyncSession, content_hash: str, kind: str) -> Optional[str]:
+        """
+        Возвращает file_id ранее загруженного файла с таким содержимым
+        """
+        return (await self.get_file_ids(session, [content_hash], kind)).get(content_hash)
+
+    async def get_file_ids(self, session: AsyncSession, content_hashes: List[str], kind: str) -> Dict[str, str]:
+        """
+        file_id ранее загруженных файлов: хэш -> file_id. Чего нет в памяти процесса,
+        ищется в БД одним запросом в сессии хэндлера
+        """
+        file_ids = {}
+        missing = []
+        for content_hash in content_hashes:
+            file_id = self._file_ids.get((content_hash, kind))
+            if file_id:
+                file_ids[content_hash] = file_id
+            elif content_hash not in missing:
+                missing.append(content_hash)
+
+        if missing:
+            stored = await TelegramFileRepository(session).get_file_ids(missing, kind)
+            for content_hash, file_id in stored.items():
+                self._file_ids[(content_hash, kind)] = file_id
+            file_ids.update(stored)
+        return file_ids
+
+    async def remember_file_id(self, session: AsyncSession, content_hash: str, kind: str, file_id: str):
+        """
+        Запоминает file_id после загрузки файла в Telegram
+        """
+        await self.remember_file_ids(session, {content_hash: file_id}, kind)
+
+    async def remember_file_ids(self, session: AsyncSession, file_ids: Dict[str, str], kind: str):
+        """
+        Запоминает file_id нескольких загруженных файлов (одним запросом)
+        """
+        for content_hash, file_id in file_ids.items():
+            self._file_ids[(content_hash, kind)] = file_id
+        await TelegramFileRepository(session).save_file_ids(file_ids, kind)
+
+    async def forget_file_id(self, session: AsyncSession, content_hash: str, kind: str):
+        """
+        Забывает file_id, который Telegram больше не принимает
+        """
+        await self.forget_file_ids(session, [content_hash], kind)
+
+    async def forget_file_ids(self, session: AsyncSession, content_hashes: List[str], kind: str):
+        """
+        Забывает file_id нескольких файлов (одним запросом)
+        """
+        for content_hash in content_hashes:
+            self._file_ids.pop((content_hash, kind), None)
+        await TelegramFileRepository(session).delete_file_ids(content_hashes, kind)
+
+    async def send_cached(
+        self,
+        session: AsyncSession,
+        file_path: str,
+        kind: str,
+        send: Callable[[Union[str, InputFile]], Awaitable[Message]],
+        filename: Optional[str] = None,
+    ) -> Optional[Message]:
+        """
+        Отправляет файл через send (например, message.answer_document), переиспользуя file_id:
+        файл загружается в Telegram только при первой отправке и после изменения содержимого.
+        session — сессия БД хэндлера, в ней ищется и сохраняется file_id.
+        kind — тип вложения в ответе Telegram: 'document', 'photo' и т.п.
+        filename — имя файла для пользователя (в хранилище файлы названы по хэшу).
+        Возвращает отправленное сообщение или None, если файла нет.
+        """
+        full_path = await self.get_file_path(file_path)
+        if not full_path:
+            return None
+
+        content_hash = await self.get_content_hash(full_path)
+        file_id = await self.get_file_id(session, content_hash, kind)
+        if file_id:
+            try:
+                return await send(file_id)
+            except TelegramBadRequest as e:
+                # file_id мог стать недействительным — загружаем файл заново
+                logger.warning(f"Cached file_id for {file_path} rejected: {e}")
+                await self.forget_file_id(session, content_hash, kind)
+
+        upload_path = await self.get_photo_variant(full_path, content_hash) if kind == "photo" else full_path
+        sent_message = await send(FSInputFile(upload_path, filename=filename))
+        file_id = self._extract_file_id(sent_message, kind)
+        if file_id:
+            await self.remember_file_id(session, content_hash, kind, file_id)
+            logger.info(f"Uploaded {file_path} to Telegram, file_id cached")
+        return sent_message
+
+    async def send_album(
+        self,
+        session: AsyncSession,
+        bot: Bot,
+        chat_id: int,
+        file_paths: List[str],
+        kind: str = "photo",
+        caption: Optional[str] = None,
+        parse_mode: Optional[str] = None,
+    ) -> List[Message]:
+        """
+        Отправляет файлы альбомами по MEDIA_GROUP_SIZE (sendMediaGroup) — один вызов API
+        и один слот лимита чата на альбом вместо одного на файл.
+        kind — 'photo' (отправляются сжатые копии) или 'document': Telegram не смешивает
+        фото и документы в одном альбоме. Подпись ставится к первому файлу.
+        Уже загруженные файлы отправляются по file_id: их file_id для всего альбома
+        ищутся одним запросом в сессии хэндлера session.
+        """
+        items = []
+        for file_path in self._as_path_list(file_paths):
+            full_path = await self.get_file_path(file_path)
+            if full_path:
+                items.append((await self.get_content_hash(full_path), full_path))
+
+        known_file_ids = await self.get_file_ids(session, [content_hash for content_hash, _ in items], kind)
+        messages = []
+        for offset in range(0, len(items), MEDIA_GROUP_SIZE):
+            chunk = items[offset:offset + MEDIA_GROUP_SIZE]
+            file_ids = [known_file_ids.get(content_hash) for content_hash, _ in chunk]
+            messages.extend(await self._send_album_chunk(
+                session, bot, chat_id, chunk, file_ids, kind, caption if offset == 0 else None, parse_mode
+            ))
+        return messages
+
+    async def _send_album_chunk(
+        self,
+        session: AsyncSession,
+        bot: Bot,
+        chat_id: int,
+        chunk: List[Tuple[str, Path]],
+        file_ids: List[Optional[str]],
+        kind: str,
+        caption: Optional[str],
+        parse_mode: Optional[str],
+    ) -> List[Message]:
+        try:
+            return await self._send_media(session, bot, chat_id, chunk, file_ids, kind, caption, parse_mode)
+        except TelegramBadRequest as e:
+            if not any(file_ids):
+                raise
+            # Какой-то file_id стал недействительным — загружаем альбом заново
+            logger.warning(f"Cached file_ids rejected in album: {e}")
+            rejected = [content_hash for (content_hash, _), file_id in zip(chunk, file_ids) if file_id]
+            await self.forget_file_ids(session, rejected, kind)
+            return await self._send_media(
+                session, bot, chat_id, chunk, [None] * len(chunk), kind, caption, parse_mode
+            )
+
+    async def _send_media(
+        self,
+        session: AsyncSession,
+        bot: Bot,
+        chat_id: int,
+        chunk: List[Tuple[str, Path]],
+        file_ids: List[Optional[str]],
+        kind: str,
+        caption: Optional[str],
+        parse_mode: Optional[str],
+    ) -> List[Message]:
+        sources = []
+        for (content_hash, full_path), file_id in zip(chunk, file_ids):
+            if file_id:
+                sources.append(file_id)
+            elif kind == "photo":
+                sources.append(FSInputFile(await self.get_photo_variant(full_path, content_hash)))
+            else:
+                sources.append(FSInputFile(full_path))
+
+        if len(sources) == 1:
+            # В альбоме должно быть от 2 файлов
+            send = bot.send_photo if kind == "photo" else bot.send_document
+            sent = [await send(chat_id, sources[0], caption=caption, parse_mode=parse_mode)]
+        else:
+            media_type = InputMediaPhoto if kind == "photo" else InputMediaDocument
+            media = [
+                media_type(media=source, caption=caption if index == 0 else None, parse_mode=parse_mode)
+                for index, source in enumerate(sources)
+            ]
+            sent = await bot.send_media_group(chat_id, media)
+
+        new_file_ids = {}
+        for (content_hash, _), file_id, sent_message in zip(chunk, file_ids, sent):
+            if not file_id:
+                new_file_id = self._extract_file_id(sent_message, kind)
+                if new_file_id:
+                    new_file_ids[content_hash] = new_file_id
+        await self.remember_file_ids(session, new_file_ids, kind)
+        return sent
+
+    async def get_photo_variant(self, full_path: Path, content_hash: str) -> Path:
+        """
+        Сжатая копия изображения для отправки фото (JPEG до PHOTO_MAX_SIDE по большей стороне).
+        Создаётся один раз на содержимое файла; если файл не удаётся обработать — оригинал
+        """
+        variant_path = self.variants_dir / content_hash[:2] / f"{content_hash}_{PHOTO_MAX_SIDE}.jpg"
+        if await self.stat(variant_path):
+            return variant_path
+
+        try:
+            await asyncio.to_thread(self._make_photo_variant, full_path, variant_path)
+        except OSError as e:
+            logger.warning(f"Cannot prepare photo variant for {full_path}: {e}")
+            return full_path
+
+        self._forget_stat(variant_path)
+        logger.info(f"Prepared photo variant: {variant_path}")
+        return variant_path
+
+    @staticmethod
+    def _make_photo_variant(source_path: Path, variant_path: Path):
+        with Image.open(source_path) as image:
+            # Учитываем поворот из EXIF — после пересохранения метаданных не останется
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((PHOTO_MAX_SIDE, PHOTO_MAX_SIDE))
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            variant_path.parent.mkdir(parents=True, exist_ok=True)
+            # Уникальное имя: одно изображение могут впервые отправлять сразу несколько
+            # воркеров и процессов — каждый пишет свою копию, подмена атомарна
+            tmp_path = variant_path.with_name(f"{variant_path.stem}.{uuid.uuid4().hex}.tmp")
+            try:
+                image.save(tmp_path, "JPEG", quality=PHOTO_QUALITY, optimize=True, progressive=True)
+                os.replace(tmp_path, variant_path)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+
+    @staticmethod
+    def _extract_file_id(message: Message, kind: str) -> Optional[str]:
+        if kind == "photo":
+            # Берём самый большой размер
+            return message.photo[-1].file_id if message.photo else None
+        media = getattr(message, kind, None)
+        return media.file_id if media else None
+
     def validate_file_type(self, filename: str, allowed_extensions: List[str]) -> bool:
         """
         Проверяет расширение файла
@@ -109,4 +646,4 @@ class FileService:
 
 
 # Глобальный экземпляр сервиса
-file_service = FileService()
+file_service = FileService(stat_ttl=float(os.getenv("FILE_STAT_TTL_SECONDS", "10")))
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+import logging
+
+from src.services.metrics import metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# Лаг — доли миллисекунды в норме, поэтому корзины мельче, чем у времени хэндлеров
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+loop_lag = metrics_registry.histogram(
+    "event_loop_lag_seconds", "Насколько позже запланированного просыпается задача в event loop", buckets=LAG_BUCKETS
+)
+loop_blocks_total = metrics_registry.counter(
+    "event_loop_blocks_total", "Блокировок event loop дольше порога, по коду, который выполнялся", labels=("handler",)
+)
+loop_blocked_seconds = metrics_registry.counter(
+    "event_loop_blocked_seconds_total", "Суммарное время блокировок event loop", labels=("handler",)
+)
+
+
+class LoopMonitor:
+    """
+    Следит за отзывчивостью event loop.
+
+    Задача в loop каждые interval секунд засыпает и меряет, насколько позже проснулась
+    (лаг планирования). Сторожевой поток смотрит, когда задача отметилась последний раз:
+    если она опаздывает больше чем на block_threshold, loop занят синхронным кодом —
+    поток запоминает, какая задача выполняется (и чей хэндлер, см. attribute()),
+    а при долгой блокировке ещё и стек потока loop.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        block_threshold: float = 0.1,
+        stack_threshold: Optional[float] = 0.5,
+        stack_log_interval: float = 60.0,
+    ):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        # Блокировки дольше этого логируются со стеком (None — стеки не снимаются)
+        self.stack_threshold = stack_threshold
+        # Стек для одного и того же хэндлера пишется в лог не чаще раза в stack_log_interval секунд
+        self.stack_log_interval = stack_log_interval
+
+        # Задача -> хэндлер, который она сейчас выполняет
+        self._labels: Dict[asyncio.Task, str] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = 0.0
+        # Что выполнялось во время текущей задержки: (heartbeat, хэндлер, стек)
+        self._capture: Optional[Tuple[float, str, Optional[str]]] = None
+        self._stack_logged: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        # Метрики
+        self.max_lag = 0.0
+        self.blocks = 0
+
+    @contextmanager
+    def attribute(self, label: str):
+        """
+        Помечает текущую задачу: блокировки loop внутри блока относятся к label
+        """
+        task = asyncio.current_task()
+        previous = self._labels.get(task)
+        self._labels[task] = label
+        try:
+            yield
+        finally:
+            if previous is None:
+                self._labels.pop(task, None)
+            else:
+                self._labels[task] = previous
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._watchdog:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _run(self):
+        while True:
+            previous = self._heartbeat
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - previous - self.interval, 0.0)
+            capture, self._capture = self._capture, None
+            self._heartbeat = now
+
+            loop_lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.block_threshold:
+                # Снимок сторожевого потока относится к этой задержке, только если сделан после прошлой отметки
+                label, stack = (capture[1], capture[2]) if capture and capture[0] == previous else ("unknown", None)
+                self._report(lag, label, stack)
+
+    def _report(self, lag: float, label: str, stack: Optional[str]):
+        self.blocks += 1
+        loop_blocks_total.inc(label)
+        loop_blocked_seconds.inc(label, amount=lag)
+
+        now = time.monotonic()
+        if stack and now - self._stack_logged.get(label, 0.0) >= self.stack_log_interval:
+            self._stack_logged[label] = now
+            logger.warning(
+                "Event loop blocked for %.0fms in %s, stack:\n%s", lag * 1000, label, stack,
+                extra={"handler": label, "lag_ms": round(lag * 1000, 1)}
+            )
+        else:
+            logger.warning(
+                "Event loop blocked for %.0fms in %s", lag * 1000, label,
+                extra={"handler": label, "lag_ms": round(lag * 1000, 1)}
+            )
+
+    def _watch(self):
+        """
+        Сторожевой поток: работает, пока loop заблокирован, поэтому видит виновника «на месте»
+        """
+        check_interval = min(self.block_threshold / 2, self.interval)
+        while not self._stop.wait(check_interval):
+            heartbeat = self._heartbeat
+            delay = time.monotonic() - heartbeat - self.interval
+            if delay < self.block_threshold or (self._capture and self._capture[0] == heartbeat):
+                continue
+            label = self._current_label()
+            self._capture = (heartbeat, label, None)
+            if self.stack_threshold is None:
+                continue
+            # Ждём, пока блокировка дорастёт до порога стека, и снимаем стек, если loop всё ещё занят
+            if self._stop.wait(max(self.stack_threshold - delay, 0.0)) or self._heartbeat != heartbeat:
+                continue
+            self._capture = (heartbeat, label, self._current_stack())
+
+    def _current_label(self) -> str:
+        try:
+            task = asyncio.current_task(self._loop)
+        except Exception:
+            task = None
+        if task is None:
+            # Блокирует не задача, а колбэк loop (call_soon, транспорт и т.п.)
+            return "callback"
+        return self.task_label(task)
+
+    def task_label(self, task: asyncio.Task) -> str:
+        """
+        Хэндлер, который выполняет задача, или имя её корутины
+        """
+        label = self._labels.get(task)
+        if label:
+            return label
+        coro = task.get_coro()
+        return getattr(coro, "__qualname__", task.get_name())
+
+    def _current_stack(self) -> Optional[str]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        return "".join(traceback.format_stack(frame, limit=15))
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "max_lag": self.max_lag,
+            "blocks": self.blocks,
+        }
+
+
+# Глобальный монитор event loop процесса бота
+loop_monitor = LoopMonitor(
+    interval=float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", "0.5")),
+    block_threshold=float(os.getenv("LOOP_BLOCK_SECONDS", "0.1")),
+    stack_threshold=float(os.getenv("LOOP_STACK_SECONDS", "0.5")) if os.getenv("LOOP_STACK_SECONDS", "0.5") else None,
+)
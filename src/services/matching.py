@@ -1,7 +1,11 @@
+import asyncio
+from itertools import product
 from typing import Optional, List, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_, and_
 from src.database.models import WorkoutPlan, MealPlan, UserProfile
+from src.database.repositories.plan_match_repo import PlanMatchRepository
+from src.services.plan_catalog import plan_catalog, WorkoutPlanIndex
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,31 +31,122 @@ class MatchingService:
 
         logger.info(f"Matching workout plan for user with goal={goal}, difficulty={difficulty}, body_type={body_type}, experience={experience}")
 
-        # Запрос планов с учетом критериев
-        stmt = select(WorkoutPlan).where(
-            WorkoutPlan.is_active == True
-        ).order_by(WorkoutPlan.created_at.desc())
+        # Версия каталога нужна и для проверки предрассчитанного подбора
+        await plan_catalog.ensure_fresh(self.session)
 
-        result = await self.session.execute(stmt)
-        plans = result.scalars().all()
+        # Сначала пробуем предрассчитанный подбор (один запрос по первичному ключу);
+        # сделанный до последней правки планов считается устаревшим
+        stored_plan = await PlanMatchRepository(self.session).get_workout_plan(
+            profile, plans_updated_at=plan_catalog.workout_updated_at
+        )
+        if stored_plan:
+            logger.info(f"Selected precomputed workout plan: {stored_plan.name}")
+            return stored_plan
+
+        # Подбор по инвертированным индексам каталога (без чтения всех планов из БД)
+        match = self._match_workout_plan_in_index(plan_catalog.workout_index, profile)
+
+        if not match:
+            logger.info("No suitable workout plan found")
+            return None
 
-        # Фильтрация и ранжирование планов
-        scored_plans = []
-        for plan in plans:
-            score = self._calculate_workout_plan_score(plan, profile)
-            if score > 0:  # Только планы с положительным совпадением
-                scored_plans.append((plan, score))
+        plan_id, score = match
+        best_plan = await self.session.get(WorkoutPlan, plan_id)
+        if not best_plan:
+            # План удалён после последней загрузки каталога
+            plan_catalog.invalidate()
+            logger.info(f"Workout plan {plan_id} disappeared, catalog invalidated")
+            return None
 
-        # Сортировка по убыванию совпадения
-        scored_plans.sort(key=lambda x: x[1], reverse=True)
+        logger.info(f"Selected workout plan: {best_plan.name} (score: {score})")
+        return best_plan
 
-        if scored_plans:
-            best_plan = scored_plans[0][0]
-            logger.info(f"Selected workout plan: {best_plan.name} (score: {scored_plans[0][1]})")
-            return best_plan
+    def _match_workout_plan_in_index(self, index: WorkoutPlanIndex, profile: UserProfile) -> Optional[tuple[Any, float]]:
+        """
+        Находит лучший план через пересечение множеств кандидатов.
+        Score плана зависит только от того, совпало ли каждое поле (цель, уровень,
+        телосложение), не совпало или не заполнено в плане, поэтому перебираем
+        эти 27 комбинаций от лучшей к худшей вместо перебора всех планов.
+        При равном score выбирается самый новый план, как и при сортировке по created_at:
+        кандидаты комбинации обходятся в порядке rank, и первый подходящий — самый новый.
+        """
+        if not index.all_ids:
+            return None
 
-        logger.info("No suitable workout plan found")
-        return None
+        criteria = [
+            ("target_goal", profile.goal, 0.4),
+            ("target_level", profile.preferred_difficulty, 0.3),
+            ("target_body_type", profile.body_type, 0.2),
+        ]
+
+        # Для каждого поля: список исходов (matched, weight, ids, ordered_ids, excluded);
+        # matched=None — поле не учитывается. Несовпавшие планы — заполненные минус совпавшие:
+        # вычитание не материализуется, совпавшие проверяются при обходе (excluded)
+        outcomes = []
+        for name, value, weight in criteria:
+            if not value:
+                outcomes.append([(None, weight, index.all_ids, index.all_ordered, None)])
+                continue
+            try:
+                hit = index.values[name].get(value, frozenset())
+                hit_ordered = index.values_ordered[name].get(value, ())
+            except TypeError:
+                hit, hit_ordered = frozenset(), ()
+            outcomes.append([
+                (True, weight, hit, hit_ordered, None),
+                (False, weight, index.filled[name], index.filled_ordered[name], hit or None),
+                (None, weight, index.wildcard[name], index.wildcard_ordered[name], None),
+            ])
+
+        experience_applies = bool(profile.preferred_difficulty) and profile.is_experienced_training is not None
+        expected_level = "intermediate" if profile.is_experienced_training else "beginner"
+        experience_matched = experience_applies and profile.preferred_difficulty == expected_level
+
+        scored_combos = []
+        for combo in product(*outcomes):
+            score = 0.0
+            total_weight = 0.0
+            for matched, weight, *_ in combo:
+                if matched is True:
+                    score += weight
+                if matched is not None:
+                    total_weight += weight
+            if experience_applies:
+                if experience_matched:
+                    score += 0.1
+                total_weight += 0.1
+            if total_weight > 0:
+                score = score / total_weight
+            if score > 0:
+                scored_combos.append((score, combo))
+
+        scored_combos.sort(key=lambda x: x[0], reverse=True)
+
+        best_id = None
+        best_score = None
+        for score, combo in scored_combos:
+            if best_score is not None and score < best_score:
+                break
+
+            # Обходим самое маленькое множество в порядке rank, остальные проверяем по членству
+            smallest = min(range(len(combo)), key=lambda i: len(combo[i][2]))
+            driver = combo[smallest][3]
+            required = [combo[i][2] for i in range(len(combo)) if i != smallest]
+            excluded = [outcome[4] for outcome in combo if outcome[4]]
+            # Дальше комбинации с тем же score могут дать только более новый план
+            best_rank = index.rank[best_id] if best_id is not None else len(index.rank)
+
+            for plan_id in driver:
+                if index.rank[plan_id] >= best_rank:
+                    break
+                if all(plan_id in ids for ids in required) and not any(plan_id in ids for ids in excluded):
+                    best_id = plan_id
+                    best_score = score
+                    break
+
+        if best_id is None:
+            return None
+        return best_id, best_score
 
     def _calculate_workout_plan_score(self, plan: WorkoutPlan, profile: UserProfile) -> float:
         """
@@ -110,31 +205,32 @@ class MatchingService:
 
         logger.info(f"Matching meal plan for user with goal={goal}, estimated calories={calories_preference}")
 
-        # Запрос планов с учетом критериев
-        stmt = select(MealPlan).where(
-            MealPlan.is_active == True
-        ).order_by(MealPlan.created_at.desc())
+        # Кандидаты берутся из каталога: только поля для подбора, без повторного чтения из БД
+        await plan_catalog.ensure_fresh(self.session)
 
-        result = await self.session.execute(stmt)
-        plans = result.scalars().all()
+        stored_plan = await PlanMatchRepository(self.session).get_meal_plan(
+            profile, plans_updated_at=plan_catalog.meal_updated_at
+        )
+        if stored_plan:
+            logger.info(f"Selected precomputed meal plan: {stored_plan.name}")
+            return stored_plan
 
-        # Фильтрация и ранжирование планов
-        scored_plans = []
-        for plan in plans:
-            score = self._calculate_meal_plan_score(plan, profile, calories_preference)
-            if score > 0:
-                scored_plans.append((plan, score))
+        # Оцениваем все планы каталога за один векторизованный проход
+        match = plan_catalog.meal_scorer.best_for_profiles([profile], [calories_preference])[0]
 
-        # Сортировка по убыванию совпадения
-        scored_plans.sort(key=lambda x: x[1], reverse=True)
+        if not match:
+            logger.info("No suitable meal plan found")
+            return None
 
-        if scored_plans:
-            best_plan = scored_plans[0][0]
-            logger.info(f"Selected meal plan: {best_plan.name} (score: {scored_plans[0][1]})")
-            return best_plan
+        best_id, best_score = match
+        best_plan = await self.session.get(MealPlan, best_id)
+        if not best_plan:
+            plan_catalog.invalidate()
+            logger.info(f"Meal plan {best_id} disappeared, catalog invalidated")
+            return None
 
-        logger.info("No suitable meal plan found")
-        return None
+        logger.info(f"Selected meal plan: {best_plan.name} (score: {best_score})")
+        return best_plan
 
     def _estimate_calories_range(self, profile: UserProfile) -> tuple[int, int]:
         """
@@ -221,6 +317,26 @@ class MatchingService:
 
         return score
 
+    async def match_workout_plans_batch(self, profiles: List[UserProfile]) -> List[Optional[tuple[Any, float]]]:
+        """
+        Подбирает планы тренировок для пачки профилей за один векторизованный проход.
+        Возвращает (plan_id, score) для каждого профиля или None
+        """
+        await plan_catalog.ensure_fresh(self.session)
+        scorer = plan_catalog.workout_scorer
+        # Расчёт на больших пачках уводим из event loop
+        return await asyncio.to_thread(scorer.best_for_profiles, profiles)
+
+    async def match_meal_plans_batch(self, profiles: List[UserProfile]) -> List[Optional[tuple[Any, float]]]:
+        """
+        Подбирает планы питания для пачки профилей за один векторизованный проход.
+        Возвращает (plan_id, score) для каждого профиля или None
+        """
+        await plan_catalog.ensure_fresh(self.session)
+        scorer = plan_catalog.meal_scorer
+        calories_ranges = [self._estimate_calories_range(profile) for profile in profiles]
+        return await asyncio.to_thread(scorer.best_for_profiles, profiles, calories_ranges)
+
     async def get_all_active_workout_plans(self) -> List[WorkoutPlan]:
         """
         Получает все активные планы тренировок
@@ -229,6 +345,13 @@ class MatchingService:
         result = await self.session.execute(stmt)
         return result.scalars().all()
 
+    async def count_active_workout_plans(self) -> int:
+        """
+        Количество активных планов тренировок (из каталога, без чтения планов)
+        """
+        await plan_catalog.ensure_fresh(self.session)
+        return len(plan_catalog.workout_index.all_ids)
+
     async def get_all_active_meal_plans(self) -> List[MealPlan]:
         """
         Получает все активные планы питания
@@ -0,0 +1,197 @@
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм времени, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Счётчик с метками. Значения хранятся по кортежу значений меток
+    """
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self) -> Iterable[str]:
+        for label_values, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами. observe() только увеличивает счётчик корзины
+    и сумму — накопительные значения считаются при выгрузке
+    """
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [счётчики корзин (последняя — +Inf), сумма]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *label_values) -> int:
+        series = self._series.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> Iterable[str]:
+        bounds = (*self.buckets, float("inf"))
+        for label_values, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class CallbackMetric:
+    """
+    Метрика, значение которой читается при выгрузке (глубина очереди, размер пула и т.п.).
+    callback возвращает число или словарь {кортеж значений меток: число}
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Union[float, Dict[Tuple, float]]],
+        labels: Sequence[str] = (),
+        type: str = "gauge",
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labels = tuple(labels)
+        self.type = type
+
+    def samples(self) -> Iterable[str]:
+        value = self.callback()
+        values = value if isinstance(value, dict) else {(): value}
+        for label_values, item in values.items():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(item)}"
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса с выгрузкой в текстовом формате Prometheus.
+    Запись — обновление числа в словаре, её можно держать включённой на каждом апдейте
+    """
+
+    def __init__(self, prefix: str = "fitplanbot"):
+        self.prefix = prefix
+        self._metrics: Dict[str, Union[Counter, Histogram, CallbackMetric]] = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            # Повторная регистрация (например, второй вызов create_dispatcher) — отдаём ту же метрику
+            if type(existing) is not type(metric):
+                raise ValueError(f"Metric {metric.name} is already registered with another type")
+            if isinstance(metric, CallbackMetric):
+                existing.callback = metric.callback
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.prefix}_{name}", documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(f"{self.prefix}_{name}", documentation, labels, buckets))
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Union[float, Dict[Tuple, float]]],
+        labels: Sequence[str] = (),
+        type: str = "gauge",
+    ) -> CallbackMetric:
+        return self._register(CallbackMetric(f"{self.prefix}_{name}", documentation, callback, labels, type))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                logger.warning(f"Failed to collect metric {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+def register_db_metrics(registry: MetricsRegistry, engines: Dict[str, object]):
+    """
+    Метрики пулов соединений: engines — {имя: AsyncEngine}
+    """
+    def pool_values(method: str) -> Callable[[], Dict[Tuple, float]]:
+        return lambda: {(name,): getattr(engine.pool, method)() for name, engine in engines.items()}
+
+    registry.callback("db_pool_size", "Постоянных соединений в пуле", pool_values("size"), labels=("engine",))
+    registry.callback("db_pool_checked_out", "Соединений выдано из пула", pool_values("checkedout"), labels=("engine",))
+    registry.callback("db_pool_checked_in", "Свободных соединений в пуле", pool_values("checkedin"), labels=("engine",))
+    registry.callback("db_pool_overflow", "Соединений сверх размера пула (отрицательное — пул ещё не заполнен)", pool_values("overflow"), labels=("engine",))
+
+
+# Глобальный реестр метрик процесса
+metrics_registry = MetricsRegistry()
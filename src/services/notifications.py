@@ -0,0 +1,137 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Tuple
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from src.bot.send_scheduler import PRIORITY_BULK, send_priority
+from src.database.session import async_session_maker
+from src.database.repositories.notification_repo import NotificationRepository
+import logging
+
+logger = logging.getLogger(__name__)
+
+SENT = "sent"
+FAILED = "failed"
+RETRY = "retry"
+
+
+class NotificationDispatcher:
+    """
+    Рассылает наступившие уведомления.
+    Работает внутри процесса бота: отправка идёт через тот же планировщик (send_scheduler),
+    что и ответы пользователям, поэтому общий лимит Telegram не превышается.
+    Каждый поток диспетчера забирает пачку строк (отметка claimed_until, короткая транзакция),
+    отправляет её с низким приоритетом и одним UPDATE сохраняет итоги — строки не блокируются
+    на время отправки. Несколько потоков и несколько процессов не пересекаются.
+    Если процесс упадёт посреди пачки, через claim_timeout пачка уйдёт повторно
+    (доставка «хотя бы один раз»). Неудачная отправка повторяется через retry_delay,
+    пока с исходного срока scheduled_for не пройдёт max_delay.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        batch_size: int = 100,
+        workers: int = 2,
+        idle_interval: float = 5.0,
+        retry_delay: timedelta = timedelta(minutes=5),
+        max_delay: timedelta = timedelta(hours=6),
+        claim_timeout: timedelta = timedelta(minutes=10),
+    ):
+        self.bot = bot
+        self.batch_size = batch_size
+        self.workers = workers
+        self.idle_interval = idle_interval
+        self.retry_delay = retry_delay
+        # Напоминание, которое не удаётся отправить дольше этого срока (от scheduled_for), уже неактуально
+        self.max_delay = max_delay
+        # Сколько пачка считается забранной: должно хватать на отправку пачки с низким приоритетом
+        self.claim_timeout = claim_timeout
+        self.sent = 0
+        self.failed = 0
+
+    async def run(self):
+        """
+        Работает до отмены
+        """
+        logger.info(f"Notification dispatcher started: {self.workers} workers, batch={self.batch_size}")
+        await asyncio.gather(*(self._worker(index) for index in range(self.workers)))
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                processed = await self.dispatch_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification worker {index} error: {e}", exc_info=True)
+                processed = 0
+            # Пачка неполная — очередь разобрана, ждём новых уведомлений
+            if processed < self.batch_size:
+                await asyncio.sleep(self.idle_interval)
+
+    async def dispatch_batch(self) -> int:
+        """
+        Обрабатывает одну пачку уведомлений. Возвращает её размер
+        """
+        async with async_session_maker() as session:
+            repo = NotificationRepository(session)
+            now = datetime.now(timezone.utc)
+            # Пачка забирается и коммитится сразу — соединение не держится во время отправки
+            rows = await repo.claim_due(now, self.batch_size, claimed_until=now + self.claim_timeout)
+            if not rows:
+                return 0
+
+            with send_priority(PRIORITY_BULK):
+                results = await asyncio.gather(*(self._send(row, now) for row in rows))
+
+            ids = {SENT: [], FAILED: [], RETRY: []}
+            for notification_id, outcome in results:
+                ids[outcome].append(notification_id)
+
+            finished_at = datetime.now(timezone.utc)
+            await repo.save_results(
+                sent_ids=ids[SENT],
+                failed_ids=ids[FAILED],
+                retry_ids=ids[RETRY],
+                sent_at=finished_at,
+                retry_at=finished_at + self.retry_delay,
+            )
+
+        self.sent += len(ids[SENT])
+        self.failed += len(ids[FAILED])
+        logger.info(
+            f"Notifications batch: sent={len(ids[SENT])}, failed={len(ids[FAILED])}, "
+            f"retry={len(ids[RETRY])} (total sent={self.sent})"
+        )
+        return len(rows)
+
+    async def _send(self, row, now: datetime) -> Tuple:
+        text = f"<b>{row.title}</b>\n\n{row.message}" if row.title else row.message
+        try:
+            await self.bot.send_message(row.telegram_id, text, parse_mode="HTML")
+            return row.id, SENT
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Пользователь заблокировал бота или чат недоступен — повтор не поможет
+            logger.warning(f"Notification {row.id} to {row.telegram_id} failed: {e}")
+            return row.id, FAILED
+        except Exception as e:
+            if now - row.scheduled_for > self.max_delay:
+                logger.warning(f"Notification {row.id} expired after error: {e}")
+                return row.id, FAILED
+            logger.warning(f"Notification {row.id} will be retried: {e}")
+            return row.id, RETRY
+
+
+def create_notification_dispatcher(bot: Bot) -> NotificationDispatcher:
+    """
+    Диспетчер с настройками из окружения
+    """
+    return NotificationDispatcher(
+        bot,
+        batch_size=int(os.getenv("NOTIFICATIONS_BATCH_SIZE", "100")),
+        workers=int(os.getenv("NOTIFICATIONS_WORKERS", "2")),
+        idle_interval=float(os.getenv("NOTIFICATIONS_IDLE_SECONDS", "5")),
+        claim_timeout=timedelta(seconds=float(os.getenv("NOTIFICATIONS_CLAIM_SECONDS", "600"))),
+    )
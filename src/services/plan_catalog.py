@@ -0,0 +1,222 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, FrozenSet, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from src.database.listener import NotificationListener
+from src.database.models import WorkoutPlan, MealPlan
+from src.services.batch_scoring import WorkoutPlanScorer, MealPlanScorer
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Канал Postgres NOTIFY, через который админка сообщает боту об изменении планов
+PLAN_CHANGES_CHANNEL = "plan_changes"
+
+
+@dataclass
+class WorkoutPlanIndex:
+    """
+    Инвертированные индексы активных планов тренировок.
+    Для каждого поля (цель, уровень, телосложение) хранит:
+    - values: значение -> множество id планов, в массиве которых оно есть
+    - wildcard: id планов, у которых поле пустое (не участвует в оценке)
+    - filled: id планов, у которых поле заполнено
+    Планы из filled, которые не попали в values для значения профиля,
+    считаются несовпадающими по этому полю.
+    Для каждого множества хранится и кортеж тех же id в порядке rank,
+    чтобы самый новый план пересечения находился без сортировки.
+    """
+    all_ids: FrozenSet[Any] = frozenset()
+    # Позиция плана в выдаче ORDER BY created_at DESC (0 — самый новый)
+    rank: Dict[Any, int] = field(default_factory=dict)
+    values: Dict[str, Dict[Any, FrozenSet[Any]]] = field(default_factory=dict)
+    wildcard: Dict[str, FrozenSet[Any]] = field(default_factory=dict)
+    filled: Dict[str, FrozenSet[Any]] = field(default_factory=dict)
+    # Те же множества, упорядоченные по rank
+    all_ordered: Tuple[Any, ...] = ()
+    values_ordered: Dict[str, Dict[Any, Tuple[Any, ...]]] = field(default_factory=dict)
+    wildcard_ordered: Dict[str, Tuple[Any, ...]] = field(default_factory=dict)
+    filled_ordered: Dict[str, Tuple[Any, ...]] = field(default_factory=dict)
+
+
+class PlanCatalog:
+    """
+    Общий для процесса каталог активных планов.
+    Загружает только поля, нужные для подбора (без schedule/video_links),
+    и перезагружается только когда планы изменились в БД: сразу по NOTIFY
+    из админки (watch_plan_changes) или при периодической сверке.
+    """
+
+    INDEXED_FIELDS = ("target_goal", "target_level", "target_body_type")
+
+    def __init__(self, refresh_interval: float = 300.0):
+        # Как часто (в секундах) сверяться с БД, не изменились ли планы —
+        # страховка на случай, если уведомление из админки потерялось
+        self.refresh_interval = refresh_interval
+        self.workout_index = WorkoutPlanIndex()
+        self.meal_plans: List[Any] = []
+        # Векторизованные оценщики для пакетного подбора
+        self.workout_scorer = WorkoutPlanScorer([])
+        self.meal_scorer = MealPlanScorer([])
+        self._signature: Optional[tuple] = None
+        self._checked_at = 0.0
+        # Растёт при каждой инвалидации: сброс во время перезагрузки не должен потеряться
+        self._generation = 0
+        # После инвалидации каталог читается с primary — реплика могла ещё не получить правку
+        self._read_primary = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def workout_updated_at(self) -> Optional[datetime]:
+        """Время последнего изменения планов тренировок по загруженной версии каталога"""
+        return self._signature[1] if self._signature else None
+
+    @property
+    def meal_updated_at(self) -> Optional[datetime]:
+        """Время последнего изменения планов питания по загруженной версии каталога"""
+        return self._signature[3] if self._signature else None
+
+    def invalidate(self):
+        """Помечает каталог устаревшим — при следующем обращении он будет перезагружен"""
+        self._signature = None
+        self._checked_at = 0.0
+        self._generation += 1
+        self._read_primary = True
+
+    async def ensure_fresh(self, session: AsyncSession):
+        """
+        Перезагружает каталог, если планы изменились с момента последней загрузки.
+        Проверка изменений выполняется не чаще, чем раз в refresh_interval секунд.
+        """
+        if self._signature is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+
+        async with self._lock:
+            # Пока ждали блокировку, каталог мог обновить другой запрос
+            if self._signature is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+
+            generation = self._generation
+            read_primary = self._read_primary
+            signature = await self._load_signature(session, read_primary)
+            if signature != self._signature:
+                await self._reload(session, read_primary)
+            if generation != self._generation:
+                # Каталог сбросили, пока он загружался — загруженное могло устареть
+                return
+            self._signature = signature
+            self._read_primary = False
+            self._checked_at = time.monotonic()
+
+    async def _load_signature(self, session: AsyncSession, read_primary: bool = False) -> tuple:
+        """
+        Дешёвая «версия» каталога: число активных планов и время последнего изменения
+        """
+        workout_stmt = select(
+            func.count(WorkoutPlan.id).filter(WorkoutPlan.is_active == True),
+            func.max(WorkoutPlan.updated_at),
+        )
+        meal_stmt = select(
+            func.count(MealPlan.id).filter(MealPlan.is_active == True),
+            func.max(MealPlan.updated_at),
+        )
+        workout_row = (await session.execute(workout_stmt.execution_options(primary=read_primary))).one()
+        meal_row = (await session.execute(meal_stmt.execution_options(primary=read_primary))).one()
+        return tuple(workout_row) + tuple(meal_row)
+
+    async def _reload(self, session: AsyncSession, read_primary: bool = False):
+        """
+        Загружает активные планы и перестраивает индексы
+        """
+        workout_stmt = select(
+            WorkoutPlan.id,
+            WorkoutPlan.name,
+            WorkoutPlan.target_goal,
+            WorkoutPlan.target_level,
+            WorkoutPlan.target_body_type,
+        ).where(
+            WorkoutPlan.is_active == True
+        ).order_by(WorkoutPlan.created_at.desc())
+        workout_rows = (await session.execute(workout_stmt.execution_options(primary=read_primary))).all()
+
+        meal_stmt = select(
+            MealPlan.id,
+            MealPlan.name,
+            MealPlan.target_goal,
+            MealPlan.calories_range,
+        ).where(
+            MealPlan.is_active == True
+        ).order_by(MealPlan.created_at.desc())
+        meal_rows = (await session.execute(meal_stmt.execution_options(primary=read_primary))).all()
+
+        self.workout_index = self._build_workout_index(workout_rows)
+        self.workout_scorer = WorkoutPlanScorer(workout_rows)
+        self.meal_plans = list(meal_rows)
+        self.meal_scorer = MealPlanScorer(meal_rows)
+        logger.info(f"Plan catalog reloaded: {len(workout_rows)} workout plans, {len(meal_rows)} meal plans")
+
+    def _build_workout_index(self, rows: List[Any]) -> WorkoutPlanIndex:
+        index = WorkoutPlanIndex()
+        # Строки идут в порядке rank, поэтому списки id сразу упорядочены
+        values: Dict[str, Dict[Any, list]] = {name: {} for name in self.INDEXED_FIELDS}
+        wildcard: Dict[str, list] = {name: [] for name in self.INDEXED_FIELDS}
+        filled: Dict[str, list] = {name: [] for name in self.INDEXED_FIELDS}
+
+        for position, row in enumerate(rows):
+            index.rank[row.id] = position
+            for name in self.INDEXED_FIELDS:
+                targets = getattr(row, name)
+                if not targets:
+                    wildcard[name].append(row.id)
+                    continue
+                filled[name].append(row.id)
+                if isinstance(targets, list):
+                    for value in targets:
+                        try:
+                            ids = values[name].setdefault(value, [])
+                        except TypeError:
+                            # Нехэшируемые элементы (dict/list) никогда не совпадут с профилем
+                            continue
+                        # Повторы значения в массиве плана
+                        if not ids or ids[-1] != row.id:
+                            ids.append(row.id)
+
+        index.all_ordered = tuple(index.rank)
+        index.all_ids = frozenset(index.all_ordered)
+        index.values_ordered = {
+            name: {value: tuple(ids) for value, ids in by_value.items()}
+            for name, by_value in values.items()
+        }
+        index.values = {
+            name: {value: frozenset(ids) for value, ids in by_value.items()}
+            for name, by_value in index.values_ordered.items()
+        }
+        index.wildcard_ordered = {name: tuple(ids) for name, ids in wildcard.items()}
+        index.wildcard = {name: frozenset(ids) for name, ids in wildcard.items()}
+        index.filled_ordered = {name: tuple(ids) for name, ids in filled.items()}
+        index.filled = {name: frozenset(ids) for name, ids in filled.items()}
+        return index
+
+
+async def notify_plans_changed(session: AsyncSession):
+    """
+    Сообщает процессам бота (через NOTIFY), что планы изменились.
+    Уведомление уходит при коммите транзакции; NOTIFY выполняется только на primary
+    """
+    await session.execute(select(func.pg_notify(PLAN_CHANGES_CHANNEL, "")).execution_options(primary=True))
+
+
+def watch_plan_changes(listener: NotificationListener, channel: str, catalog: "PlanCatalog"):
+    """
+    Подписывает каталог на уведомления об изменении планов: каталог помечается устаревшим
+    и перезагружается при следующем подборе, не дожидаясь периодической сверки.
+    """
+    listener.subscribe(channel, lambda payload: catalog.invalidate(), on_connect=catalog.invalidate)
+
+
+# Глобальный экземпляр каталога
+plan_catalog = PlanCatalog(refresh_interval=float(os.getenv("PLAN_CATALOG_REFRESH_SECONDS", "300")))
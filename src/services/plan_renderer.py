@@ -0,0 +1,272 @@
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+import logging
+import os
+import re
+
+from src.database.models import MealPlan, WorkoutPlan
+
+logger = logging.getLogger(__name__)
+
+# Лимит длины текста одного сообщения Telegram
+MESSAGE_LIMIT = 4096
+
+# Неделимые части HTML-текста: тег, HTML-сущность или один символ
+_HTML_UNIT = re.compile(r"<[^>]*>|&#?\w+;|.", re.DOTALL)
+_TAG_NAME = re.compile(r"<\s*(/?)\s*([a-zA-Z][\w-]*)")
+
+
+def format_workout_schedule(schedule: dict) -> str:
+    """
+    Форматирует расписание тренировок в читаемый вид
+    """
+    if not schedule:
+        return "Расписание не указано"
+
+    formatted_days = []
+    for day_key, day_data in schedule.items():
+        day_name = {
+            "day1": "🏋️ Понедельник",
+            "day2": "💪 Вторник",
+            "day3": "🦵 Среда",
+            "day4": "🏃 Четверг",
+            "day5": "🤸 Пятница",
+            "day6": "🏊 Суббота",
+            "day7": "🚶 Воскресенье"
+        }.get(day_key, day_key)
+
+        if isinstance(day_data, dict):
+            exercises = day_data.get("exercises", [])
+            if exercises:
+                exercise_list = "\n".join(f"• {ex}" for ex in exercises[:5])  # Ограничим 5 упражнениями
+                if len(exercises) > 5:
+                    exercise_list += f"\n• ... и ещё {len(exercises) - 5} упражнений"
+                formatted_days.append(f"{day_name}:\n{exercise_list}")
+            else:
+                formatted_days.append(f"{day_name}: Отдых")
+        else:
+            formatted_days.append(f"{day_name}: {day_data}")
+
+    return "\n\n".join(formatted_days)
+
+
+def format_video_links(video_links: dict) -> str:
+    """
+    Форматирует ссылки на видео
+    """
+    if not video_links:
+        return ""
+
+    links = []
+    for key, url in video_links.items():
+        if isinstance(url, str) and url.startswith("http"):
+            links.append(f"• {key}: {url}")
+
+    if links:
+        return "\n\n🎥 Видео-уроки:\n" + "\n".join(links)
+
+    return ""
+
+
+def render_workout_plan(plan: WorkoutPlan) -> str:
+    """
+    Текст сообщения с планом тренировок (HTML)
+    """
+    response = f"🏋️ <b>{plan.name}</b>\n\n"
+
+    if plan.description:
+        response += f"{plan.description}\n\n"
+
+    response += "📅 <b>Расписание тренировок:</b>\n\n"
+
+    if plan.schedule:
+        schedule_text = format_workout_schedule(plan.schedule)
+        response += schedule_text
+    else:
+        response += "Расписание не указано"
+
+    # Добавляем видео-ссылки
+    if plan.video_links:
+        video_text = format_video_links(plan.video_links)
+        response += video_text
+
+    # Добавляем информацию о цели и уровне
+    response += "\n\n🎯 <b>Рекомендации:</b>\n"
+    if plan.target_goal:
+        goals = plan.target_goal if isinstance(plan.target_goal, list) else []
+        if goals:
+            response += f"• Подходит для целей: {', '.join(goals)}\n"
+
+    if plan.target_level:
+        levels = plan.target_level if isinstance(plan.target_level, list) else []
+        if levels:
+            response += f"• Уровень сложности: {', '.join(levels)}\n"
+
+    response += "\n💪 <b>Удачи в тренировках!</b>\n"
+    response += "<i>Следите за прогрессом и корректируйте нагрузку по самочувствию.</i>"
+
+    return response
+
+
+def render_meal_plan(plan: MealPlan) -> str:
+    """
+    Текст сообщения с планом питания (HTML)
+    """
+    response = f"🍎 <b>{plan.name}</b>\n\n"
+
+    if plan.description:
+        response += f"{plan.description}\n\n"
+
+    if plan.calories_range:
+        calories = plan.calories_range
+        if isinstance(calories, list) and len(calories) >= 2:
+            response += f"🔥 <b>Калории:</b> {calories[0]}-{calories[1]} ккал/день\n\n"
+
+    response += "🍽️ <b>Рекомендации по питанию:</b>\n"
+    if plan.target_goal:
+        goals = plan.target_goal if isinstance(plan.target_goal, list) else []
+        if goals:
+            response += f"• Подходит для целей: {', '.join(goals)}\n"
+
+    response += "\n🥗 <b>Советы:</b>\n"
+    response += "• Пейте достаточное количество воды\n"
+    response += "• Ешьте регулярно, не пропускайте приемы пищи\n"
+    response += "• Следите за балансом белков, жиров и углеводов\n"
+    response += "• Включайте овощи и фрукты в каждый прием пищи\n\n"
+
+    response += "<i>План питания адаптирован под ваши индивидуальные параметры.</i>"
+
+    return response
+
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """
+    Делит HTML-текст на части не длиннее limit: по абзацам, затем по строкам,
+    затем по пробелам. Текст режется только между тегами и HTML-сущностями;
+    если на месте разреза открыт тег, часть его закрывает, а следующая — открывает заново.
+    """
+    units = _HTML_UNIT.findall(text)
+    chunks: List[str] = []
+    # Открытые теги на начале текущей части: (имя, открывающий тег целиком)
+    open_tags: List[Tuple[str, str]] = []
+    start = 0
+    while start < len(units):
+        prefix = "".join(tag for _, tag in open_tags)
+        stack = list(open_tags)
+        length = len(prefix)
+        closing_length = sum(len(name) + 3 for name, _ in stack)
+        # Лучший разрез: (приоритет, позиция, открытые теги на ней)
+        best: Optional[Tuple[int, int, List[Tuple[str, str]]]] = None
+
+        position = start
+        while position < len(units):
+            unit = units[position]
+            if position > start and length + closing_length <= limit:
+                priority = _cut_priority(units, position)
+                if best is None or priority >= best[0]:
+                    best = (priority, position, list(stack))
+            if length + len(unit) > limit and position > start:
+                break
+            length += len(unit)
+            tag = _TAG_NAME.match(unit) if unit.startswith("<") else None
+            if tag and tag.group(1):
+                # Закрывающий тег снимает последний открытый с тем же именем
+                for index in range(len(stack) - 1, -1, -1):
+                    if stack[index][0] == tag.group(2):
+                        del stack[index]
+                        break
+            elif tag:
+                stack.append((tag.group(2), unit))
+            closing_length = sum(len(name) + 3 for name, _ in stack)
+            position += 1
+        else:
+            # Остаток целиком помещается в одну часть
+            best = (0, len(units), stack)
+
+        if best is None:
+            # Даже один тег с закрывающими не помещается — режем там, где остановились
+            best = (0, position, stack)
+        _, cut, cut_tags = best
+        body = "".join(units[start:cut]).rstrip()
+        closing = "".join(f"</{name}>" for name, _ in reversed(cut_tags)) if cut < len(units) else ""
+        chunk = prefix + body + closing
+        if body.strip():
+            chunks.append(chunk)
+        open_tags = cut_tags
+        start = cut
+        # Переносы строк и пробел на месте разреза не нужны в начале следующей части
+        while start < len(units) and units[start] in ("\n", " "):
+            start += 1
+    return chunks
+
+
+def _cut_priority(units: List[str], position: int) -> int:
+    """
+    Насколько удачен разрез перед units[position]: 3 — граница абзаца, 2 — строки,
+    1 — слова, 0 — середина слова
+    """
+    newlines = 0
+    index = position - 1
+    while index >= 0 and units[index] == "\n":
+        newlines += 1
+        index -= 1
+    index = position
+    while index < len(units) and units[index] == "\n":
+        newlines += 1
+        index += 1
+    if newlines:
+        return 3 if newlines >= 2 else 2
+    return 1 if units[position - 1] == " " or units[position] == " " else 0
+
+
+class PlanRenderCache:
+    """
+    Кэш готовых сообщений с планами: HTML, уже разбитый на части по лимиту Telegram.
+    Версия плана — его updated_at: после правки в админке план рендерится заново
+    при первом же запросе, остальные запросы берут текст из кэша.
+    """
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        # (тип, id плана) -> (версия, части сообщения)
+        self._entries: OrderedDict[Tuple[str, str], Tuple[Any, List[str]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_workout_plan(self, plan: WorkoutPlan) -> List[str]:
+        return self._get("workout", plan, render_workout_plan)
+
+    def get_meal_plan(self, plan: MealPlan) -> List[str]:
+        return self._get("meal", plan, render_meal_plan)
+
+    def _get(self, kind: str, plan: Any, render: Callable[[Any], str]) -> List[str]:
+        key = (kind, str(plan.id))
+        version = plan.updated_at or plan.created_at
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        chunks = split_message(render(plan))
+        self._entries[key] = (version, chunks)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        logger.info(f"Rendered {kind} plan {plan.id} (version {version}, {len(chunks)} messages)")
+        return chunks
+
+    def invalidate(self, plan_id: Optional[Any] = None):
+        """
+        Сбрасывает кэш плана (или весь кэш)
+        """
+        if plan_id is None:
+            self._entries.clear()
+            return
+        for kind in ("workout", "meal"):
+            self._entries.pop((kind, str(plan_id)), None)
+
+
+# Глобальный экземпляр кэша
+plan_render_cache = PlanRenderCache(max_size=int(os.getenv("PLAN_RENDER_CACHE_SIZE", "1000")))
@@ -0,0 +1,261 @@
+import asyncio
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+from src.database.listener import NotificationListener
+from src.services.loop_monitor import loop_monitor
+
+logger = logging.getLogger(__name__)
+
+# Канал NOTIFY, через который админка включает профилирование процессов бота
+PROFILE_CHANNEL = "bot_profile"
+
+
+class SamplingProfiler:
+    """
+    Семплирующий профилировщик потока event loop, включается без перезапуска бота.
+
+    Фоновый поток раз в interval секунд снимает стек потока loop (sys._current_frames)
+    и копит стеки в формате collapsed stacks (flamegraph.pl, speedscope, inferno).
+    Корень каждого стека — хэндлер, который выполнялся (см. LoopMonitor.attribute).
+
+    Два режима:
+    - окно: все семплы процесса за N секунд (start_window — из админки или по SIGUSR1);
+    - выборка апдейтов: доля sample_rate хэндлеров (track()), семплы пишутся, только пока
+      loop выполняет выбранный хэндлер; файл сбрасывается раз в flush_interval секунд.
+    Пока ни один режим не активен, поток спит и на процесс не влияет.
+    """
+
+    def __init__(
+        self,
+        output_dir: str = "profiles",
+        interval: float = 0.005,
+        sample_rate: float = 0.0,
+        flush_interval: float = 300.0,
+        default_seconds: float = 30.0,
+        max_depth: int = 64,
+    ):
+        self.output_dir = Path(output_dir)
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.default_seconds = default_seconds
+        self.max_depth = max_depth
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._active = threading.Event()
+        self._stop = threading.Event()
+
+        self._window_until = 0.0
+        self._window_stacks: Counter = Counter()
+        # Задача -> хэндлер для апдейтов, попавших в выборку
+        self._tracked: Dict[asyncio.Task, str] = {}
+        self._tracked_stacks: Counter = Counter()
+        self._frame_names: Dict[object, str] = {}
+
+        # Метрики
+        self.samples = 0
+        self.windows = 0
+        self.tracked = 0
+
+    def start(self):
+        """
+        Запускает поток семплирования и обработчик SIGUSR1 (окно на default_seconds)
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        if hasattr(signal, "SIGUSR1"):
+            try:
+                self._loop.add_signal_handler(signal.SIGUSR1, self.start_window)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+    async def stop(self):
+        self._stop.set()
+        self._active.set()
+        if self._thread:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+        if self._loop and hasattr(signal, "SIGUSR1"):
+            try:
+                self._loop.remove_signal_handler(signal.SIGUSR1)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+    def start_window(self, seconds: Optional[float] = None) -> bool:
+        """
+        Профилирует весь процесс seconds секунд. False — окно уже идёт или поток не запущен
+        """
+        if self._thread is None or self.window_active:
+            return False
+        seconds = seconds or self.default_seconds
+        self._window_until = time.monotonic() + seconds
+        self.windows += 1
+        self._active.set()
+        logger.info("Profiling process %s for %gs", os.getpid(), seconds)
+        return True
+
+    @property
+    def window_active(self) -> bool:
+        return time.monotonic() < self._window_until
+
+    @contextmanager
+    def track(self, label: str):
+        """
+        С вероятностью sample_rate профилирует выполнение блока (хэндлера label)
+        """
+        if self._thread is None or not self.sample_rate or random.random() >= self.sample_rate:
+            yield
+            return
+        task = asyncio.current_task()
+        self._tracked[task] = label
+        self.tracked += 1
+        self._active.set()
+        try:
+            yield
+        finally:
+            self._tracked.pop(task, None)
+
+    def _sample_loop(self):
+        last_flush = time.monotonic()
+        while not self._stop.is_set():
+            window = self.window_active
+            if not window and not self._tracked:
+                # Закрываем окно, если оно только что кончилось, и ждём следующего включения
+                if self._window_stacks:
+                    self._write("profile", self._window_stacks)
+                    self._window_stacks = Counter()
+                self._active.clear()
+                if not self._tracked and not self.window_active:
+                    self._active.wait(self.flush_interval)
+            else:
+                self._sample(window)
+                time.sleep(self.interval)
+
+            if time.monotonic() - last_flush >= self.flush_interval:
+                last_flush = time.monotonic()
+                if self._tracked_stacks:
+                    self._write("handlers", self._tracked_stacks)
+                    self._tracked_stacks = Counter()
+
+        if self._window_stacks:
+            self._write("profile", self._window_stacks)
+        if self._tracked_stacks:
+            self._write("handlers", self._tracked_stacks)
+
+    def _sample(self, window: bool):
+        try:
+            task = asyncio.current_task(self._loop)
+        except Exception:
+            task = None
+        tracked_label = self._tracked.get(task) if task is not None else None
+        if not window and tracked_label is None:
+            return
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+
+        frames = self._collapse(frame)
+        if task is not None:
+            stack = ";".join([tracked_label or loop_monitor.task_label(task), *frames])
+        elif frames and frames[-1].startswith("select "):
+            # loop ждёт событий в selector — свободное время
+            stack = "idle"
+        else:
+            stack = ";".join(["callback", *frames])
+
+        self.samples += 1
+        if window:
+            self._window_stacks[stack] += 1
+        if tracked_label is not None:
+            self._tracked_stacks[stack] += 1
+
+    def _collapse(self, frame) -> List[str]:
+        """
+        Стек от корня к вершине без кадров самого event loop (до Handle._run)
+        """
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            if code.co_name == "_run" and code.co_filename.endswith(os.path.join("asyncio", "events.py")):
+                break
+            names.append(self._frame_name(code))
+            frame = frame.f_back
+        names.reverse()
+        return names
+
+    def _frame_name(self, code) -> str:
+        name = self._frame_names.get(code)
+        if name is None:
+            filename = code.co_filename
+            for prefix in sys.path:
+                if prefix and filename.startswith(prefix):
+                    filename = os.path.relpath(filename, prefix)
+                    break
+            # ';' — разделитель кадров в формате collapsed stacks
+            name = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+            self._frame_names[code] = name
+        return name
+
+    def _write(self, kind: str, stacks: Counter) -> Optional[Path]:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"{kind}-{os.getpid()}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded"
+        try:
+            with open(path, "w") as file:
+                for stack, count in stacks.most_common():
+                    file.write(f"{stack} {count}\n")
+        except OSError as e:
+            logger.error("Failed to write profile %s: %s", path, e)
+            return None
+        logger.info("Profile written: %s (%s samples)", path, sum(stacks.values()))
+        return path
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "samples": self.samples,
+            "windows": self.windows,
+            "tracked": self.tracked,
+        }
+
+
+def watch_profile_requests(listener: NotificationListener, channel: str, profiler: SamplingProfiler):
+    """
+    Подписывает профилировщик на NOTIFY от админки: payload — длительность окна в секундах
+    (пусто — по умолчанию)
+    """
+    def on_notification(payload: str):
+        try:
+            seconds = float(payload) if payload else None
+        except ValueError:
+            logger.warning("Invalid profile request: %r", payload)
+            return
+        profiler.start_window(seconds)
+
+    listener.subscribe(channel, on_notification)
+
+
+# Глобальный профилировщик процесса бота
+profiler = SamplingProfiler(
+    output_dir=os.getenv("PROFILE_DIR", "profiles"),
+    interval=float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005")),
+    sample_rate=float(os.getenv("PROFILE_HANDLER_SAMPLE_RATE", "0")),
+    flush_interval=float(os.getenv("PROFILE_FLUSH_SECONDS", "300")),
+    default_seconds=float(os.getenv("PROFILE_DEFAULT_SECONDS", "30")),
+)
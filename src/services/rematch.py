@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from src.database.session import async_session_maker
+from src.database.models import UserProfile, WorkoutPlan, MealPlan
+from src.database.repositories.plan_match_repo import PlanMatchRepository
+from src.services.matching import MatchingService
+from src.services.plan_catalog import plan_catalog
+import logging
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "user_plan_matches"
+
+
+async def _plans_changed_since(session: AsyncSession, watermark: datetime) -> bool:
+    """
+    Проверяет, менялись ли планы тренировок или питания после отметки
+    """
+    workout_stmt = select(func.max(WorkoutPlan.updated_at))
+    meal_stmt = select(func.max(MealPlan.updated_at))
+    for stmt in (workout_stmt, meal_stmt):
+        last_update = (await session.execute(stmt)).scalar()
+        if last_update and last_update > watermark:
+            return True
+    return False
+
+
+async def rematch_profiles(full: bool = False, chunk_size: int = 500) -> int:
+    """
+    Пакетно подбирает планы для заполненных профилей и сохраняет результат в user_plan_matches.
+    Инкрементальный режим: пересчитываются только профили, изменённые с прошлого запуска;
+    если с тех пор менялись сами планы — пересчитываются все профили.
+    Возвращает количество обработанных профилей.
+    """
+    # Время начала запуска становится новой отметкой и временем подбора:
+    # профили, изменённые во время работы задачи, будут считаться устаревшими
+    started_at = datetime.now(timezone.utc)
+
+    async with async_session_maker() as session:
+        repo = PlanMatchRepository(session)
+        matching_service = MatchingService(session)
+
+        watermark: Optional[datetime] = None if full else await repo.get_watermark(WATERMARK_NAME)
+        if watermark and await _plans_changed_since(session, watermark):
+            logger.info("Plans changed since last run, re-matching all profiles")
+            watermark = None
+
+        # Задача должна видеть актуальный набор планов
+        plan_catalog.invalidate()
+
+        processed = 0
+        last_id = None
+        while True:
+            # Профили читаем порциями по первичному ключу, чтобы не держать всю таблицу в памяти
+            stmt = select(UserProfile).where(UserProfile.profile_completed == True)
+            if watermark:
+                stmt = stmt.where(UserProfile.updated_at > watermark)
+            if last_id:
+                stmt = stmt.where(UserProfile.id > last_id)
+            stmt = stmt.order_by(UserProfile.id).limit(chunk_size)
+
+            result = await session.execute(stmt)
+            profiles = result.scalars().all()
+            if not profiles:
+                break
+
+            workout_matches = await matching_service.match_workout_plans_batch(profiles)
+            meal_matches = await matching_service.match_meal_plans_batch(profiles)
+
+            # Ключ — user_id: у пользователя может оказаться несколько профилей
+            rows = {}
+            for profile, workout_match, meal_match in zip(profiles, workout_matches, meal_matches):
+                rows[profile.user_id] = {
+                    "user_id": profile.user_id,
+                    "workout_plan_id": workout_match[0] if workout_match else None,
+                    "workout_score": workout_match[1] if workout_match else None,
+                    "meal_plan_id": meal_match[0] if meal_match else None,
+                    "meal_score": meal_match[1] if meal_match else None,
+                    "matched_at": started_at,
+                }
+            await repo.upsert_many(list(rows.values()))
+
+            processed += len(profiles)
+            last_id = profiles[-1].id
+            # Освобождаем identity map от уже обработанных профилей
+            session.expunge_all()
+            logger.info(f"Re-matched {processed} profiles")
+
+        await repo.set_watermark(WATERMARK_NAME, started_at)
+
+    logger.info(f"Plan re-matching finished: {processed} profiles ({'full' if watermark is None else 'incremental'})")
+    return processed
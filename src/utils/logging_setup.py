@@ -0,0 +1,136 @@
+"""
+Настройка логирования процесса.
+
+Записи не пишутся в stdout из event loop: QueueHandler кладёт их в очередь, а форматирование
+(в том числе JSON) и вывод выполняет фоновый поток QueueListener. Частые записи апдейтов
+можно прореживать по типу события (LOG_SAMPLE_RATES), предупреждения и ошибки не прореживаются.
+
+Отладочные сообщения в горячих хэндлерах обёрнуты в `if __debug__:` — при запуске
+с `python -O` (или PYTHONOPTIMIZE=1) компилятор выбрасывает эти блоки целиком.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Атрибуты, которые есть у любой записи; остальное пришло через extra и попадает в JSON
+_RECORD_FIELDS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Одна запись — одна строка JSON. Поля из extra выводятся как есть
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает долю записей с атрибутом event_type (extra={"event_type": ...}).
+    rates — {тип события: доля от 0 до 1}; WARNING и выше проходят всегда
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, "event_type", None))
+        return rate is None or random.random() < rate
+
+
+class _LazyQueueHandler(QueueHandler):
+    """
+    Стандартный QueueHandler форматирует запись в вызывающем потоке.
+    Здесь в event loop только подставляются аргументы сообщения (чтобы не держать ссылки
+    на изменяемые объекты), а форматирование и трейсбек — в потоке записи
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _stop_listener():
+    """Дописывает оставшиеся в очереди записи и останавливает поток записи"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """'message=0.1,callback_query=0.5' -> {'message': 0.1, 'callback_query': 0.5}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        event_type, _, rate = item.partition("=")
+        rates[event_type.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    use_queue: Optional[bool] = None,
+    sample_rates: Optional[str] = None,
+):
+    """
+    Настраивает корневой логгер. Параметры по умолчанию берутся из окружения:
+    LOG_LEVEL, LOG_FORMAT (text/json), LOG_ASYNC, LOG_SAMPLE_RATES
+    """
+    global _listener
+
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    fmt = fmt or os.getenv("LOG_FORMAT", "text")
+    if use_queue is None:
+        use_queue = os.getenv("LOG_ASYNC", "True").lower() in ("1", "true", "yes")
+    rates = parse_sample_rates(sample_rates if sample_rates is not None else os.getenv("LOG_SAMPLE_RATES", ""))
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    _stop_listener()
+
+    if use_queue:
+        handler = _LazyQueueHandler(queue.SimpleQueue())
+        _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+    else:
+        handler = output
+
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+    root.addHandler(handler)
+    root.setLevel(level.upper())
@@ -0,0 +1,193 @@
+"""
+Векторизованный подбор (batch_scoring) должен выбирать те же планы с теми же score,
+что и прежний поштучный цикл MatchingService
+"""
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.services import batch_scoring
+from src.services.batch_scoring import MealPlanScorer, WorkoutPlanScorer
+from src.services.matching import MatchingService
+
+GOALS = ["lose_weight", "gain_muscle", "maintain"]
+LEVELS = ["beginner", "intermediate", "advanced"]
+BODY_TYPES = ["ectomorph", "mesomorph", "endomorph", "unknown"]
+
+
+@pytest.fixture
+def matching():
+    # Формулы score не обращаются к БД
+    return MatchingService(session=None)
+
+
+def random_targets(rng: random.Random, values):
+    """Целевые значения плана во всех встречающихся видах: список, пусто, строка, мусор"""
+    kind = rng.random()
+    if kind < 0.15:
+        return None
+    if kind < 0.2:
+        return []
+    if kind < 0.25:
+        return values[0]  # не список — поле заполнено, но не совпадает
+    if kind < 0.3:
+        return [{"value": values[0]}]  # нехэшируемый элемент
+    return rng.sample(values, rng.randint(1, len(values)))
+
+
+def random_calories(rng: random.Random):
+    kind = rng.random()
+    if kind < 0.15:
+        return None
+    if kind < 0.2:
+        return [1800]
+    if kind < 0.25:
+        return "1800-2200"
+    low = rng.randint(1200, 3200)
+    return [low, low + rng.randint(0, 800)]
+
+
+def random_profile(rng: random.Random):
+    return SimpleNamespace(
+        goal=rng.choice(GOALS + [None]),
+        preferred_difficulty=rng.choice(LEVELS + [None]),
+        body_type=rng.choice(BODY_TYPES + [None]),
+        is_experienced_training=rng.choice([True, False, None]),
+    )
+
+
+def make_workout_plans(rng: random.Random, count: int):
+    return [
+        SimpleNamespace(
+            id=f"workout-{index}",
+            target_goal=random_targets(rng, GOALS),
+            target_level=random_targets(rng, LEVELS),
+            target_body_type=random_targets(rng, BODY_TYPES),
+        )
+        for index in range(count)
+    ]
+
+
+def make_meal_plans(rng: random.Random, count: int):
+    return [
+        SimpleNamespace(
+            id=f"meal-{index}",
+            target_goal=random_targets(rng, GOALS),
+            calories_range=random_calories(rng),
+        )
+        for index in range(count)
+    ]
+
+
+def random_calories_range(rng: random.Random):
+    low = rng.randint(1200, 3000)
+    # Диапазон нулевой ширины формула тоже допускает: калории тогда не дают вклада
+    return (low, low + rng.choice([0, 200, 400]))
+
+
+def reference_best(plans, score):
+    """
+    Прежний поштучный подбор: планы в порядке created_at desc, score > 0,
+    устойчивая сортировка по убыванию — при равенстве выигрывает более новый план
+    """
+    scored = [(plan.id, score(plan)) for plan in plans]
+    scored = [item for item in scored if item[1] > 0]
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[0] if scored else None
+
+
+def test_workout_scores_match_reference(matching, monkeypatch):
+    """Score и выбранный план совпадают с циклом по планам, в том числе на границах порций"""
+    monkeypatch.setattr(batch_scoring, "PROFILES_CHUNK_SIZE", 7)
+    rng = random.Random(20240127)
+    plans = make_workout_plans(rng, 60)
+    profiles = [random_profile(rng) for _ in range(50)]
+    scorer = WorkoutPlanScorer(plans)
+
+    scores = scorer.score_profiles(profiles)
+    for row, profile in enumerate(profiles):
+        expected = [matching._calculate_workout_plan_score(plan, profile) for plan in plans]
+        assert scores[row].tolist() == expected
+
+    best = scorer.best_for_profiles(profiles)
+    for profile, match in zip(profiles, best):
+        assert match == reference_best(plans, lambda plan: matching._calculate_workout_plan_score(plan, profile))
+
+
+def test_meal_scores_match_reference(matching, monkeypatch):
+    """Планы питания с корректными калориями считаются так же, как в цикле"""
+    monkeypatch.setattr(batch_scoring, "PROFILES_CHUNK_SIZE", 7)
+    rng = random.Random(20240128)
+    # Некорректные калории прежний цикл не переживает — их проверяет отдельный тест
+    plans = [plan for plan in make_meal_plans(rng, 80) if not isinstance(plan.calories_range, str)]
+    profiles = [random_profile(rng) for _ in range(50)]
+    calories_ranges = [random_calories_range(rng) for _ in profiles]
+    scorer = MealPlanScorer(plans)
+
+    scores = scorer.score_profiles(profiles, calories_ranges)
+    for row, (profile, calories_range) in enumerate(zip(profiles, calories_ranges)):
+        expected = [matching._calculate_meal_plan_score(plan, profile, calories_range) for plan in plans]
+        np.testing.assert_allclose(scores[row], expected, rtol=0, atol=1e-12)
+
+    best = scorer.best_for_profiles(profiles, calories_ranges)
+    for profile, calories_range, match in zip(profiles, calories_ranges, best):
+        expected = reference_best(
+            plans, lambda plan: matching._calculate_meal_plan_score(plan, profile, calories_range)
+        )
+        if expected is None:
+            assert match is None
+        else:
+            assert match[0] == expected[0]
+            assert match[1] == pytest.approx(expected[1], abs=1e-12)
+
+
+def test_ties_pick_newest_plan(matching):
+    """При равном score выбирается первый (самый новый) план, как при сортировке по created_at desc"""
+    profile = SimpleNamespace(
+        goal="lose_weight", preferred_difficulty="beginner", body_type="mesomorph", is_experienced_training=False
+    )
+    # Порядок в каталоге — created_at desc: первым идёт самый новый
+    workout_plans = [
+        SimpleNamespace(id="newest", target_goal=["lose_weight"], target_level=["beginner"], target_body_type=None),
+        SimpleNamespace(id="older", target_goal=["lose_weight"], target_level=["beginner"], target_body_type=None),
+        SimpleNamespace(id="oldest", target_goal=["maintain"], target_level=None, target_body_type=None),
+    ]
+    match = WorkoutPlanScorer(workout_plans).best_for_profiles([profile])[0]
+    assert match[0] == "newest"
+    assert match == reference_best(
+        workout_plans, lambda plan: matching._calculate_workout_plan_score(plan, profile)
+    )
+
+    meal_plans = [
+        SimpleNamespace(id="newest", target_goal=["lose_weight"], calories_range=[1500, 2500]),
+        SimpleNamespace(id="older", target_goal=["lose_weight"], calories_range=[1500, 2500]),
+    ]
+    match = MealPlanScorer(meal_plans).best_for_profiles([profile], [(1800, 2200)])[0]
+    assert match[0] == "newest"
+
+
+def test_non_numeric_calories_are_skipped(matching):
+    """
+    Нечисловой calories_range (например, сохранённый из админки строками) прежний цикл
+    ронял TypeError; векторизованный подбор считает такой план планом без калорий
+    """
+    profile = SimpleNamespace(
+        goal="gain_muscle", preferred_difficulty=None, body_type="ectomorph", is_experienced_training=None
+    )
+    calories_range = (2600, 3200)
+    broken = SimpleNamespace(id="broken", target_goal=["gain_muscle"], calories_range=["2500", "3000"])
+    valid = SimpleNamespace(id="valid", target_goal=["maintain"], calories_range=[2500, 3000])
+
+    with pytest.raises(TypeError):
+        matching._calculate_meal_plan_score(broken, profile, calories_range)
+
+    scores = MealPlanScorer([broken, valid]).score_profile(profile, calories_range)
+    without_calories = SimpleNamespace(id="broken", target_goal=["gain_muscle"], calories_range=None)
+    assert scores[0] == pytest.approx(
+        matching._calculate_meal_plan_score(without_calories, profile, calories_range), abs=1e-12
+    )
+    assert scores[1] == pytest.approx(
+        matching._calculate_meal_plan_score(valid, profile, calories_range), abs=1e-12
+    )
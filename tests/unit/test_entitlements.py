@@ -0,0 +1,149 @@
+"""
+Кэш прав доступа: TTL, короткий срок для «нет подписки», сброс по NOTIFY из админки
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from src.bot.middlewares.acl import ACLMiddleware
+from src.database.listener import NotificationListener
+from src.database.repositories.subscription_repo import SubscriptionRepository
+from src.services import entitlements
+from src.services.entitlements import EntitlementCache, watch_subscription_changes
+
+CHANNEL = "subscription_changes"
+
+
+class Clock:
+    """Подменяет time.monotonic только в модуле кэша — event loop пользуется настоящими часами"""
+
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        monkeypatch.setattr(entitlements, "time", SimpleNamespace(monotonic=lambda: self.now))
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    return Clock(monkeypatch)
+
+
+def active_until(days: int = 30) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(days=days)
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = EntitlementCache(ttl=300, negative_ttl=30)
+    user_id = uuid.uuid4()
+    cache.put(1, user_id, active_until())
+
+    clock.advance(299)
+    entry = cache.get(1)
+    assert entry is not None and entry.user_id == user_id and entry.has_subscription()
+
+    clock.advance(2)
+    assert cache.get(1) is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_no_subscription_uses_negative_ttl(clock):
+    cache = EntitlementCache(ttl=300, negative_ttl=30)
+    cache.put(1, uuid.uuid4(), None)
+
+    clock.advance(29)
+    entry = cache.get(1)
+    assert entry is not None and not entry.has_subscription()
+
+    clock.advance(2)
+    assert cache.get(1) is None
+
+
+def test_ended_subscription_is_rechecked(clock):
+    """Подписка закончилась раньше TTL — запись не отдаётся, чтобы найти более новую подписку"""
+    cache = EntitlementCache(ttl=300, negative_ttl=30)
+    cache.put(1, uuid.uuid4(), datetime.now(timezone.utc) - timedelta(seconds=1))
+
+    assert cache.get(1) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = EntitlementCache(max_size=2)
+    first, second, third = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    cache.put(1, first, active_until())
+    cache.put(2, second, active_until())
+    assert cache.get(1) is not None
+
+    cache.put(3, third, active_until())
+
+    assert cache.get(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
+    # Вытесненную запись нечем сбрасывать
+    assert cache.invalidate_user(second) is None
+
+
+def test_notification_invalidates_user_entry(clock):
+    cache = EntitlementCache()
+    listener = NotificationListener(engine=None)
+    changed = []
+    watch_subscription_changes(listener, CHANNEL, cache, on_change=changed.append)
+    user_id, other_user_id = uuid.uuid4(), uuid.uuid4()
+    cache.put(1, user_id, None)
+    cache.put(2, other_user_id, active_until())
+
+    listener._dispatch(None, 0, CHANNEL, str(user_id))
+
+    assert cache.get(1) is None
+    assert cache.get(2) is not None
+    assert changed == [1]
+
+    # Пользователя нет в кэше — сбрасывать нечего, on_change не вызывается
+    listener._dispatch(None, 0, CHANNEL, str(uuid.uuid4()))
+    assert changed == [1]
+
+
+def test_reconnect_clears_cache(clock):
+    """Пока соединение LISTEN было разорвано, уведомления могли потеряться"""
+    cache = EntitlementCache()
+    listener = NotificationListener(engine=None)
+    watch_subscription_changes(listener, CHANNEL, cache)
+    cache.put(1, uuid.uuid4(), active_until())
+
+    listener._connected()
+
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_user_is_not_cached(clock, monkeypatch):
+    """
+    «Пользователь не найден» не кэшируется: после регистрации и активации подписки
+    следующая проверка снова идёт в БД
+    """
+    cache = EntitlementCache(ttl=300, negative_ttl=30)
+    monkeypatch.setattr("src.bot.middlewares.acl.entitlement_cache", cache)
+    user_id = uuid.uuid4()
+    ends_at = active_until()
+    access = [None, (user_id, ends_at)]
+    lookups = []
+
+    async def get_access_by_telegram_id(self, telegram_id):
+        lookups.append(telegram_id)
+        return access[len(lookups) - 1]
+
+    monkeypatch.setattr(SubscriptionRepository, "get_access_by_telegram_id", get_access_by_telegram_id)
+    middleware = ACLMiddleware()
+
+    unknown = await middleware._load_entitlement(session=None, telegram_id=1)
+    assert unknown.user_id is None
+    assert len(cache) == 0
+
+    known = await middleware._load_entitlement(session=None, telegram_id=1)
+    assert known.user_id == user_id and known.has_subscription()
+    assert lookups == [1, 1]
+    assert cache.get(1) is known
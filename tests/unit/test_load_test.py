@@ -0,0 +1,109 @@
+"""
+Смоук-тест нагрузочного стенда (scripts/load_test.py и scripts/fake_bot_api.py) без БД:
+виртуальные пользователи проходят все шаги сценариев через фейковый Bot API
+и long polling, а вместо роутеров бота — заглушка, которая отвечает кнопками анкеты
+и альбомом на «🍎 Питание»
+"""
+import asyncio
+import socket
+import sys
+from pathlib import Path
+
+import pytest
+from aiogram import Dispatcher, F, Router
+from aiogram.types import BufferedInputFile, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from aiogram.utils.media_group import MediaGroupBuilder
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+
+import load_test  # noqa: E402
+from fake_bot_api import FakeBotAPI, start_fake_api  # noqa: E402
+from src.bot.app import create_bot  # noqa: E402
+from src.bot.send_scheduler import send_scheduler  # noqa: E402
+
+BUTTONS = [value for kind, value in load_test.QUESTIONNAIRE if kind == "click"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=text, callback_data=str(index))] for index, text in enumerate(BUTTONS)
+    ])
+
+
+def create_stub_dispatcher() -> Dispatcher:
+    router = Router()
+
+    @router.message(F.text == "🍎 Питание")
+    async def meal_plan(message: Message):
+        album = MediaGroupBuilder(caption="План питания")
+        for index in range(3):
+            album.add_photo(BufferedInputFile(b"\xff\xd8\xff", filename=f"meal-{index}.jpg"))
+        await message.answer_media_group(album.build())
+
+    @router.message()
+    async def any_text(message: Message):
+        await message.answer(f"Ответ на {message.text}", reply_markup=keyboard())
+
+    @router.callback_query()
+    async def click(callback: CallbackQuery):
+        await callback.message.edit_text(f"Выбрано {BUTTONS[int(callback.data)]}", reply_markup=keyboard())
+        await callback.answer()
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+@pytest.mark.asyncio
+async def test_virtual_users_complete_all_scenarios(monkeypatch):
+    # Лимит на чат (1 сообщение/с) растянул бы анкету на десятки секунд
+    monkeypatch.setattr(send_scheduler, "chat_interval", 0.001)
+    port = free_port()
+    api = FakeBotAPI()
+    runner = await start_fake_api(api, "127.0.0.1", port)
+    bot = create_bot("123456789:SMOKE-TEST-TOKEN", api_url=f"http://127.0.0.1:{port}")
+    dp = create_stub_dispatcher()
+    tracker = load_test.UpdateTracker()
+    dp.update.outer_middleware(tracker)
+    test = load_test.LoadTest(api, tracker, timeout=10, think_time=0)
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+
+    telegram_ids = [7_000_000_001, 7_000_000_002, 7_000_000_003]
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(
+                load_test.VirtualUser(test, telegram_id).run(iterations=2, ramp_up=0) for telegram_id in telegram_ids
+            )),
+            timeout=60,
+        )
+    finally:
+        await dp.stop_polling()
+        await asyncio.gather(polling, return_exceptions=True)
+        await api.close()
+        await runner.cleanup()
+        await bot.session.close()
+
+    assert {scenario: dict(errors) for scenario, errors in test.errors.items() if errors} == {}
+    assert test.completed_questionnaires == len(telegram_ids)
+    steps = {scenario: len(latencies) for scenario, latencies in test.latencies.items()}
+    assert steps == {
+        "start": 3,
+        "questionnaire": 3 * (len(load_test.QUESTIONNAIRE) + 1),
+        "workout_plan": 6,
+        "meal_plan": 6,
+    }
+    assert api.calls["sendMediaGroup"] == 6
+
+    for telegram_id in telegram_ids:
+        albums = [message for message in api.messages(telegram_id) if "media_group_id" in message]
+        # Два запроса питания по альбому из трёх фото
+        assert len(albums) == 2 * 3
+        assert all(message["photo"] for message in albums)
+        # Альбом не перекрывает клавиатуру последнего сообщения, по которой «нажимаются» кнопки
+        assert api.find_button(telegram_id, BUTTONS[0]) is not None
@@ -0,0 +1,112 @@
+"""
+Повторы и устаревание уведомлений: max_delay считается от исходного срока scheduled_for,
+который повторные попытки не сдвигают
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.database.repositories.notification_repo import NotificationRepository
+from src.services.notifications import FAILED, RETRY, SENT, NotificationDispatcher
+
+
+class FlakyBot:
+    """Бот, у которого отправка падает с error (None — отправка проходит)"""
+
+    def __init__(self, error: Optional[Exception] = None):
+        self.error = error
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.error is not None:
+            raise self.error
+        self.sent.append((chat_id, text))
+
+
+class RecordingSession:
+    """Сессия, которая только запоминает выполненные запросы"""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+    async def commit(self):
+        pass
+
+
+def make_row(scheduled_for: datetime):
+    return SimpleNamespace(
+        id=uuid.uuid4(), title="Тренировка", message="Пора заниматься", scheduled_for=scheduled_for, telegram_id=42
+    )
+
+
+@pytest.mark.asyncio
+async def test_error_is_retried_within_max_delay():
+    dispatcher = NotificationDispatcher(FlakyBot(RuntimeError("timeout")), max_delay=timedelta(hours=6))
+    now = datetime.now(timezone.utc)
+    row = make_row(now - timedelta(hours=5, minutes=55))
+
+    assert await dispatcher._send(row, now) == (row.id, RETRY)
+
+
+@pytest.mark.asyncio
+async def test_repeated_errors_expire_from_original_due_time():
+    """
+    Уведомление, которое падает каждые retry_delay, устаревает через max_delay после scheduled_for:
+    повторы сохраняют исходный срок, поэтому max_delay не отодвигается
+    """
+    dispatcher = NotificationDispatcher(
+        FlakyBot(RuntimeError("timeout")), retry_delay=timedelta(minutes=5), max_delay=timedelta(hours=6)
+    )
+    scheduled_for = datetime(2026, 3, 1, 9, 0, tzinfo=timezone.utc)
+    row = make_row(scheduled_for)
+
+    outcomes = []
+    attempt_at = scheduled_for
+    while attempt_at < scheduled_for + timedelta(hours=7):
+        outcome = (await dispatcher._send(row, attempt_at))[1]
+        outcomes.append(outcome)
+        if outcome != RETRY:
+            break
+        attempt_at += dispatcher.retry_delay
+
+    assert outcomes[-1] == FAILED
+    assert attempt_at - scheduled_for <= dispatcher.max_delay + dispatcher.retry_delay
+    assert outcomes[:-1] == [RETRY] * (len(outcomes) - 1)
+
+
+@pytest.mark.asyncio
+async def test_sent_notification_is_not_expired():
+    bot = FlakyBot()
+    dispatcher = NotificationDispatcher(bot, max_delay=timedelta(hours=6))
+    now = datetime.now(timezone.utc)
+    row = make_row(now - timedelta(hours=8))
+
+    assert await dispatcher._send(row, now) == (row.id, SENT)
+    assert bot.sent == [(42, "<b>Тренировка</b>\n\nПора заниматься")]
+
+
+@pytest.mark.asyncio
+async def test_retry_keeps_scheduled_for():
+    """save_results откладывает повтор через claimed_until и не трогает scheduled_for"""
+    session = RecordingSession()
+    now = datetime.now(timezone.utc)
+    await NotificationRepository(session).save_results(
+        sent_ids=[uuid.uuid4()],
+        failed_ids=[],
+        retry_ids=[uuid.uuid4()],
+        sent_at=now,
+        retry_at=now + timedelta(minutes=5),
+    )
+
+    (statement,) = session.statements
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    set_clause = sql.split(" SET ", 1)[1].split(" WHERE ", 1)[0]
+    assert "scheduled_for" not in set_clause
+    assert "claimed_until=CASE" in set_clause
@@ -0,0 +1,142 @@
+"""
+Деление HTML-сообщений на части: лимит длины, разрезы по абзацам и строкам,
+теги, пересекающие границу части, и неделимые HTML-сущности
+"""
+import random
+import re
+
+import pytest
+
+from src.services.plan_renderer import MESSAGE_LIMIT, split_message
+
+TAG = re.compile(r"<\s*(/?)\s*([a-zA-Z][\w-]*)[^>]*>")
+ENTITY = re.compile(r"&#?\w+;")
+
+
+def assert_balanced(chunk: str):
+    """Каждый открытый в части тег закрыт в ней же, в правильном порядке"""
+    stack = []
+    for closing, name in TAG.findall(chunk):
+        if closing:
+            assert stack and stack[-1] == name, chunk
+            stack.pop()
+        else:
+            stack.append(name)
+    assert not stack, chunk
+
+
+def words(text: str):
+    """Слова текста без тегов: по ним проверяется, что при делении ничего не потерялось"""
+    return TAG.sub(" ", text).split()
+
+
+def assert_valid_split(text: str, limit: int):
+    chunks = split_message(text, limit)
+    assert chunks
+    for chunk in chunks:
+        assert len(chunk) <= limit
+        assert_balanced(chunk)
+        # Части не начинаются и не заканчиваются обрывком тега или сущности
+        assert "<" not in TAG.sub("", chunk) and ">" not in TAG.sub("", chunk)
+        assert "&" not in ENTITY.sub("", chunk)
+    # Слово без пробелов может быть разрезано посередине, поэтому сравниваются склеенные слова
+    assert "".join(word for chunk in chunks for word in words(chunk)) == "".join(words(text))
+    return chunks
+
+
+def test_short_text_is_one_chunk():
+    text = "🏋️ <b>План</b>\n\n<i>Описание</i>"
+    assert split_message(text) == [text]
+
+
+def test_prefers_paragraph_boundary():
+    first = "Первый абзац. " * 5
+    second = "Второй абзац. " * 5
+    text = f"{first.strip()}\n\n{second.strip()}"
+
+    chunks = split_message(text, limit=len(first) + 20)
+
+    assert chunks == [first.strip(), second.strip()]
+
+
+def test_prefers_line_boundary_over_space():
+    lines = [f"• Упражнение номер {index}" for index in range(10)]
+    text = "\n".join(lines)
+
+    chunks = split_message(text, limit=70)
+
+    for chunk in chunks:
+        assert chunk.startswith("• ")
+        assert chunk.split("\n")[-1] in lines
+
+
+def test_tag_crossing_boundary_is_closed_and_reopened():
+    text = "<b>" + " ".join(f"слово{index}" for index in range(60)) + "</b> конец"
+
+    chunks = assert_valid_split(text, limit=80)
+
+    assert len(chunks) > 2
+    for chunk in chunks[:-1]:
+        assert chunk.startswith("<b>") and chunk.endswith("</b>")
+    assert chunks[-1].endswith("</b> конец")
+
+
+def test_nested_tags_keep_attributes_when_reopened():
+    link = '<a href="https://example.com/plan?id=1&amp;page=2">'
+    text = f"Ссылка: {link}<i>{'очень длинный текст ' * 12}</i></a> после"
+
+    chunks = assert_valid_split(text, limit=120)
+
+    assert len(chunks) > 2
+    for chunk in chunks[1:-1]:
+        assert chunk.startswith(link + "<i>")
+        assert chunk.endswith("</i></a>")
+
+
+def test_entities_are_not_split():
+    text = "Белки &amp; жиры &lt;норма&gt; " * 20
+
+    chunks = assert_valid_split(text, limit=37)
+
+    assert "".join(chunks).count("&amp;") == 20
+
+
+def test_text_without_spaces_is_cut_mid_word():
+    text = "а" * 250
+
+    chunks = split_message(text, limit=100)
+
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+
+
+def test_default_limit_is_telegram_message_limit():
+    paragraphs = [f"<b>День {index}</b>\n" + "• Приседания 3x12\n" * 30 for index in range(20)]
+    text = "\n".join(paragraphs)
+    assert len(text) > MESSAGE_LIMIT
+
+    chunks = assert_valid_split(text, MESSAGE_LIMIT)
+
+    assert len(chunks) > 1
+    # Разрезы приходятся на границы абзацев — дни не делятся между сообщениями
+    for chunk in chunks:
+        assert chunk.startswith("<b>День ")
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_html_respects_limit_and_keeps_text(seed):
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(rng.randint(20, 120)):
+        word = rng.choice(["план", "тренировка", "&amp;", "&lt;3", "🔥", "x" * rng.randint(1, 30)])
+        if rng.random() < 0.2:
+            tag = rng.choice(["b", "i", "u", "code"])
+            inner = word
+            if rng.random() < 0.3:
+                inner = f"<i>{inner} {rng.choice(['вес', 'сон'])}</i>"
+            word = f"<{tag}>{inner}</{tag}>"
+        parts.append(word)
+        parts.append(rng.choice([" ", " ", " ", "\n", "\n\n"]))
+    text = "".join(parts).strip()
+
+    for limit in (40, 64, 100, 250):
+        assert_valid_split(text, limit)
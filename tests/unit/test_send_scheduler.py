@@ -0,0 +1,158 @@
+"""
+Планировщик отправки: порядок сообщений в чате, приоритеты, возврат слота при отмене
+и повтор после TelegramRetryAfter. Bot API заменён фейковым make_request
+"""
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetMe, SendMessage
+
+from src.bot.send_scheduler import PRIORITY_BULK, SendScheduler, send_priority
+
+
+class FakeBotAPI:
+    """make_request, который запоминает отправленные сообщения и время отправки"""
+
+    def __init__(self, failures: int = 0, retry_after: int = 1):
+        self.sent = []
+        self.calls = 0
+        self.failures = failures
+        self.retry_after = retry_after
+        self.started = time.monotonic()
+
+    async def __call__(self, bot, method):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise TelegramRetryAfter(method=method, message="Flood control exceeded", retry_after=self.retry_after)
+        self.sent.append((method.chat_id, method.text, time.monotonic() - self.started))
+        return True
+
+
+def send(scheduler: SendScheduler, api: FakeBotAPI, chat_id: int, text: str):
+    return scheduler(api, None, SendMessage(chat_id=chat_id, text=text))
+
+
+@pytest.mark.asyncio
+async def test_messages_to_one_chat_keep_order_and_interval():
+    scheduler = SendScheduler(rate=1000, chat_interval=0.05)
+    api = FakeBotAPI()
+
+    await asyncio.gather(*(send(scheduler, api, 1, f"message {index}") for index in range(5)))
+
+    assert [text for _, text, _ in api.sent] == [f"message {index}" for index in range(5)]
+    times = [sent_at for _, _, sent_at in api.sent]
+    assert all(later - earlier >= 0.045 for earlier, later in zip(times, times[1:]))
+
+
+@pytest.mark.asyncio
+async def test_other_chats_are_not_delayed_by_a_busy_chat():
+    scheduler = SendScheduler(rate=1000, chat_interval=0.2)
+    api = FakeBotAPI()
+
+    await asyncio.gather(
+        send(scheduler, api, 1, "first"),
+        send(scheduler, api, 1, "second"),
+        send(scheduler, api, 2, "other chat"),
+    )
+
+    sent_at = {text: at for _, text, at in api.sent}
+    assert sent_at["other chat"] < 0.1
+    assert sent_at["second"] >= 0.19
+
+
+@pytest.mark.asyncio
+async def test_interactive_sends_get_slots_before_bulk():
+    scheduler = SendScheduler(rate=50, chat_interval=0.001)
+    api = FakeBotAPI()
+    # Общий лимит исчерпан — все отправки ждут токенов в очереди
+    scheduler._tokens = 0
+
+    with send_priority(PRIORITY_BULK):
+        bulk = [asyncio.create_task(send(scheduler, api, 100 + index, "bulk")) for index in range(3)]
+    await asyncio.sleep(0)
+    interactive = [asyncio.create_task(send(scheduler, api, 200 + index, "reply")) for index in range(3)]
+    await asyncio.gather(*bulk, *interactive)
+
+    assert [text for _, text, _ in api.sent] == ["reply"] * 3 + ["bulk"] * 3
+
+
+@pytest.mark.asyncio
+async def test_cancelled_send_releases_chat_slot():
+    scheduler = SendScheduler(rate=1000, chat_interval=0.3)
+    api = FakeBotAPI()
+
+    await send(scheduler, api, 1, "first")
+    cancelled = asyncio.create_task(send(scheduler, api, 1, "cancelled"))
+    await asyncio.sleep(0.05)
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+
+    await send(scheduler, api, 1, "next")
+
+    sent_at = {text: at for _, text, at in api.sent}
+    assert "cancelled" not in sent_at
+    # Следующее сообщение ждёт только интервал после первого, а не слот отменённого
+    assert 0.25 <= sent_at["next"] < 0.5
+    assert scheduler.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_bulk_send_returns_global_token():
+    scheduler = SendScheduler(rate=20, chat_interval=0.001)
+    api = FakeBotAPI()
+    scheduler._tokens = 0
+
+    waiting = asyncio.create_task(send(scheduler, api, 1, "cancelled"))
+    await asyncio.sleep(0.01)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    await send(scheduler, api, 2, "next")
+    assert [text for _, text, _ in api.sent] == ["next"]
+    assert not scheduler._waiters
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_and_repeats_request():
+    scheduler = SendScheduler(rate=1000, chat_interval=0.01, max_retries=3)
+    api = FakeBotAPI(failures=1, retry_after=1)
+
+    first = asyncio.create_task(send(scheduler, api, 1, "flooded"))
+    await asyncio.sleep(0.05)
+    # Пауза после RetryAfter общая: другой чат тоже ждёт её окончания
+    other = asyncio.create_task(send(scheduler, api, 2, "other chat"))
+    await asyncio.gather(first, other)
+
+    assert api.calls == 3
+    assert {text for _, text, _ in api.sent} == {"flooded", "other chat"}
+    assert min(at for _, _, at in api.sent) >= 0.95
+    assert scheduler.retry_after_count == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_raised_when_retries_are_exhausted():
+    scheduler = SendScheduler(rate=1000, chat_interval=0.01, max_retries=0)
+    api = FakeBotAPI(failures=1, retry_after=1)
+
+    with pytest.raises(TelegramRetryAfter):
+        await send(scheduler, api, 1, "flooded")
+    assert api.sent == []
+
+
+@pytest.mark.asyncio
+async def test_other_methods_bypass_limits():
+    scheduler = SendScheduler(rate=1, chat_interval=10)
+    scheduler._tokens = 0
+    calls = []
+
+    async def make_request(bot, method):
+        calls.append(method)
+        return True
+
+    assert await asyncio.wait_for(scheduler(make_request, None, GetMe()), timeout=0.5) is True
+    assert len(calls) == 1
@@ -0,0 +1,154 @@
+"""
+Хранилище FSM в Redis: msgpack-сериализация, общий hash состояния и данных с TTL
+и предзагрузка стека aiogram_dialog тем же запросом, что и состояние
+"""
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from aiogram.fsm.storage.base import StorageKey
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from src.bot import storage as storage_module
+from src.bot.storage import DIALOG_STACK_DESTINY, PackedRedisStorage, pack_data, unpack_data
+
+BOT_ID = 1000000001
+
+
+class CountingRedis(FakeAsyncRedis):
+    """FakeRedis, который считает запросы к Redis (один pipeline — один запрос)"""
+
+    requests = 0
+
+    def pipeline(self, *args, **kwargs):
+        self.requests += 1
+        return super().pipeline(*args, **kwargs)
+
+
+@pytest_asyncio.fixture
+async def storage():
+    # Свой сервер на каждый тест — данные тестов не пересекаются
+    storage = PackedRedisStorage(CountingRedis(server=FakeServer()), ttl=3600)
+    yield storage
+    await storage.close()
+
+
+def user_key(chat_id: int = 42, user_id: int = 42) -> StorageKey:
+    return StorageKey(bot_id=BOT_ID, chat_id=chat_id, user_id=user_id)
+
+
+def stack_key(chat_id: int = 42) -> StorageKey:
+    # aiogram_dialog хранит стек чата под user_id=chat_id
+    return StorageKey(bot_id=BOT_ID, chat_id=chat_id, user_id=chat_id, destiny=DIALOG_STACK_DESTINY)
+
+
+def test_pack_round_trip():
+    data = {
+        "age": 30,
+        "weight": 80.5,
+        "goal": "lose_weight",
+        "answers": [1, "два", None, True],
+        "birthday": date(1995, 3, 8),
+        "completed_at": datetime(2026, 3, 1, 9, 30, tzinfo=timezone.utc),
+        "calories": Decimal("2150.50"),
+        "raw": b"\x00\x01",
+        "nested": {1: {"intents": ["a", "b"]}},
+    }
+
+    restored = unpack_data(pack_data(data))
+
+    assert restored == data
+    assert restored["completed_at"].tzinfo is not None
+
+
+def test_pack_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        pack_data({"value": object()})
+
+
+@pytest.mark.asyncio
+async def test_state_and_data_share_one_hash_with_ttl(storage):
+    key = user_key()
+
+    await storage.set_state(key, "Questionnaire:age")
+    await storage.set_data(key, {"age": 30, "started": date(2026, 3, 1)})
+
+    assert await storage.get_state(key) == "Questionnaire:age"
+    assert await storage.get_data(key) == {"age": 30, "started": date(2026, 3, 1)}
+    name = storage._name(key)
+    assert set(await storage.redis.hkeys(name)) == {b"state", b"data"}
+    assert 0 < await storage.redis.ttl(name) <= 3600
+
+
+@pytest.mark.asyncio
+async def test_clearing_state_and_data_removes_key(storage):
+    key = user_key()
+    await storage.set_state(key, "Questionnaire:age")
+    await storage.set_data(key, {"age": 30})
+
+    await storage.set_data(key, {})
+    assert await storage.get_data(key) == {}
+    assert await storage.get_state(key) == "Questionnaire:age"
+
+    await storage.set_state(key, None)
+    assert await storage.redis.exists(storage._name(key)) == 0
+
+
+@pytest.mark.asyncio
+async def test_set_data_requires_dict(storage):
+    with pytest.raises(TypeError):
+        await storage.set_data(user_key(), [("age", 30)])
+
+
+@pytest.mark.asyncio
+async def test_state_read_prefetches_dialog_stack(storage):
+    await storage.set_data(stack_key(), {"intents": ["intent-1"]})
+    await storage.set_state(user_key(), "Questionnaire:age")
+    requests = storage.redis.requests
+
+    assert await storage.get_state(user_key()) == "Questionnaire:age"
+    assert await storage.get_data(stack_key()) == {"intents": ["intent-1"]}
+    assert storage.redis.requests == requests + 1
+
+    # Предзагрузка используется один раз: следующее чтение снова идёт в Redis
+    assert await storage.get_data(stack_key()) == {"intents": ["intent-1"]}
+    assert storage.redis.requests == requests + 2
+
+
+@pytest.mark.asyncio
+async def test_write_discards_prefetched_stack(storage):
+    await storage.set_data(stack_key(), {"intents": ["intent-1"]})
+    await storage.get_state(user_key())
+
+    await storage.set_data(stack_key(), {"intents": ["intent-1", "intent-2"]})
+
+    assert await storage.get_data(stack_key()) == {"intents": ["intent-1", "intent-2"]}
+
+
+@pytest.mark.asyncio
+async def test_stale_prefetch_is_not_used(storage, monkeypatch):
+    now = [100.0]
+    # Часы подменяются только в модуле хранилища — event loop пользуется настоящими
+    monkeypatch.setattr(storage_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    await storage.set_data(stack_key(), {"intents": ["intent-1"]})
+    await storage.get_state(user_key())
+
+    # Другой процесс изменил стек, а предзагрузка успела устареть
+    await storage.redis.hset(storage._name(stack_key()), b"data", pack_data({"intents": []}))
+    now[0] += storage.prefetch_lifetime + 0.1
+
+    assert await storage.get_data(stack_key()) == {"intents": []}
+
+
+@pytest.mark.asyncio
+async def test_prefetch_is_per_chat(storage):
+    await storage.set_data(stack_key(chat_id=1), {"intents": ["first"]})
+    await storage.set_data(stack_key(chat_id=2), {"intents": ["second"]})
+
+    await storage.get_state(user_key(chat_id=1, user_id=1))
+    await storage.get_state(user_key(chat_id=2, user_id=2))
+
+    assert await storage.get_data(stack_key(chat_id=1)) == {"intents": ["first"]}
+    assert await storage.get_data(stack_key(chat_id=2)) == {"intents": ["second"]}
@@ -0,0 +1,34 @@
+"""
+Распределение апдейтов по шардам: апдейты одного пользователя — в один шард,
+неизвестные aiogram типы апдейтов — по update_id, без ошибки
+"""
+from aiogram.types import Update
+
+from src.bot.webhook import get_update_shard, get_update_user_id
+
+
+def make_message_update(update_id: int, user_id: int) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": "/start",
+        },
+    })
+
+
+def test_updates_of_one_user_share_a_shard():
+    updates = [make_message_update(update_id, user_id=1234567) for update_id in range(1, 20)]
+
+    assert {get_update_user_id(update) for update in updates} == {1234567}
+    assert {get_update_shard(update, 8) for update in updates} == {1234567 % 8}
+
+
+def test_unknown_update_type_falls_back_to_update_id():
+    update = Update.model_validate({"update_id": 21, "future_update_type": {"id": 1}})
+
+    assert get_update_user_id(update) is None
+    assert get_update_shard(update, 8) == 21 % 8